@@ -0,0 +1,9 @@
+"""
+Benchmarks for the pipeline tools that run on a plain Python install.
+
+mockMaya.install() puts an in-memory stand-in for maya.cmds (and the few OpenMaya, PySide2 and
+pymel pieces the tools import) into sys.modules, sceneGen fills it with synthetic scenes and
+texture folders, and run times every tool operation and counts its cmds calls:
+
+    python -m benchmarks.run [--sizes 1000 10000 100000] [--textures 50]
+"""
@@ -0,0 +1,336 @@
+"""
+Stand-in for maya.cmds backed by mockScene.
+
+mockMaya.install() registers this module as maya.cmds. Every public function here is a
+command, so mayaCalls counts them just like the real ones. Commands take the flags the tools
+use, long or short, and ignore the rest.
+"""
+import fnmatch
+import os
+from benchmarks import mockScene
+
+SCENE = mockScene.MockScene()
+WARNINGS = []
+
+
+def _flag(kwargs, *names, default=None):
+    for name in names:
+        if name in kwargs:
+            return kwargs[name]
+    return default
+
+
+def _flatten(args):
+    names = []
+    for arg in args:
+        if isinstance(arg, (list, tuple, set)):
+            names.extend(arg)
+        elif arg is not None:
+            names.append(arg)
+    return names
+
+
+def _nodes(args, missingOk=True):
+    nodes = []
+    for name in _flatten(args):
+        node = SCENE.find(name)
+        if node is None:
+            if not missingOk:
+                raise ValueError("No object matches name: %s" % name)
+            continue
+        nodes.append(node)
+    return nodes
+
+
+def _names(nodes, long=False):
+    return [SCENE.displayName(node, long) for node in nodes]
+
+
+def _types(value):
+    return {value} if isinstance(value, str) else set(value)
+
+
+# Querying
+
+def ls(*args, **kwargs):
+    objects = _flatten(args)
+    # "*.attr" lists the nodes that have attr, only as nodes (objectsOnly) here
+    attrs = {name[2:] for name in objects if name.startswith('*.')}
+    objects = [name for name in objects if not name.startswith('*.')]
+    patterns = [name for name in objects if '*' in name]
+    objects = [name for name in objects if '*' not in name]
+    if attrs or patterns:
+        nodes = _nodes(objects) + [node for node in SCENE.nodes if attrs.intersection(node.attrs)
+                                   or any(fnmatch.fnmatchcase(node.name, pattern) for pattern in patterns)]
+    else:
+        # Like the real ls, an empty list lists everything
+        nodes = _nodes(objects) if objects else list(SCENE.nodes)
+    if _flag(kwargs, 'selection', 'sl'):
+        selected = set(SCENE.selection)
+        nodes = [node for node in nodes if node in selected] if objects else list(SCENE.selection)
+    if _flag(kwargs, 'dag'):
+        nodes = [node for node in nodes if node.isDag]
+    if _flag(kwargs, 'geometry', 'g'):
+        nodes = [node for node in nodes if node.nodeType in mockScene.GEOMETRY_TYPES]
+    nodeTypes = _flag(kwargs, 'exactType', 'et', 'type', 'typ')
+    if nodeTypes:
+        nodeTypes = _types(nodeTypes)
+        nodes = [node for node in nodes if node.nodeType in nodeTypes]
+    if _flag(kwargs, 'uuid'):
+        return [node.uuid for node in nodes]
+    names = _names(nodes, _flag(kwargs, 'long', 'l'))
+    if _flag(kwargs, 'showType', 'st'):
+        return [item for name, node in zip(names, nodes) for item in (name, node.nodeType)]
+    return names
+
+
+def objExists(name):
+    return SCENE.find(name) is not None
+
+
+def nodeType(name):
+    node = SCENE.find(name.partition('.')[0])
+    if node is None:
+        raise RuntimeError("No object matches name: %s" % name)
+    return node.nodeType
+
+
+def listRelatives(*args, **kwargs):
+    fullPath = _flag(kwargs, 'fullPath', 'f')
+    found = []
+    for node in _nodes(args):
+        if _flag(kwargs, 'parent', 'p'):
+            if node.parent is not None:
+                found.append(node.parent)
+        elif _flag(kwargs, 'allDescendents', 'ad'):
+            found.extend(SCENE.descendants(node))
+        else:
+            found.extend(node.children)
+    if _flag(kwargs, 'shapes', 's'):
+        found = [node for node in found if node.nodeType in mockScene.SHAPE_TYPES]
+    nodeTypes = _flag(kwargs, 'type', 'typ')
+    if nodeTypes:
+        nodeTypes = _types(nodeTypes)
+        found = [node for node in found if node.nodeType in nodeTypes]
+    return _names(found, fullPath) or None
+
+
+def listConnections(*args, **kwargs):
+    source = _flag(kwargs, 'source', 's', default=True)
+    destination = _flag(kwargs, 'destination', 'd', default=True)
+    connections = _flag(kwargs, 'connections', 'c')
+    plugs = _flag(kwargs, 'plugs', 'p')
+    fullNodeName = _flag(kwargs, 'fullNodeName', 'fnn')
+    nodeType = kwargs.get('type', kwargs.get('t'))
+    result = []
+    for arg in _flatten(args):
+        # A plug only lists its own connections (and its children's)
+        nodeName, _, plug = arg.partition('.')
+        node = SCENE.find(nodeName)
+        if node is None:
+            continue
+        name = SCENE.displayName(node)
+        found = []
+        if source:
+            found.extend((attr, other, otherAttr) for attr, (other, otherAttr) in SCENE.inputs.get(node, {}).items())
+        if destination:
+            found.extend(SCENE.outputs.get(node, ()))
+        for attr, other, otherAttr in found:
+            if nodeType and other.nodeType != nodeType:
+                continue
+            if plug and attr != plug and not attr.startswith(plug + '.'):
+                continue
+            otherName = SCENE.displayName(other, fullNodeName)
+            if plugs:
+                otherName = '%s.%s' % (otherName, otherAttr)
+            if connections:
+                result.append('%s.%s' % (name, attr))
+            result.append(otherName)
+    return result or None
+
+
+def listHistory(*args, **kwargs):
+    found = []
+    for node in _nodes(args):
+        found.extend(SCENE.history(node))
+    return _names(found) or None
+
+
+def getAttr(plug, **kwargs):
+    node, attr = SCENE.findPlug(plug)
+    value = SCENE.getAttr(node, attr)
+    # Compound attributes come back as a list holding one tuple
+    return [value] if isinstance(value, tuple) else value
+
+
+def setAttr(plug, *values, **kwargs):
+    node, attr = SCENE.findPlug(plug)
+    if not values:
+        return
+    SCENE.setAttr(node, attr, values[0] if len(values) == 1 else tuple(values))
+
+
+# Creating and editing
+
+def createNode(nodeType, name=None, parent=None, **kwargs):
+    return _createNode(nodeType, name or _flag(kwargs, 'n'), parent or _flag(kwargs, 'p'))
+
+
+def _createNode(nodeType, name, parent):
+    # Shared by the commands that create nodes, so only the command itself is counted
+    parentNode = _nodes([parent], missingOk=False)[0] if parent else None
+    if parentNode is None and nodeType in mockScene.SHAPE_TYPES:
+        # A parentless shape gets a transform, like the real createNode
+        parentNode = SCENE.createNode('transform', None if not name else name.replace('Shape', ''))
+    return SCENE.displayName(SCENE.createNode(nodeType, name, parentNode))
+
+
+def shadingNode(nodeType, **kwargs):
+    return _createNode(nodeType, _flag(kwargs, 'name', 'n'), None)
+
+
+def delete(*args, **kwargs):
+    nodes = _nodes(args, missingOk=False) if args else list(SCENE.selection)
+    if _flag(kwargs, 'constructionHistory', 'ch'):
+        for node in nodes:
+            shapes = [node] if not node.children else node.children
+            for shape in shapes:
+                for historyNode in SCENE.history(shape):
+                    SCENE.deleteNode(historyNode)
+        return
+    for node in nodes:
+        SCENE.deleteNode(node)
+
+
+def bakePartialHistory(*args, **kwargs):
+    keepDeformers = _flag(kwargs, 'prePostDeformers', 'ppt')
+    for node in _nodes(args, missingOk=False):
+        for historyNode in SCENE.history(node, keepDeformers=keepDeformers):
+            SCENE.deleteNode(historyNode)
+
+
+def makeIdentity(*args, **kwargs):
+    attrs = []
+    if _flag(kwargs, 'translate', 't', default=True):
+        attrs.append('translate')
+    if _flag(kwargs, 'rotate', 'r', default=True):
+        attrs.append('rotate')
+    if _flag(kwargs, 'scale', 's', default=True):
+        attrs.append('scale')
+    for node in _nodes(args, missingOk=False):
+        for attr in attrs:
+            node.attrs.pop(attr, None)
+    SCENE.modified = True
+
+
+def rename(*args, **kwargs):
+    if len(args) == 1:
+        node, name = SCENE.selection[0], args[0]
+    else:
+        node, name = _nodes(args[:1], missingOk=False)[0], args[1]
+    SCENE.renameNode(node, name)
+    return SCENE.displayName(node)
+
+
+def connectAttr(source, destination, force=False, **kwargs):
+    sourceNode, sourceAttr = SCENE.findPlug(source)
+    destinationNode, destinationAttr = SCENE.findPlug(destination)
+    SCENE.connect(sourceNode, sourceAttr, destinationNode, destinationAttr, force or _flag(kwargs, 'f'))
+
+
+def addAttr(*args, **kwargs):
+    for node in _nodes(args, missingOk=False):
+        node.attrs.setdefault(_flag(kwargs, 'longName', 'ln'), '')
+
+
+def disconnectAttr(source, destination, **kwargs):
+    destinationNode, destinationAttr = SCENE.findPlug(destination)
+    SCENE.disconnect(destinationNode, destinationAttr)
+
+
+def select(*args, **kwargs):
+    if _flag(kwargs, 'clear', 'cl'):
+        SCENE.selection = []
+        return
+    nodes = _nodes(args, missingOk=False)
+    if _flag(kwargs, 'add'):
+        SCENE.selection.extend(node for node in nodes if node not in SCENE.selection)
+    else:
+        SCENE.selection = nodes
+
+
+# Scene files and session
+
+def file(*args, **kwargs):
+    if _flag(kwargs, 'query', 'q'):
+        if _flag(kwargs, 'sceneName', 'sn', 'expandName', 'exn'):
+            return SCENE.sceneName
+        if _flag(kwargs, 'modified', 'mf'):
+            return SCENE.modified
+        return None
+    if _flag(kwargs, 'rename', 'rn'):
+        SCENE.sceneName = _flag(kwargs, 'rename', 'rn')
+        return SCENE.sceneName
+    if _flag(kwargs, 'newFile', 'new'):
+        SCENE.reset()
+        return None
+    if _flag(kwargs, 'save', 's'):
+        SCENE.writeMa(SCENE.sceneName)
+        SCENE.modified = False
+        return SCENE.sceneName
+    if _flag(kwargs, 'exportSelected', 'es'):
+        nodes = list(SCENE.selection)
+        for node in SCENE.selection:
+            nodes.extend(SCENE.descendants(node))
+        SCENE.writeMa(SCENE.sceneName, nodes)
+        return SCENE.sceneName
+    if _flag(kwargs, 'open', 'o'):
+        SCENE.reset()
+        SCENE.readMa(args[0])
+        SCENE.sceneName = args[0]
+        SCENE.modified = False
+        return args[0]
+    if _flag(kwargs, 'i', 'import'):
+        SCENE.readMa(args[0])
+        return args[0]
+    return None
+
+
+def internalVar(**kwargs):
+    # Maya's user app dir, under MAYA_APP_DIR like on a farm worker
+    appDir = os.environ.get('MAYA_APP_DIR', os.path.join(os.path.expanduser('~'), 'maya'))
+    return appDir.rstrip('/') + '/'
+
+
+def workspace(*args, **kwargs):
+    root = os.environ.get('MAYA_PROJECT', os.getcwd())
+    if _flag(kwargs, 'expandName', 'en'):
+        return os.path.join(root, _flag(kwargs, 'expandName', 'en'))
+    if _flag(kwargs, 'query', 'q'):
+        return root
+    return None
+
+
+def undoInfo(*args, **kwargs):
+    return None
+
+
+def refresh(*args, **kwargs):
+    return None
+
+
+def warning(message):
+    # Kept rather than printed so benchmark output stays readable
+    WARNINGS.append(message)
+
+
+def viewFit(*args, **kwargs):
+    return None
+
+
+def playblast(**kwargs):
+    path = _flag(kwargs, 'completeFilename', 'cf')
+    if path:
+        with open(path, 'wb'):
+            pass
+    return path
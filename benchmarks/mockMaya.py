@@ -0,0 +1,92 @@
+"""
+Installs the mock Maya modules into sys.modules so the tools import on a plain Python install.
+
+maya.cmds, maya.mel and maya.api.OpenMaya are backed by one in-memory mockScene. PySide2 and pymel
+are inert stubs: the benchmarks drive the tools' logic, not their UIs, but the modules have
+to import. Call install() before importing any of the tools.
+"""
+import sys
+import types
+from benchmarks import mockCmds
+from benchmarks import mockMel
+from benchmarks import mockOpenMaya
+
+
+class StubType(type):
+    def __getattr__(cls, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Stub()
+
+
+class Stub(metaclass=StubType):
+    """
+    Accepts any call or attribute lookup and returns another Stub, so Qt and pymel code can
+    run without doing anything. Also usable as a base class (QDialog, QObject).
+    """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return Stub()
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Stub()
+
+    def __bool__(self):
+        return False
+
+    def __iter__(self):
+        return iter(())
+
+
+def stubModule(name, **attrs):
+    module = types.ModuleType(name)
+    module.__getattr__ = lambda attr: Stub if attr[:1].isupper() else Stub()
+    module.__dict__.update(attrs)
+    return module
+
+
+def install():
+    """
+    Registers the mock modules, returning the mockScene every maya.cmds call works on.
+    """
+    maya = types.ModuleType('maya')
+    api = types.ModuleType('maya.api')
+    maya.cmds = mockCmds
+    maya.mel = mockMel
+    maya.api = api
+    api.OpenMaya = mockOpenMaya
+    qtWidgets = stubModule('PySide2.QtWidgets')
+    qtCore = stubModule('PySide2.QtCore')
+    qtGui = stubModule('PySide2.QtGui')
+    pyside = stubModule('PySide2', QtWidgets=qtWidgets, QtCore=qtCore, QtGui=qtGui)
+    pymelCore = stubModule('pymel.core', internalVar=mockCmds.internalVar)
+    pymel = stubModule('pymel', core=pymelCore)
+    sys.modules.update({
+        'maya': maya,
+        'maya.cmds': mockCmds,
+        'maya.mel': mockMel,
+        'maya.api': api,
+        'maya.api.OpenMaya': mockOpenMaya,
+        'PySide2': pyside,
+        'PySide2.QtWidgets': qtWidgets,
+        'PySide2.QtCore': qtCore,
+        'PySide2.QtGui': qtGui,
+        'pymel': pymel,
+        'pymel.core': pymelCore,
+    })
+    return mockCmds.SCENE
+
+
+def useMel(enabled):
+    # Hides maya.mel so tools that batch through MEL take their cmds fallback instead
+    maya = sys.modules['maya']
+    if enabled:
+        maya.mel = sys.modules['maya.mel'] = mockMel
+    else:
+        vars(maya).pop('mel', None)
+        sys.modules['maya.mel'] = None
@@ -0,0 +1,69 @@
+"""
+Stand-in for maya.mel that runs the MEL shadingNetwork.NetworkBuilder generates.
+
+Only the statements the builder writes are understood (shadingNode into $n[i], connectAttr,
+disconnectAttr and setAttr on $n[i] or named plugs, addAttr, delete), which is enough to benchmark
+batched network builds.
+"""
+import re
+from benchmarks import mockCmds
+
+SHADING_NODE = re.compile(r'\$n\[(\d+)\] = `shadingNode (.*) (\w+)`;')
+NAME_FLAG = re.compile(r'-name "((?:[^"\\]|\\.)*)"')
+PLUG = r'(\(\$n\[\d+\] \+ "\.[^"]+"\)|"(?:[^"\\]|\\.)*")'
+CONNECT = re.compile(r'connectAttr -force %s %s;' % (PLUG, PLUG))
+DISCONNECT = re.compile(r'disconnectAttr %s %s;' % (PLUG, PLUG))
+DELETE = re.compile(r'delete ("(?:[^"\\]|\\.)*");')
+SET_ATTR = re.compile(r'setAttr (?:-type "(\w+)" )?%s (.*);' % PLUG)
+ADD_ATTR = re.compile(r'addAttr -longName "(\w+)" -dataType "\w+" (\$n\[(\d+)\]|"(?:[^"\\]|\\.)*");')
+REF_PLUG = re.compile(r'\(\$n\[(\d+)\] \+ "\.([^"]+)"\)')
+
+
+def _unquote(text):
+    return text[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+
+
+def _plug(text, names):
+    match = REF_PLUG.match(text)
+    if match:
+        return '%s.%s' % (names[int(match.group(1))], match.group(2))
+    return _unquote(text)
+
+
+def eval(script):
+    names = {}
+    for line in script.splitlines():
+        line = line.strip()
+        match = SHADING_NODE.match(line)
+        if match:
+            name = NAME_FLAG.search(match.group(2))
+            names[int(match.group(1))] = mockCmds._createNode(match.group(3), _unquote('"%s"' % name.group(1))
+                                                              if name else None, None)
+            continue
+        match = CONNECT.match(line)
+        if match:
+            source, sourceAttr = mockCmds.SCENE.findPlug(_plug(match.group(1), names))
+            destination, destinationAttr = mockCmds.SCENE.findPlug(_plug(match.group(2), names))
+            mockCmds.SCENE.connect(source, sourceAttr, destination, destinationAttr, force=True)
+            continue
+        match = DISCONNECT.match(line)
+        if match:
+            destination, destinationAttr = mockCmds.SCENE.findPlug(_plug(match.group(2), names))
+            mockCmds.SCENE.disconnect(destination, destinationAttr)
+            continue
+        match = DELETE.match(line)
+        if match:
+            mockCmds.SCENE.deleteNode(mockCmds.SCENE.find(_unquote(match.group(1))))
+            continue
+        match = ADD_ATTR.match(line)
+        if match:
+            node = names[int(match.group(3))] if match.group(3) else _unquote(match.group(2))
+            mockCmds.SCENE.find(node).attrs.setdefault(match.group(1), '')
+            continue
+        match = SET_ATTR.match(line)
+        if match:
+            node, attr = mockCmds.SCENE.findPlug(_plug(match.group(2), names))
+            value = match.group(3)
+            value = _unquote(value) if match.group(1) else float(value)
+            mockCmds.SCENE.setAttr(node, attr, value)
+    return [names[i] for i in sorted(names)]
@@ -0,0 +1,180 @@
+"""
+Stand-in for the few maya.api.OpenMaya classes the tools use, backed by the same mockScene as
+mockCmds. Scene message callbacks register but never fire.
+"""
+import itertools
+import math
+from benchmarks import mockCmds
+
+_callbackIds = itertools.count(1)
+
+
+class MSpace:
+    kTransform = 1
+    kWorld = 4
+
+
+class MFn:
+    kDagNode = 107
+    kTransform = 110
+
+
+class MVector:
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = x, y, z
+
+
+class MEulerRotation(MVector):
+    pass
+
+
+class MObject:
+    def __init__(self, node=None):
+        self.node = node
+
+    def hasFn(self, fn):
+        if self.node is None:
+            return False
+        if fn == MFn.kTransform:
+            return self.node.nodeType in ('transform', 'joint')
+        return self.node.isDag
+
+
+class MObjectHandle:
+    def __init__(self, obj):
+        self.obj = obj
+
+    def hashCode(self):
+        return id(self.obj.node)
+
+    def isValid(self):
+        return self.obj.node in mockCmds.SCENE.nodes
+
+    def object(self):
+        return self.obj
+
+
+class MDagPath:
+    def __init__(self, node):
+        self.node = node
+
+    def fullPathName(self):
+        return mockCmds.SCENE.longName(self.node)
+
+    @staticmethod
+    def getAllPathsTo(obj):
+        return [MDagPath(obj.node)]
+
+
+class MItDependencyGraph:
+    # Breadth first over the mock scene's connections, downstream only
+    kDownstream = 0
+    kBreadthFirst = 1
+    kNodeLevel = 0
+
+    def __init__(self, root, fn, direction=kDownstream, traversal=kBreadthFirst, level=kNodeLevel):
+        self.fn = fn
+        self.seen = {root.node}
+        self.queue = [root.node]
+        self.current = None
+        self.pruned = False
+        self._advance()
+
+    def _advance(self):
+        # Stops on the next node of type fn, expanding the ones in between
+        while self.queue:
+            node = self.queue.pop(0)
+            if MObject(node).hasFn(self.fn):
+                self.current = node
+                self.pruned = False
+                return
+            self._expand(node)
+        self.current = None
+
+    def _expand(self, node):
+        for sourceAttr, destination, destinationAttr in mockCmds.SCENE.outputs.get(node, ()):
+            if destination not in self.seen:
+                self.seen.add(destination)
+                self.queue.append(destination)
+
+    def isDone(self):
+        return self.current is None
+
+    def currentNode(self):
+        return MObject(self.current)
+
+    def prune(self):
+        self.pruned = True
+
+    def next(self):
+        if not self.pruned:
+            self._expand(self.current)
+        self._advance()
+
+
+class MSelectionList:
+    def __init__(self):
+        self.nodes = []
+
+    def add(self, name):
+        node = mockCmds.SCENE.find(name)
+        if node is None:
+            raise RuntimeError("(kInvalidParameter): Object does not exist")
+        self.nodes.append(node)
+        return self
+
+    def length(self):
+        return len(self.nodes)
+
+    def getDagPath(self, index):
+        return MDagPath(self.nodes[index])
+
+    def getDependNode(self, index):
+        return MObject(self.nodes[index])
+
+
+class MFnTransform:
+    def __init__(self, dagPath):
+        self.node = dagPath.node
+
+    def translation(self, space):
+        return MVector(*mockCmds.SCENE.getAttr(self.node, 'translate'))
+
+    def rotation(self):
+        # Radians, like the real API
+        return MEulerRotation(*(math.radians(v) for v in mockCmds.SCENE.getAttr(self.node, 'rotate')))
+
+    def scale(self):
+        return list(mockCmds.SCENE.getAttr(self.node, 'scale'))
+
+
+def _addCallback(*args, **kwargs):
+    return next(_callbackIds)
+
+
+class MDGMessage:
+    addNodeAddedCallback = staticmethod(_addCallback)
+    addNodeRemovedCallback = staticmethod(_addCallback)
+    addConnectionCallback = staticmethod(_addCallback)
+
+
+class MNodeMessage:
+    kAttributeSet = 1 << 3
+    addNameChangedCallback = staticmethod(_addCallback)
+    addAttributeChangedCallback = staticmethod(_addCallback)
+
+
+class MDagMessage:
+    addAllDagChangesCallback = staticmethod(_addCallback)
+
+
+class MSceneMessage:
+    kAfterOpen = 2
+    kAfterNew = 4
+    addCallback = staticmethod(_addCallback)
+
+
+class MMessage:
+    @staticmethod
+    def removeCallback(callbackId):
+        pass
@@ -0,0 +1,280 @@
+"""
+In-memory model of a Maya scene: nodes, DAG hierarchy, attributes and connections.
+
+Only what the tools touch is modelled. Attribute values are stored, never evaluated, and
+.ma files are written and read back through myPipeline.asciiScene so saved scenes can be
+opened again (or checked by the batch check).
+"""
+import re
+import uuid
+from myPipeline import asciiScene
+
+# Types that live in the DAG even without a parent
+DAG_TYPES = {'transform', 'joint', 'mesh', 'nurbsCurve', 'nurbsSurface', 'camera', 'imagePlane',
+             'ambientLight', 'directionalLight', 'pointLight', 'spotLight', 'locator'}
+SHAPE_TYPES = DAG_TYPES - {'transform', 'joint'}
+GEOMETRY_TYPES = {'mesh', 'nurbsCurve', 'nurbsSurface'}
+# Connections into shapes from these don't count as history
+NON_HISTORY_TYPES = {'displayLayer', 'renderLayer', 'objectSet', 'shadingEngine', 'time', 'groupId'}
+DEFORMER_TYPES = {'skinCluster', 'blendShape', 'cluster', 'tweak', 'lattice', 'ffd', 'wire', 'wrap',
+                  'nonLinear', 'deltaMush', 'softMod', 'groupParts'}
+
+ATTR_ALIASES = {'t': 'translate', 'r': 'rotate', 's': 'scale'}
+COMPONENTS = {
+    'tx': ('translate', 0), 'ty': ('translate', 1), 'tz': ('translate', 2),
+    'translateX': ('translate', 0), 'translateY': ('translate', 1), 'translateZ': ('translate', 2),
+    'rx': ('rotate', 0), 'ry': ('rotate', 1), 'rz': ('rotate', 2),
+    'rotateX': ('rotate', 0), 'rotateY': ('rotate', 1), 'rotateZ': ('rotate', 2),
+    'sx': ('scale', 0), 'sy': ('scale', 1), 'sz': ('scale', 2),
+    'scaleX': ('scale', 0), 'scaleY': ('scale', 1), 'scaleZ': ('scale', 2),
+}
+DEFAULTS = {'translate': (0.0, 0.0, 0.0), 'rotate': (0.0, 0.0, 0.0), 'scale': (1.0, 1.0, 1.0)}
+TRAILING_DIGITS = re.compile(r'\d+$')
+# Nodes every new scene starts with
+DEFAULT_NODES = (('time', 'time1'), ('renderGlobals', 'defaultRenderGlobals'),
+                 ('shadingEngine', 'initialShadingGroup'), ('lambert', 'lambert1'))
+
+
+class Node:
+    __slots__ = ('name', 'nodeType', 'parent', 'children', 'attrs', 'uuid', 'isDag')
+
+    def __init__(self, name, nodeType, parent=None):
+        self.name = name
+        self.nodeType = nodeType
+        self.parent = parent
+        self.children = []
+        self.attrs = {}
+        self.uuid = str(uuid.uuid4()).upper()
+        self.isDag = parent is not None or nodeType in DAG_TYPES
+
+    def __repr__(self):
+        return '<Node %s %s>' % (self.nodeType, self.name)
+
+
+class MockScene:
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nodes = {}
+        self.byName = {}
+        self.byUuid = {}
+        # node: {destination attr: (source node, source attr)}
+        self.inputs = {}
+        # node: {(source attr, destination node, destination attr)}
+        self.outputs = {}
+        self.selection = []
+        self.sceneName = ''
+        for nodeType, name in DEFAULT_NODES:
+            self.createNode(nodeType, name)
+        self.modified = False
+
+    # Names
+
+    def longName(self, node):
+        parts = []
+        while node is not None:
+            parts.append(node.name)
+            node = node.parent
+        return '|' + '|'.join(reversed(parts))
+
+    def displayName(self, node, long=False):
+        # Maya's shortest unique name, or the full path for DAG nodes when asked
+        if node.isDag and (long or len(self.byName[node.name]) > 1):
+            return self.longName(node)
+        return node.name
+
+    def uniqueName(self, name):
+        if name not in self.byName:
+            return name
+        base = TRAILING_DIGITS.sub('', name)
+        number = 1
+        while '%s%d' % (base, number) in self.byName:
+            number += 1
+        return '%s%d' % (base, number)
+
+    def find(self, name):
+        # Resolves a name, partial or full path, or UUID to a node, None if nothing matches
+        name = name.lstrip(':') if not name.startswith('|') else name
+        node = self.byUuid.get(name)
+        if node is not None:
+            return node
+        leaf = name.rpartition('|')[2]
+        candidates = self.byName.get(leaf)
+        if not candidates:
+            return None
+        if '|' not in name:
+            return candidates[0]
+        for node in candidates:
+            path = self.longName(node)
+            if path == name or (not name.startswith('|') and path.endswith('|' + name)):
+                return node
+        return None
+
+    def findPlug(self, plug):
+        # "node.attr" or "node.outColor.outColorR" -> (node, "attr")
+        nodeName, _, attr = plug.partition('.')
+        node = self.find(nodeName)
+        if node is None:
+            raise ValueError("No object matches name: %s" % plug)
+        return node, attr
+
+    # Nodes
+
+    def createNode(self, nodeType, name=None, parent=None):
+        name = self.uniqueName(name or '%s1' % nodeType)
+        node = Node(name, nodeType, parent)
+        if parent is not None:
+            parent.children.append(node)
+        self.nodes[node] = None
+        self.byName.setdefault(name, []).append(node)
+        self.byUuid[node.uuid] = node
+        self.modified = True
+        return node
+
+    def deleteNode(self, node):
+        if node not in self.nodes:
+            return
+        for child in list(node.children):
+            self.deleteNode(child)
+        for attr in list(self.inputs.get(node, {})):
+            self.disconnect(node, attr)
+        for sourceAttr, destination, destinationAttr in list(self.outputs.get(node, ())):
+            self.disconnect(destination, destinationAttr)
+        if node.parent is not None:
+            node.parent.children.remove(node)
+        del self.nodes[node]
+        self.byName[node.name].remove(node)
+        if not self.byName[node.name]:
+            del self.byName[node.name]
+        del self.byUuid[node.uuid]
+        self.selection = [n for n in self.selection if n is not node]
+        self.modified = True
+
+    def renameNode(self, node, name):
+        if name == node.name:
+            return
+        name = self.uniqueName(name)
+        self.byName[node.name].remove(node)
+        if not self.byName[node.name]:
+            del self.byName[node.name]
+        node.name = name
+        self.byName.setdefault(name, []).append(node)
+        self.modified = True
+
+    def descendants(self, node):
+        stack = list(node.children)
+        while stack:
+            child = stack.pop()
+            yield child
+            stack.extend(child.children)
+
+    # Attributes
+
+    def getAttr(self, node, attr):
+        attr = ATTR_ALIASES.get(attr, attr)
+        if attr in COMPONENTS:
+            compound, axis = COMPONENTS[attr]
+            return node.attrs.get(compound, DEFAULTS[compound])[axis]
+        return node.attrs.get(attr, DEFAULTS.get(attr, 0))
+
+    def setAttr(self, node, attr, value):
+        attr = ATTR_ALIASES.get(attr, attr)
+        if attr in COMPONENTS:
+            compound, axis = COMPONENTS[attr]
+            vector = list(node.attrs.get(compound, DEFAULTS[compound]))
+            vector[axis] = float(value)
+            node.attrs[compound] = tuple(vector)
+        else:
+            node.attrs[attr] = value
+        self.modified = True
+
+    # Connections
+
+    def connect(self, source, sourceAttr, destination, destinationAttr, force=False):
+        if destinationAttr in self.inputs.get(destination, {}):
+            if not force:
+                raise RuntimeError("%s.%s is already connected." % (destination.name, destinationAttr))
+            self.disconnect(destination, destinationAttr)
+        self.inputs.setdefault(destination, {})[destinationAttr] = (source, sourceAttr)
+        self.outputs.setdefault(source, set()).add((sourceAttr, destination, destinationAttr))
+        self.modified = True
+
+    def disconnect(self, destination, destinationAttr):
+        source, sourceAttr = self.inputs[destination].pop(destinationAttr)
+        self.outputs[source].discard((sourceAttr, destination, destinationAttr))
+
+    def history(self, node, keepDeformers=False):
+        # Non-DAG nodes upstream of node, stopping at DAG nodes like listHistory(pruneDagObjects=True)
+        found = []
+        seen = set()
+        stack = [source for source, _ in self.inputs.get(node, {}).values()]
+        while stack:
+            source = stack.pop()
+            if source in seen or source.isDag or source.nodeType in NON_HISTORY_TYPES:
+                continue
+            seen.add(source)
+            if not (keepDeformers and source.nodeType in DEFORMER_TYPES):
+                found.append(source)
+            stack.extend(upstream for upstream, _ in self.inputs.get(source, {}).values())
+        return found
+
+    # Files
+
+    def writeMa(self, path, nodes=None):
+        # Writes the nodes (default the whole scene) as a minimal .ma file asciiScene can read back
+        nodes = list(self.nodes) if nodes is None else nodes
+        included = set(nodes)
+        lines = ['//Maya ASCII scene', 'requires maya "2022";']
+        for node in nodes:
+            line = 'createNode %s -n "%s"' % (node.nodeType, node.name)
+            if node.parent is not None and node.parent in included:
+                line += ' -p "%s"' % self.longName(node.parent)
+            lines.append(line + ';')
+            for attr, value in node.attrs.items():
+                if isinstance(value, tuple):
+                    lines.append('\tsetAttr ".%s" -type "double3" %s;' % (attr, ' '.join(repr(v) for v in value)))
+                elif isinstance(value, str):
+                    lines.append('\tsetAttr ".%s" -type "string" "%s";' % (attr, value.replace('"', '\\"')))
+                else:
+                    lines.append('\tsetAttr ".%s" %s;' % (attr, value))
+        for destination in nodes:
+            for destinationAttr, (source, sourceAttr) in self.inputs.get(destination, {}).items():
+                if source in included:
+                    lines.append('connectAttr "%s.%s" "%s.%s";' % (source.name, sourceAttr, destination.name,
+                                                                 destinationAttr))
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def readMa(self, path):
+        # Adds the nodes of a .ma file to the scene, returning them
+        created = {}
+        connections = []
+        for record in asciiScene.readRecords(path):
+            if isinstance(record, asciiScene.CreateNode):
+                parent = self.find(record.parent) if record.parent else None
+                node = self.createNode(record.nodeType, record.name, parent)
+                created[record.name] = node
+            elif isinstance(record, asciiScene.SetAttr) and record.node in created:
+                self.setAttr(created[record.node], record.attr, parseValue(record))
+            elif isinstance(record, asciiScene.ConnectAttr):
+                connections.append(record)
+        for record in connections:
+            source, sourceAttr = record.source.partition('.')[::2]
+            destination, destinationAttr = record.destination.partition('.')[::2]
+            if source in created and destination in created:
+                self.connect(created[source], sourceAttr, created[destination], destinationAttr, force=True)
+        return list(created.values())
+
+
+def parseValue(record):
+    if record.valueType == 'string':
+        return record.values[0] if record.values else ''
+    values = []
+    for value in record.values:
+        try:
+            values.append(float(value))
+        except ValueError:
+            values.append(value)
+    return values[0] if len(values) == 1 else tuple(values)
@@ -0,0 +1,174 @@
+"""
+Times the pipeline tools against the mock Maya on synthetic data.
+
+Every operation reports its wall time and how many maya.cmds calls it made, which is the
+number that matters most inside Maya, where each call is far slower than in the mock.
+
+    python -m benchmarks.run [--sizes 1000 10000 100000] [--textures 10] [--controllers 200] [--json out.json]
+                             [--profile]
+
+With --profile every operation also prints a flame-style breakdown of its calls by tool method.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from benchmarks import mockMaya
+from benchmarks import sceneGen
+
+SCENE = mockMaya.install()
+
+# The tools import maya at module level, so they come after install()
+from myPipeline import asciiScene  # noqa: E402
+from myPipeline import mayaCalls  # noqa: E402
+from myPipeline import sceneCheck  # noqa: E402
+from myPipeline import sceneSnapshot  # noqa: E402
+
+
+class Benchmark:
+    """
+    Collects one row per measured operation.
+    """
+
+    def __init__(self, profile=False):
+        self.rows = []
+        self.profile = profile
+
+    def measure(self, operation, size, function, *args, **kwargs):
+        # The tools print as they go, which would drown the report
+        nodeCount = len(SCENE.nodes)
+        with contextlib.redirect_stdout(io.StringIO()):
+            profile = mayaCalls.startProfile() if self.profile else None
+            start = time.perf_counter()
+            with mayaCalls.counting() as counter:
+                result = function(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            if profile:
+                mayaCalls.stopProfile(profile)
+        self.add(operation, size, seconds, counter.calls, len(SCENE.nodes) - nodeCount)
+        if profile:
+            print(profile.report() + '\n')
+        return result
+
+    def add(self, operation, size, seconds, calls, nodes=0):
+        # nodes is how many nodes the operation added to (or removed from) the scene
+        row = {'operation': operation, 'size': size, 'seconds': round(seconds, 6), 'calls': calls, 'nodes': nodes}
+        self.rows.append(row)
+        print('%-40s %8s %10.4fs %8d calls %+8d nodes' % (operation, size, seconds, calls, nodes))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.rows, f, indent=4)
+
+
+def benchScene(bench, size, workDir):
+    sceneGen.buildScene(SCENE, size)
+    bench.measure('SceneSnapshot', size, sceneSnapshot.SceneSnapshot)
+
+    check = sceneCheck.SceneCheck()
+    snapshot = check.takeSnapshot()
+    # runChecks already times each check and counts its calls
+    results = check.runChecks(snapshot)
+    for name, result in results.items():
+        bench.add('check %s' % name, size, result.duration, result.callCount)
+
+    path = os.path.join(workDir, 'scene%d.ma' % size)
+    SCENE.writeMa(path)
+    bench.measure('asciiScene.checkFile', size, asciiScene.checkFile, path)
+
+    failures = {name: result.failed for name, result in results.items()}
+    bench.measure('SceneCheck.fixAll', size, check.fixAll, failures, snapshot)
+
+
+def benchTextures(bench, textureSets, workDir):
+    from myPipeline import substanceImporter
+
+    folder = os.path.join(workDir, 'textures%d' % textureSets)
+    names = sceneGen.makeTextureFolder(folder, textureSets)
+    importer = substanceImporter.SubImporter()
+    for create in (importer.createMayaMaterial, importer.createArnoldMaterial):
+        SCENE.reset()
+
+        def importAll():
+            for name in names:
+                attrs = {channel: '%s_%s.png' % (name, channel) for channel in sceneGen.CHANNELS if channel != 'normal'}
+                attrs['isHeightNormal'] = False
+                create(folder, attrs)
+
+        bench.measure('SubImporter.%s' % create.__name__, textureSets, importAll)
+
+    # Batched through one mel.eval, and through the cmds fallback the builder uses without maya.mel
+    for useMel in (True, False):
+        SCENE.reset()
+        mockMaya.useMel(useMel)
+        bench.measure('SubImporter.importExportTree%s' % ('' if useMel else ' (cmds)'), textureSets,
+                      importer.importExportTree, folder, arnold=False)
+    mockMaya.useMel(True)
+
+    # Re-importing an unchanged export only reads the existing networks back
+    SCENE.reset()
+    with contextlib.redirect_stdout(io.StringIO()):
+        importer.importExportTree(folder, arnold=False)
+    bench.measure('SubImporter.importExportTree (update)', textureSets, importer.importExportTree, folder,
+                  arnold=False, incremental=True)
+
+
+def benchLibrary(bench, count, workDir):
+    from conLibrary import libraryUI
+
+    directory = os.path.join(workDir, 'controllerLibrary')
+    sceneGen.makeControllerLibrary(directory, count)
+    library = libraryUI.ControllerLibrary()
+    SCENE.reset()
+    bench.measure('ControllerLibrary.find', count, library.find, directory)
+    bench.measure('ControllerLibrary.load', count, lambda: [library.load(name) for name in list(library)])
+    SCENE.reset()
+    sceneGen.buildScene(SCENE, 100)
+    bench.measure('ControllerLibrary.save', 1, library.save, 'benchCtrl', directory, screenshot=True)
+
+
+def benchPipeline(bench, workDir):
+    from myPipeline import myFirstPipeline
+
+    # Built without __init__, which needs Maya's main window for its menu
+    tools = object.__new__(myFirstPipeline.PipelineTools)
+    tools.DIRECTORY = os.path.join(workDir, 'pipeline')
+    sceneGen.buildScene(SCENE, 1000)
+    SCENE.sceneName = os.path.join(workDir, 'pipeline', 'Props', 'box', 'box_modeling', 'box_modeling_001.ma')
+    os.makedirs(os.path.dirname(SCENE.sceneName), exist_ok=True)
+    SCENE.modified = True
+    bench.measure('PipelineTools.incrementScene', 1000, tools.incrementScene)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline tools against a mock Maya.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help="Scene sizes in nodes")
+    parser.add_argument('--textures', type=int, nargs='+', default=[1, 10], help="Texture sets per folder")
+    parser.add_argument('--controllers', type=int, default=200, help="Controllers in the library")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--profile', action='store_true', help="Print each operation's calls by tool method")
+    args = parser.parse_args(argv)
+
+    bench = Benchmark(args.profile)
+    with tempfile.TemporaryDirectory() as workDir:
+        # Where internalVar(userAppDir=True) points, importFromPipeline scans its Props at import
+        os.environ['MAYA_APP_DIR'] = workDir
+        os.environ['MAYA_PROJECT'] = workDir
+        os.makedirs(os.path.join(workDir, 'pipeline', 'Props'))
+        for size in args.sizes:
+            benchScene(bench, size, workDir)
+        for textureSets in args.textures:
+            benchTextures(bench, textureSets, workDir)
+        benchLibrary(bench, args.controllers, workDir)
+        benchPipeline(bench, workDir)
+    if args.json:
+        bench.save(args.json)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
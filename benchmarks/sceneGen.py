@@ -0,0 +1,121 @@
+"""
+Synthetic scenes, texture folders and controller libraries for the benchmarks.
+
+Everything is built straight on the mockScene (or disk) so generating a scene costs no cmds
+calls. Scenes are seeded, so the same size always gives the same scene, with a share of
+unfrozen transforms, bad names, construction history and image planes for the checks to find.
+"""
+import json
+import os
+import random
+import struct
+import zlib
+
+CHANNELS = ('basecolor', 'metalness', 'roughness', 'emissive', 'bump', 'opacity', 'normal')
+# Channels Substance usually exports as the same flat map for every texture set
+FLAT_CHANNELS = ('emissive', 'opacity')
+# Meshes per asset group
+GROUP_SIZE = 10
+
+
+def buildScene(scene, nodeCount, seed=0, failRate=0.1):
+    """
+    Fills the scene with roughly nodeCount nodes: asset groups of meshes, each mesh with a
+    transform, a shape and usually a polyCube history node, plus a few rigged meshes and image planes.
+
+    Args:
+        scene (MockScene) The scene to fill, reset first
+        nodeCount (int) Approximate number of nodes to create
+        seed (int) Seed for the random choices
+        failRate (float) Share of nodes given each kind of problem
+    """
+    rng = random.Random(seed)
+    scene.reset()
+    for camera in ('persp', 'top', 'front', 'side'):
+        transform = scene.createNode('transform', camera)
+        scene.createNode('camera', '%sShape' % camera, transform)
+    layer = scene.createNode('displayLayer', 'layer1')
+
+    group = None
+    mesh = 0
+    while len(scene.nodes) < nodeCount:
+        if mesh % GROUP_SIZE == 0:
+            group = scene.createNode('transform', 'asset%d_GRP' % (mesh // GROUP_SIZE))
+        name = 'part%d' % mesh if rng.random() < failRate else 'part%d_GEO' % mesh
+        transform = scene.createNode('transform', name, group)
+        shape = scene.createNode('mesh', '%sShape' % name, transform)
+        if rng.random() < failRate:
+            scene.setAttr(transform, 'translate', tuple(rng.uniform(-10, 10) for _ in range(3)))
+        if rng.random() < failRate:
+            scene.setAttr(transform, 'rotate', (0.0, rng.uniform(0, 360), 0.0))
+        scene.connect(layer, 'drawInfo', transform, 'drawOverride')
+        if rng.random() < failRate:
+            polyCube = scene.createNode('polyCube', 'polyCube%d' % mesh)
+            scene.connect(polyCube, 'output', shape, 'inMesh')
+        if rng.random() < failRate / 10:
+            addSkin(scene, shape, 'rig%d' % mesh)
+        if rng.random() < failRate / 10:
+            plane = scene.createNode('transform', 'imagePlane%d' % mesh)
+            scene.createNode('imagePlane', 'imagePlaneShape%d' % mesh, plane)
+        mesh += 1
+    scene.modified = False
+    return scene
+
+
+def addSkin(scene, shape, name):
+    root = scene.createNode('joint', '%s_root_JNT' % name)
+    tip = scene.createNode('joint', '%s_tip_JNT' % name, root)
+    scene.setAttr(tip, 'translate', (0.0, 1.0, 0.0))
+    skin = scene.createNode('skinCluster', '%s_skinCluster' % name)
+    tweak = scene.createNode('tweak', '%s_tweak' % name)
+    scene.connect(tweak, 'outputGeometry', skin, 'input')
+    scene.connect(root, 'worldMatrix', skin, 'matrix')
+    scene.connect(skin, 'outputGeometry', shape, 'inMesh', force=True)
+
+
+def writePng(path, width, height, comment=None):
+    # A valid, black RGB png, cheap to write at any size. A comment makes the file's contents unique
+    row = b'\x00' + b'\x00' * (width * 3)
+    data = zlib.compress(row * height, 1)
+
+    def chunk(kind, body):
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        if comment:
+            f.write(chunk(b'tEXt', b'Comment\x00' + comment.encode()))
+        f.write(chunk(b'IDAT', data))
+        f.write(chunk(b'IEND', b''))
+
+
+def makeTextureFolder(directory, textureSets=1, channels=CHANNELS, resolution=64):
+    """
+    Writes a Substance style export folder: <set>_<channel>.png for every texture set and channel.
+    Every image is unique except the FLAT_CHANNELS ones, which are identical across sets.
+
+    Returns:
+        [texture set names]
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = ['set%d' % i for i in range(textureSets)]
+    for name in names:
+        for channel in channels:
+            writePng(os.path.join(directory, '%s_%s.png' % (name, channel)), resolution, resolution,
+                     None if channel in FLAT_CHANNELS else '%s_%s' % (name, channel))
+    return names
+
+
+def makeControllerLibrary(directory, count):
+    # Controllers as the ControllerLibrary saves them: <name>.ma, <name>.json and <name>.jpg
+    os.makedirs(directory, exist_ok=True)
+    for i in range(count):
+        name = 'ctrl%d' % i
+        with open(os.path.join(directory, '%s.ma' % name), 'w') as f:
+            f.write('//Maya ASCII scene\ncreateNode transform -n "%s_CV";\n'
+                    'createNode nurbsCurve -n "%s_CVShape" -p "%s_CV";\n' % (name, name, name))
+        with open(os.path.join(directory, '%s.json' % name), 'w') as f:
+            json.dump({'name': name}, f)
+        with open(os.path.join(directory, '%s.jpg' % name), 'wb'):
+            pass
@@ -0,0 +1,4 @@
+from myPipeline import mayaCalls
+
+# Opt-in profiling of every cmds call for the whole session, see mayaCalls
+mayaCalls.enableFromEnvironment()
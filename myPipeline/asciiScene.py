@@ -0,0 +1,340 @@
+"""
+Maya-free reader for Maya ASCII (.ma) files.
+
+readRecords streams a file statement by statement and yields the createNode, setAttr,
+connectAttr and parent records, so a scene never has to be loaded into memory (or into Maya).
+AsciiSnapshot builds the same interface as sceneSnapshot.SceneSnapshot from those records,
+which lets the SceneRules run on plain Python workers:
+
+    python -m myPipeline.asciiScene path/to/scene.ma [...]
+"""
+import collections
+import re
+import sys
+import numpy as np
+from myPipeline import fileUtils
+from myPipeline import historyIndex
+from myPipeline import sceneRules
+
+CreateNode = collections.namedtuple('CreateNode', 'nodeType name parent shared')
+SetAttr = collections.namedtuple('SetAttr', 'node attr valueType values')
+ConnectAttr = collections.namedtuple('ConnectAttr', 'source destination')
+Parent = collections.namedtuple('Parent', 'children parent shape relative add')
+
+# Quoted strings, bare words and statement ends
+TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[^\s";]+|;')
+COMMANDS = {'createNode', 'setAttr', 'connectAttr', 'parent', 'select'}
+# setAttr flags that take a value
+SETATTR_VALUE_FLAGS = {'-k', '-keyable', '-l', '-lock', '-s', '-size', '-cb', '-channelBox',
+                       '-c', '-caching', '-ch', '-capacityHint'}
+
+# Types that are DAG nodes even when created without a parent
+ROOT_DAG_TYPES = {'transform', 'joint', 'ikHandle', 'lodGroup', 'place3dTexture'}
+# Shapes that ls(geometry=True) lists
+GEOMETRY_TYPES = {'mesh', 'nurbsCurve', 'nurbsSurface', 'subdiv', 'bezierCurve'}
+TRANSFORM_ATTRS = {
+    't': ('translate', None), 'translate': ('translate', None),
+    'tx': ('translate', 0), 'ty': ('translate', 1), 'tz': ('translate', 2),
+    'r': ('rotate', None), 'rotate': ('rotate', None),
+    'rx': ('rotate', 0), 'ry': ('rotate', 1), 'rz': ('rotate', 2),
+    's': ('scale', None), 'scale': ('scale', None),
+    'sx': ('scale', 0), 'sy': ('scale', 1), 'sz': ('scale', 2),
+}
+
+
+def unquote(token):
+    if token.startswith('"'):
+        return token[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return token
+
+
+def isFlag(token):
+    return token.startswith('-') and token[1:2].isalpha()
+
+
+def iterStatements(lines, setAttrNames=None):
+    """
+    Yields the tokens of each top level statement we care about.
+
+    Statements we don't parse, and setAttrs on attributes outside setAttrNames, are skipped
+    without being tokenised, which is where most of a .ma file's bulk (mesh data) lives.
+    """
+    tokens = []
+    skipping = False
+    for line in lines:
+        if line.startswith('//'):
+            # Comment lines (the file header) aren't statements and have no ';' to end them
+            continue
+        if skipping and '"' not in line:
+            # Fast path for unquoted data lines, only look for the end of the statement
+            end = line.find(';')
+            if end < 0:
+                continue
+            line = line[end + 1:]
+            tokens = []
+            skipping = False
+        for match in TOKEN.finditer(line):
+            token = match.group()
+            if token == ';':
+                if tokens and not skipping:
+                    yield tokens
+                tokens = []
+                skipping = False
+            elif not skipping:
+                tokens.append(token)
+                if len(tokens) == 1:
+                    skipping = token not in COMMANDS
+                elif setAttrNames is not None and tokens[0] == 'setAttr' and isAttrToken(tokens):
+                    attr = unquote(token).rpartition('.')[2].partition('[')[0]
+                    skipping = attr not in setAttrNames
+
+
+def isAttrToken(tokens):
+    # True when the last token is the attribute a setAttr statement sets
+    token = tokens[-1]
+    if not token.startswith('"') or tokens[-2] == '-type':
+        return False
+    return not any(t.startswith('"') for t in tokens[1:-1])
+
+
+def readRecords(path, setAttrNames=None, digest=None):
+    # Streams the records of a .ma file. setAttrNames limits which setAttr statements are parsed,
+    # digest (a hashlib object) is fed the file's bytes as they are read
+    currentNode = None
+    with fileUtils.openText(path, digest) as f:
+        for tokens in iterStatements(f, setAttrNames):
+            command = tokens[0]
+            if command == 'createNode':
+                record = parseCreateNode(tokens)
+                currentNode = record.name
+                yield record
+            elif command == 'select':
+                # "select -ne node" makes node the target of the setAttrs that follow
+                names = [unquote(t) for t in tokens[1:] if not isFlag(t)]
+                if names:
+                    currentNode = names[-1]
+            elif command == 'setAttr':
+                record = parseSetAttr(tokens, currentNode)
+                if record:
+                    yield record
+            elif command == 'connectAttr':
+                plugs = [unquote(t) for t in tokens[1:] if not isFlag(t)]
+                if len(plugs) >= 2:
+                    yield ConnectAttr(plugs[0], plugs[1])
+            elif command == 'parent':
+                yield parseParent(tokens)
+
+
+def parseCreateNode(tokens):
+    name = parent = None
+    shared = False
+    i = 2
+    while i < len(tokens):
+        token = tokens[i]
+        if token in ('-n', '-name'):
+            name = unquote(tokens[i + 1])
+            i += 1
+        elif token in ('-p', '-parent'):
+            parent = unquote(tokens[i + 1])
+            i += 1
+        elif token in ('-s', '-shared'):
+            shared = True
+        i += 1
+    return CreateNode(tokens[1], name, parent, shared)
+
+
+def parseSetAttr(tokens, currentNode):
+    attr = valueType = None
+    values = []
+    i = 1
+    while i < len(tokens):
+        token = tokens[i]
+        if token == '-type':
+            valueType = unquote(tokens[i + 1])
+            i += 1
+        elif token in SETATTR_VALUE_FLAGS:
+            i += 1
+        elif isFlag(token):
+            pass
+        elif attr is None:
+            attr = unquote(token)
+        else:
+            values.append(unquote(token))
+        i += 1
+    if attr is None:
+        return None
+    node = currentNode
+    if not attr.startswith('.'):
+        node, _, attr = attr.partition('.')
+    return SetAttr(node, attr.lstrip('.'), valueType, values)
+
+
+def parseParent(tokens):
+    flags = {t for t in tokens[1:] if isFlag(t)}
+    names = [unquote(t) for t in tokens[1:] if not isFlag(t)]
+    if '-w' in flags or '-world' in flags:
+        return Parent(names, None, '-s' in flags, '-r' in flags, '-add' in flags)
+    return Parent(names[:-1], names[-1], '-s' in flags, '-r' in flags, '-add' in flags)
+
+
+def plugNode(plug):
+    # ":initialShadingGroup.dsm" -> "initialShadingGroup"
+    return plug.partition('.')[0].lstrip(':')
+
+
+class AsciiSnapshot:
+    """
+    SceneSnapshot look-alike built from a .ma file instead of a live scene.
+
+    Only names, types, hierarchy, transform values and connections are kept, so even very
+    large files stay small in memory.
+    """
+
+    def __init__(self, path, digest=None):
+        self.path = path
+        self.types = {}
+        self.children = {}
+        self.parents = {}
+        self.geometry = []
+        self.imagePlanes = []
+        self._byName = {}
+        self._dgTypes = {}
+        self._transformIndex = {}
+        self._values = {}
+        self._historyIndex = historyIndex.HistoryIndex()
+        self.collect(digest)
+
+    def collect(self, digest=None):
+        connections = []
+        for record in readRecords(self.path, set(TRANSFORM_ATTRS), digest):
+            if isinstance(record, CreateNode):
+                self.addNode(record)
+            elif isinstance(record, SetAttr):
+                self.setTransformValue(record)
+            elif isinstance(record, ConnectAttr):
+                connections.append((plugNode(record.source), plugNode(record.destination)))
+            elif isinstance(record, Parent):
+                self.reparent(record)
+
+        self.geometry = [path for path, nodeType in self.types.items() if nodeType in GEOMETRY_TYPES]
+        self.imagePlanes = [path for path, nodeType in self.types.items() if nodeType == 'imagePlane']
+        self.indexHistory(connections)
+
+        paths = self.nodesOfType(('transform', 'joint'))
+        self._transformIndex = {path: i for i, path in enumerate(paths)}
+        values = [self._values.get(path, {}) for path in paths]
+        self._translate = np.array([v.get('translate', (0.0, 0.0, 0.0)) for v in values]).reshape(-1, 3)
+        self._rotate = np.array([v.get('rotate', (0.0, 0.0, 0.0)) for v in values]).reshape(-1, 3)
+        self._scale = np.array([v.get('scale', (1.0, 1.0, 1.0)) for v in values]).reshape(-1, 3)
+        self._values = {}
+
+    def resolve(self, name):
+        # Turns a name as written in the file (short, partial or full path) into a full path
+        if name is None:
+            return None
+        if name in self.types:
+            return name
+        leaf = name.rpartition('|')[2]
+        candidates = self._byName.get(leaf, [])
+        for path in reversed(candidates):
+            if path.endswith('|' + name.lstrip('|')):
+                return path
+        return None
+
+    def addNode(self, record):
+        parentPath = self.resolve(record.parent)
+        if parentPath is None and record.parent is None and record.nodeType not in ROOT_DAG_TYPES:
+            self._dgTypes[record.name] = record.nodeType
+            return
+        path = '%s|%s' % (parentPath or '', record.name)
+        self.types[path] = record.nodeType
+        self._byName.setdefault(record.name, []).append(path)
+        if parentPath:
+            self.parents[path] = parentPath
+            self.children.setdefault(parentPath, []).append(path)
+
+    def reparent(self, record):
+        # Only instancing (parent -add) adds paths, moving nodes around is rare in saved files
+        parentPath = self.resolve(record.parent)
+        if not record.add or parentPath is None:
+            return
+        for child in record.children:
+            childPath = self.resolve(child)
+            if childPath:
+                path = '%s|%s' % (parentPath, childPath.rpartition('|')[2])
+                self.types[path] = self.types[childPath]
+                self.parents[path] = parentPath
+                self.children.setdefault(parentPath, []).append(path)
+
+    def setTransformValue(self, record):
+        path = self.resolve(record.node)
+        if path is None or self.types[path] not in ('transform', 'joint') or record.attr not in TRANSFORM_ATTRS:
+            return
+        attr, axis = TRANSFORM_ATTRS[record.attr]
+        try:
+            values = [float(v) for v in record.values]
+        except ValueError:
+            return
+        current = self._values.setdefault(path, {})
+        if axis is None:
+            if len(values) == 3:
+                current[attr] = tuple(values)
+        elif values:
+            default = 1.0 if attr == 'scale' else 0.0
+            vector = list(current.get(attr, (default, default, default)))
+            vector[axis] = values[0]
+            current[attr] = tuple(vector)
+
+    def indexHistory(self, connections):
+        index = self._historyIndex
+        for source, destination in connections:
+            if source in self._dgTypes:
+                index.addConnection(source, self.resolve(destination) or destination, self._dgTypes[source])
+        index.indexed.update(self.geometry)
+
+    def nodesOfType(self, nodeTypes, nodes=None):
+        if nodes is None:
+            return [path for path, nodeType in self.types.items() if nodeType in nodeTypes]
+        return [path for path in nodes if self.types.get(path) in nodeTypes]
+
+    def transformArrays(self, paths):
+        rows = [self._transformIndex[path] for path in paths]
+        return self._translate[rows], self._rotate[rows], self._scale[rows]
+
+    def historyIndex(self, shapes=None):
+        # Every shape is indexed while the file is read
+        return self._historyIndex
+
+    def hasHistory(self, geo):
+        return self._historyIndex.hasHistory(geo)
+
+    def historyKinds(self, geo):
+        return self._historyIndex.historyKinds(geo)
+
+
+def checkFile(path, rules=None, digest=None):
+    # Runs the scene check rules over a .ma file, returning the snapshot and {rule: CheckResult}
+    rules = rules or sceneRules.SceneRules()
+    snapshot = AsciiSnapshot(path, digest)
+    return snapshot, rules.checkAll(snapshot)
+
+
+def main(paths):
+    failedFiles = 0
+    rules = sceneRules.SceneRules()
+    for path in paths:
+        snapshot, results = checkFile(path, rules)
+        if all(results.values()):
+            print('passed %s' % path)
+            continue
+        failedFiles += 1
+        print('FAILED %s' % path)
+        for result in results.values():
+            if not result.passed:
+                print('    %s %s' % (sceneRules.FAILURE_MESSAGES[result.rule],
+                                  [rules.formatFailure(snapshot, result.rule, node) for node in result.failed]))
+    return 1 if failedFiles else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,161 @@
+"""
+Batch scene check of the whole pipeline tree, without Maya.
+
+Walks pipeline/Master/<prop>/<prop>_<dept> and pipeline/Props, checks every .ma file with the
+SceneRules on a process pool and writes one consolidated report. Results are cached by file
+mtime/size (and content hash when those change) and the rules they were checked with, so
+nightly sweeps only re-check changed files, and an interrupted run picks up where it left off.
+
+    python -m myPipeline.batchCheck [pipelineDir] [--report report.json] [--csv checks.csv] [--workers N]
+"""
+import argparse
+import concurrent.futures
+import csv
+import hashlib
+import os
+import sys
+import time
+from myPipeline import asciiScene
+from myPipeline import fileUtils
+from myPipeline import sceneRules
+
+# pm.internalVar(userAppDir=True) without needing Maya
+DIRECTORY = os.path.join(os.environ.get('MAYA_APP_DIR', os.path.join(os.path.expanduser('~'), 'maya')),
+                         'pipeline')
+CACHE_FILE = 'sceneCheckCache.json'
+REPORT_FILE = 'sceneCheckReport.json'
+# Results written to the cache between saves, so a killed run loses little work
+SAVE_EVERY = 25
+# Bumped whenever the .ma reader or the checks change what they report, older results are re-checked
+CACHE_VERSION = 2
+
+
+def findScenes(directory=DIRECTORY):
+    scenes = []
+    for area in ('Master', 'Props'):
+        for root, dirs, files in os.walk(os.path.join(directory, area)):
+            dirs.sort()
+            scenes.extend(os.path.join(root, f) for f in sorted(files) if f.endswith('.ma'))
+    return scenes
+
+
+def checkScene(path):
+    # Runs in a worker process
+    start = time.perf_counter()
+    rules = sceneRules.SceneRules()
+    checks = {}
+    # Hashed as it is parsed, rather than read a second time
+    digest = hashlib.sha1()
+    try:
+        snapshot, results = asciiScene.checkFile(path, rules, digest)
+        for rule, result in results.items():
+            checks[rule] = result.toDict()
+            checks[rule]['failed'] = [rules.formatFailure(snapshot, rule, node) for node in result.failed]
+        error = None
+    except Exception as e:
+        error = '%s: %s' % (type(e).__name__, e)
+    return {
+        'hash': fileUtils.fileHash(path) if error else digest.hexdigest(),
+        'checks': checks,
+        'passed': error is None and all(check['passed'] for check in checks.values()),
+        'error': error,
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+
+def checkTotals(cache):
+    # Time, node count and failures per check across the whole corpus, to see which checks cost the most
+    totals = {}
+    for entry in cache.values():
+        for rule, check in entry.get('checks', {}).items():
+            total = totals.setdefault(rule, {'duration': 0.0, 'nodeCount': 0, 'failedScenes': 0, 'failedNodes': 0})
+            total['duration'] = round(total['duration'] + check['duration'], 6)
+            total['nodeCount'] += check['nodeCount']
+            total['failedScenes'] += not check['passed']
+            total['failedNodes'] += len(check['failed'])
+    return totals
+
+
+def rulesSignature():
+    return '%d|%s' % (CACHE_VERSION, sceneRules.SceneRules().signature())
+
+
+def isCached(entry, path, stat, signature):
+    if not entry or entry.get('rules') != signature:
+        return False
+    if entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+        return True
+    # Touched but maybe not changed (copied, re-saved unchanged), the hash has the final say
+    if entry['size'] == stat.st_size and entry['hash'] == fileUtils.fileHash(path):
+        entry['mtime'] = stat.st_mtime
+        return True
+    return False
+
+
+def runBatch(directory=DIRECTORY, reportPath=None, workers=None, csvPath=None):
+    cachePath = os.path.join(directory, CACHE_FILE)
+    reportPath = reportPath or os.path.join(directory, REPORT_FILE)
+    cache = fileUtils.loadJson(cachePath, {})
+    scenes = findScenes(directory)
+    signature = rulesSignature()
+
+    toCheck = []
+    for path in scenes:
+        stat = os.stat(path)
+        if not isCached(cache.get(path), path, stat, signature):
+            toCheck.append((path, stat))
+    print('%d scenes found, %d to check' % (len(scenes), len(toCheck)))
+
+    if toCheck:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {pool.submit(checkScene, path): (path, stat) for path, stat in toCheck}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                path, stat = futures[future]
+                result = future.result()
+                result.update(mtime=stat.st_mtime, size=stat.st_size, rules=signature)
+                cache[path] = result
+                print('[%d/%d] %s %s' % (done, len(toCheck), 'passed' if result['passed'] else 'FAILED', path))
+                if done % SAVE_EVERY == 0:
+                    fileUtils.saveJson(cache, cachePath, indent=4)
+
+    # Files that no longer exist drop out of the cache and the report
+    cache = {path: cache[path] for path in scenes}
+    fileUtils.saveJson(cache, cachePath, indent=4)
+    report = {
+        'directory': directory,
+        'scenes': len(scenes),
+        'failed': sorted(path for path, entry in cache.items() if not entry['passed']),
+        'checkTotals': checkTotals(cache),
+        'results': cache
+    }
+    fileUtils.saveJson(report, reportPath, indent=4)
+    if csvPath:
+        writeCsv(cache, csvPath)
+    print('%d of %d scenes failed, report written to %s' % (len(report['failed']), len(scenes), reportPath))
+    return report
+
+
+def writeCsv(cache, csvPath):
+    # One row per scene and check
+    with open(csvPath, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('scene',) + sceneRules.CheckResult.FIELDS)
+        for path, entry in cache.items():
+            for check in entry.get('checks', {}).values():
+                row = dict(check, failed=';'.join(check['failed']))
+                writer.writerow([path] + [row[field] for field in sceneRules.CheckResult.FIELDS])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scene check every .ma file in the pipeline.")
+    parser.add_argument('directory', nargs='?', default=DIRECTORY)
+    parser.add_argument('--report', help="Where to write the report (default: <directory>/%s)" % REPORT_FILE)
+    parser.add_argument('--csv', help="Also write one row per scene and check to this CSV file")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per core)")
+    args = parser.parse_args(argv)
+    report = runBatch(args.directory, args.report, args.workers, args.csv)
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+The material networks texture sets become, per renderer target, declared as plain data.
+
+compilePlan turns a target into a ConnectionPlan once per combination of channels. Extra
+targets are read from the <target>.json files in the PIPELINE_MATERIAL_TARGETS folders.
+"""
+import functools
+import json
+import os
+from myPipeline import channelPacking
+from myPipeline import textureIndex
+
+TARGETS_ENV = 'PIPELINE_MATERIAL_TARGETS'
+# The texture set channels, in the order their nodes are made
+CHANNELS = ('baseColor', 'metalness', 'roughness', 'emissive', 'bump', 'opacity')
+# {target: {
+#     shader: material node type, requires: [[plugin, version]] for .ma files,
+#     texture: {type, pathAttr, suffix: node name suffix, placement: wired to a shared
+#         place2dTexture like Maya's file node, udimToken: how the node spells <UDIM>,
+#         udimAttrs/singleAttrs: set for UDIM sequences/single images, channelPlugs: R, G and B},
+#     channels: {channel: [[texture plug, material attribute]]} for channels wired straight in,
+#     packed: {channel: [material attributes]} read from the channel's R, G or B of a packed image,
+#     packedAttrs: set on packed textures,
+#     bump: {'bump' or 'normal': {type, suffix, plug, input, output, attr, attrs: set on the
+#         helper, textureAttrs: set on its texture}}, a None suffix leaves naming the helper to Maya
+# }}
+TARGETS = {
+    'maya': {
+        'shader': 'blinn',
+        'requires': [],
+        'texture': {
+            'type': 'file', 'pathAttr': 'fileTextureName', 'suffix': 'tx', 'placement': True,
+            'udimToken': '<UDIM>', 'udimAttrs': {'uvTilingMode': 3}, 'singleAttrs': {'uvTilingMode': 0}
+        },
+        'channels': {
+            'baseColor': [['outColor', 'color']],
+            'metalness': [['outColor.outColorR', 'reflectivity']],
+            'roughness': [['outColor.outColorR', 'specularRollOff']],
+            'emissive': [['outColor', 'incandescence']],
+            'opacity': [['outColor', 'transparency']]
+        },
+        'packed': {
+            'metalness': ['reflectivity'],
+            'roughness': ['specularRollOff'],
+            'opacity': ['transparencyR', 'transparencyG', 'transparencyB']
+        },
+        'packedAttrs': {'ignoreColorSpaceFileRules': True, 'colorSpace': 'Raw'},
+        'bump': {
+            'bump': {'type': 'bump2d', 'suffix': 'BMP', 'plug': 'outAlpha', 'input': 'bumpValue',
+                     'output': 'outNormal', 'attr': 'normalCamera', 'attrs': {'bumpInterp': 0},
+                     'textureAttrs': {'alphaIsLuminance': True}},
+            'normal': {'type': 'bump2d', 'suffix': 'BMP', 'plug': 'outAlpha', 'input': 'bumpValue',
+                       'output': 'outNormal', 'attr': 'normalCamera', 'attrs': {'bumpInterp': 1},
+                       'textureAttrs': {'alphaIsLuminance': True}}
+        }
+    },
+    'arnold': {
+        'shader': 'aiStandardSurface',
+        'requires': [['mtoa', '4.2.1']],
+        'texture': {
+            'type': 'aiImage', 'pathAttr': 'filename', 'suffix': 'aiImage', 'placement': False,
+            'udimToken': '<udim>'
+        },
+        'channels': {
+            'baseColor': [['outColor', 'baseColor']],
+            'metalness': [['outColor.outColorR', 'metalness']],
+            'roughness': [['outColor.outColorR', 'diffuseRoughness']],
+            'emissive': [['outColor', 'emissionColor'], ['outColor.outColorR', 'emission']],
+            'opacity': [['outColor.outColorR', 'transmission']]
+        },
+        'packed': {
+            'metalness': ['metalness'],
+            'roughness': ['diffuseRoughness'],
+            'opacity': ['transmission']
+        },
+        'packedAttrs': {'ignoreColorSpaceFileRules': True, 'colorSpace': 'Raw'},
+        'bump': {
+            'bump': {'type': 'aiBump2d', 'suffix': None, 'plug': 'outAlpha', 'input': 'bumpMap',
+                     'output': 'outValue', 'attr': 'normalCamera'},
+            'normal': {'type': 'aiNormalMap', 'suffix': 'NRM', 'plug': 'outColor', 'input': 'input',
+                       'output': 'outValue', 'attr': 'normalCamera'}
+        }
+    }
+}
+TARGET_DEFAULTS = {'requires': [], 'packed': {}, 'packedAttrs': {}, 'bump': {}}
+TEXTURE_DEFAULTS = {
+    'placement': False, 'udimToken': textureIndex.UDIM_TOKEN, 'udimAttrs': {}, 'singleAttrs': {},
+    'channelPlugs': ['outColor.outColorR', 'outColor.outColorG', 'outColor.outColorB']
+}
+HELPER_DEFAULTS = {'suffix': None, 'attrs': {}, 'textureAttrs': {}}
+
+
+def checkTarget(name, spec):
+    # spec with its optional keys filled in, ValueError when required ones are missing
+    missing = [key for key in ('shader', 'texture', 'channels') if key not in spec]
+    missing += ['texture.%s' % key for key in ('type', 'pathAttr') if key not in spec.get('texture', {})]
+    if missing:
+        raise ValueError("material target %s has no %s" % (name, ', '.join(missing)))
+    spec = dict(TARGET_DEFAULTS, **spec)
+    spec['texture'] = dict(TEXTURE_DEFAULTS, **dict({'suffix': spec['texture']['type']}, **spec['texture']))
+    spec['bump'] = {kind: dict(HELPER_DEFAULTS, **helper) for kind, helper in spec['bump'].items()}
+    return spec
+
+
+@functools.lru_cache(maxsize=None)
+def targets():
+    """
+    Returns:
+        {name: target} of the built-in and the JSON targets, read once
+    """
+    found = {name: checkTarget(name, spec) for name, spec in TARGETS.items()}
+    for folder in os.environ.get(TARGETS_ENV, '').split(os.pathsep):
+        if not folder or not os.path.isdir(folder):
+            continue
+        for fileName in sorted(os.listdir(folder)):
+            name, ext = os.path.splitext(fileName)
+            if ext.lower() == '.json':
+                with open(os.path.join(folder, fileName), 'r') as f:
+                    found[name] = checkTarget(name, json.load(f))
+    return found
+
+
+def target(name):
+    try:
+        return targets()[name]
+    except KeyError:
+        raise ValueError("unknown material target %s, expected one of %s" % (name, ', '.join(sorted(targets()))))
+
+
+def textureAttrs():
+    # {texture node type: path attribute} over every target
+    return {spec['texture']['type']: spec['texture']['pathAttr'] for spec in targets().values()}
+
+
+def bumpHelper(spec, isNormal):
+    # The helper the bump channel goes through, None when the target has none
+    return spec['bump'].get('normal' if isNormal else 'bump')
+
+
+def channelAttrs(spec, channel):
+    # Every material attribute channel may drive, direct or packed
+    attrs = [attr for plug, attr in spec['channels'].get(channel, ())]
+    return attrs + [attr for attr in spec['packed'].get(channel, ()) if attr not in attrs]
+
+
+def usedChannels(spec, isNormal=False):
+    # The channels (and the packed image) spec wires to anything
+    used = set(spec['channels'])
+    if bumpHelper(spec, isNormal):
+        used.add('bump')
+    if spec['packed']:
+        used.add(channelPacking.PACKED)
+    return used
+
+
+def packedPlug(spec, channel):
+    # The plug of a packed texture that reads channel
+    return spec['texture']['channelPlugs'][dict(channelPacking.PACK_LAYOUT)[channel]]
+
+
+def valueType(value):
+    return 'string' if isinstance(value, str) else None
+
+
+class ConnectionPlan:
+    """
+    The node creations, setAttrs and connections of one target's material for one combination
+    of channels. Steps name their nodes by slot: 'material', 'helper' or the channel of a
+    texture node the caller made, so one plan queues any number of materials.
+    """
+
+    def __init__(self, creates, setAttrs, connections):
+        # (slot, node type, name format, shadingNode kind), (slot, attr, value, value type) and
+        # (source slot, source attr, destination slot, destination attr)
+        self.creates = creates
+        self.setAttrs = setAttrs
+        self.connections = connections
+
+    def queue(self, network, textures, names):
+        """
+        Args:
+            network (shadingNetwork.NetworkBuilder)
+            textures (dict) {channel: texture node} for the channels the plan was compiled for
+            names (dict) Name format values, 'name' the material's and 'bump' the bump image's
+
+        Returns:
+            {slot: node}
+        """
+        nodes = dict(textures)
+        for slot, nodeType, nameFormat, kind in self.creates:
+            nodes[slot] = network.createNode(nodeType, nameFormat % names if nameFormat else None, kind)
+        for slot, attr, value, attrType in self.setAttrs:
+            network.setAttr(nodes[slot], attr, value, attrType)
+        for source, sourceAttr, destination, destinationAttr in self.connections:
+            network.connect(nodes[source], sourceAttr, nodes[destination], destinationAttr)
+        return nodes
+
+
+@functools.lru_cache(maxsize=None)
+def compilePlan(targetName, channels, isNormal=False, packedChannels=()):
+    """
+    Args:
+        channels (tuple) Sorted channels with a texture node, channelPacking.PACKED for a packed image
+        packedChannels (tuple) The channels in the packed image
+
+    Returns:
+        ConnectionPlan, the same one for every call with the same arguments
+    """
+    spec = target(targetName)
+    creates = [('material', spec['shader'], '%(name)s_SHD', 'asShader')]
+    setAttrs = []
+    connections = []
+    for channel, wires in spec['channels'].items():
+        if channel in channels:
+            connections += [(channel, plug, 'material', attr) for plug, attr in wires]
+    helper = bumpHelper(spec, isNormal)
+    if 'bump' in channels and helper:
+        nameFormat = '%%(bump)s_%s' % helper['suffix'] if helper['suffix'] else None
+        creates.append(('helper', helper['type'], nameFormat, 'asUtility'))
+        setAttrs += [('bump', attr, value, valueType(value)) for attr, value in helper['textureAttrs'].items()]
+        setAttrs += [('helper', attr, value, valueType(value)) for attr, value in helper['attrs'].items()]
+        connections.append(('bump', helper['plug'], 'helper', helper['input']))
+        connections.append(('helper', helper['output'], 'material', helper['attr']))
+    packed = channelPacking.PACKED
+    if packed in channels:
+        setAttrs += [(packed, attr, value, valueType(value)) for attr, value in spec['packedAttrs'].items()]
+        for channel in packedChannels:
+            connections += [(packed, packedPlug(spec, channel), 'material', attr)
+                            for attr in spec['packed'].get(channel, ())]
+    return ConnectionPlan(tuple(creates), tuple(setAttrs), tuple(connections))
+
+
+def queueTexture(network, spec, imagePath, name, group):
+    """
+    Queues a texture node of the target's type reading imagePath, UDIM sequences included.
+
+    Args:
+        spec (dict) The target
+        name (str) The image's name, the node is named after it
+        group (str) The material, whose file textures share a placement
+    """
+    texture = spec['texture']
+    node = network.textureNode(texture['type'], texture['pathAttr'],
+                               imagePath.replace(textureIndex.UDIM_TOKEN, texture['udimToken']),
+                               name, texture['suffix'], group if texture['placement'] else None)
+    if textureIndex.UDIM_TOKEN in imagePath:
+        for attr, value in texture['udimAttrs'].items():
+            network.setAttr(node, attr, value, valueType(value))
+    return node
+
+
+def queueMaterial(network, targetName, textures, attrs, name):
+    """
+    Queues the material of one texture set, wired to the texture nodes the caller made.
+
+    Args:
+        textures (dict) {channel: texture node}, channelPacking.PACKED for the packed image
+        attrs (dict) The set's images, as scanExportTree (and packedAttrs) return them
+
+    Returns:
+        {slot: node}, the material under 'material'
+    """
+    plan = compilePlan(targetName, tuple(sorted(textures)), bool(attrs.get('isHeightNormal')),
+                       tuple(attrs.get(channelPacking.PACKED_CHANNELS, ())))
+    names = {'name': name, 'bump': attrs['bump'].split('.')[0] if 'bump' in textures else ''}
+    return plan.queue(network, textures, names)
@@ -0,0 +1,328 @@
+"""
+Packs the grayscale maps of a texture set into the R, G and B of one image.
+
+Images are streamed BLOCK_ROWS rows at a time, read with OpenImageIO when it is installed and
+with the built-in PNG reader otherwise. The packed PNG sits next to a JSON file of its sources.
+"""
+import os
+import struct
+import zlib
+import numpy as np
+from myPipeline import fileUtils
+
+try:
+    import OpenImageIO as oiio
+except ImportError:
+    oiio = None
+
+# Channel -> index in the packed image, and the value a missing map is filled with
+PACK_LAYOUT = (('metalness', 0), ('roughness', 1), ('opacity', 2))
+DEFAULTS = {'metalness': 0.0, 'roughness': 0.5, 'opacity': 1.0}
+PACKED_SUFFIX = 'MRO'
+# attrs keys of the packed image and the channels packed into it
+PACKED = 'packed'
+PACKED_CHANNELS = 'packedChannels'
+BLOCK_ROWS = 256
+# Largest difference between the color channels of a pixel that still counts as gray
+GRAY_TOLERANCE = 1e-4
+
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+PNG_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+IDAT_SIZE = 1 << 16
+
+
+class PngReader:
+    """
+    Streams the rows of a non interlaced 8 or 16 bit grayscale/RGB(A) PNG.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        if self.file.read(8) != PNG_MAGIC:
+            self.close()
+            raise ValueError("%s isn't a png" % path)
+        length, kind = struct.unpack('>I4s', self.file.read(8))
+        header = self.file.read(length)
+        self.file.read(4)
+        self.width, self.height, bitDepth, colorType, _, _, interlace = struct.unpack('>IIBBBBB', header)
+        if colorType not in PNG_CHANNELS or bitDepth not in (8, 16) or interlace:
+            self.close()
+            raise ValueError("%s is a palette, low bit depth or interlaced png" % path)
+        self.channels = PNG_CHANNELS[colorType]
+        self.dtype = np.dtype('>u2') if bitDepth == 16 else np.dtype(np.uint8)
+        self.bpp = self.channels * self.dtype.itemsize
+        self.stride = self.width * self.bpp
+        self.decompressor = zlib.decompressobj()
+        self.buffer = b''
+        self.previous = np.zeros(self.stride, np.uint8)
+
+    def _fill(self, size):
+        # Decompresses IDAT chunks until size bytes are buffered
+        while len(self.buffer) < size:
+            header = self.file.read(8)
+            if len(header) < 8:
+                raise ValueError("truncated png")
+            length, kind = struct.unpack('>I4s', header)
+            data = self.file.read(length)
+            self.file.read(4)
+            if kind == b'IDAT':
+                self.buffer += self.decompressor.decompress(data)
+            elif kind == b'IEND':
+                raise ValueError("truncated png")
+
+    def readRows(self, count):
+        # The next count rows as (rows, width, channels) in the file's dtype
+        size = count * (self.stride + 1)
+        self._fill(size)
+        data = np.frombuffer(self.buffer[:size], np.uint8).reshape(count, self.stride + 1)
+        self.buffer = self.buffer[size:]
+        rows = unfilterRows(data[:, 0], data[:, 1:], self.previous, self.bpp)
+        self.previous = rows[-1]
+        return rows.view(self.dtype).reshape(count, self.width, self.channels)
+
+    def close(self):
+        self.file.close()
+
+
+class OiioReader:
+    # Streams scanlines of anything OpenImageIO can read
+    def __init__(self, path):
+        self.input = oiio.ImageInput.open(path)
+        if self.input is None:
+            raise ValueError(oiio.geterror())
+        spec = self.input.spec()
+        self.width, self.height, self.channels = spec.width, spec.height, spec.nchannels
+        self.y = spec.y
+        self.dtype = np.dtype(np.float32)
+
+    def readRows(self, count):
+        rows = self.input.read_scanlines(0, 0, self.y, self.y + count, 0, 0, self.channels, oiio.FLOAT)
+        self.y += count
+        return rows.reshape(count, self.width, self.channels)
+
+    def close(self):
+        self.input.close()
+
+
+class PngWriter:
+    """
+    Writes a PNG row block by row block. Rows are stored unfiltered, which compresses the flat,
+    smooth content of packed maps well enough and costs nothing to write.
+    """
+
+    def __init__(self, path, width, height, channels, bitDepth=8):
+        self.file = open(path, 'wb')
+        self.dtype = np.dtype('>u2') if bitDepth == 16 else np.dtype(np.uint8)
+        self.compressor = zlib.compressobj()
+        self.buffer = b''
+        colorType = {value: key for key, value in PNG_CHANNELS.items()}[channels]
+        self.file.write(PNG_MAGIC)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, bitDepth, colorType, 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)) + kind + data)
+        self.file.write(struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    def writeRows(self, rows):
+        rows = rows.astype(self.dtype).reshape(rows.shape[0], -1).view(np.uint8)
+        filtered = np.zeros((rows.shape[0], rows.shape[1] + 1), np.uint8)
+        filtered[:, 1:] = rows
+        self.buffer += self.compressor.compress(filtered.tobytes())
+        if len(self.buffer) >= IDAT_SIZE:
+            self._chunk(b'IDAT', self.buffer)
+            self.buffer = b''
+
+    def close(self):
+        self._chunk(b'IDAT', self.buffer + self.compressor.flush())
+        self._chunk(b'IEND', b'')
+        self.file.close()
+
+
+def unfilter(kind, row, previous, bpp):
+    # Undoes a None, Sub or Up row filter
+    if kind == 0:
+        return row
+    if kind == 1:
+        # Every byte adds the one bpp before it, a running sum per byte lane (mod 256)
+        return row.reshape(-1, bpp).cumsum(axis=0, dtype=np.uint8).ravel()
+    return row + previous
+
+
+def unfilterRows(kinds, rows, previous, bpp):
+    """
+    Undoes the PNG row filters of a block of rows.
+
+    Average and Paeth add a prediction from the unfiltered pixel to the left, so their rows can't
+    be undone in one go like the others. Blocks holding them are undone an anti-diagonal of
+    pixels at a time instead: a pixel only depends on the pixels left, above and above left of
+    it, all on the two diagonals before its own, so each diagonal is one vectorized step over
+    every row of the block.
+
+    Args:
+        kinds (np.ndarray) The filter type of each row
+        rows (np.ndarray) (rows, stride) filtered bytes
+        previous (np.ndarray) The unfiltered row above the block
+
+    Returns:
+        (rows, stride) unfiltered bytes
+    """
+    count, stride = rows.shape
+    if kinds.max() < 3:
+        out = np.empty_like(rows)
+        for index in range(count):
+            previous = out[index] = unfilter(kinds[index], rows[index], previous, bpp)
+        return out
+    width = stride // bpp
+    # Pixel x of block row y sits at [x + y + 2, y + 1] of the skewed arrays, making every
+    # diagonal a row of them. Row 0 holds the row above the block, out of range pixels stay 0
+    diagonals = np.arange(width)[None, :] + np.arange(count)[:, None] + 2
+    blockRows = np.arange(1, count + 1)[:, None]
+    filtered = np.zeros((width + count + 2, count + 1, bpp), np.int16)
+    filtered[diagonals, blockRows] = rows.reshape(count, width, bpp)
+    skewed = np.zeros_like(filtered)
+    skewed[np.arange(width) + 1, 0] = previous.reshape(width, bpp)
+    # One 0/1 weight per row and filter, picking the filter's predictor without branching
+    weights = [np.concatenate(([0], kinds == kind)).astype(np.int16)[:, None] for kind in (1, 2, 3, 4)]
+    for diagonal in range(2, width + count + 1):
+        first, last = max(1, diagonal - width), min(count, diagonal - 1)
+        left = skewed[diagonal - 1, first:last + 1]
+        above = skewed[diagonal - 1, first - 1:last]
+        upperLeft = skewed[diagonal - 2, first - 1:last]
+        sub, up, average, paeth = (weight[first:last + 1] for weight in weights)
+        estimate = left + above - upperLeft
+        leftDistance, aboveDistance = np.abs(estimate - left), np.abs(estimate - above)
+        upperLeftDistance = np.abs(estimate - upperLeft)
+        predictor = sub * left + up * above + average * ((left + above) >> 1)
+        predictor += paeth * np.where((leftDistance <= aboveDistance) & (leftDistance <= upperLeftDistance), left,
+                                      np.where(aboveDistance <= upperLeftDistance, above, upperLeft))
+        skewed[diagonal, first:last + 1] = (filtered[diagonal, first:last + 1] + predictor) & 0xff
+    return skewed[diagonals, blockRows].astype(np.uint8).reshape(count, stride)
+
+
+def openImage(path):
+    if oiio is not None:
+        return OiioReader(path)
+    return PngReader(path)
+
+
+def normalized(rows, dtype):
+    # Pixel values as float32 in 0-1
+    if dtype.kind == 'f':
+        return rows.astype(np.float32)
+    return rows.astype(np.float32) / np.iinfo(dtype).max
+
+
+def packChannels(sources, target, defaults=None, blockRows=BLOCK_ROWS):
+    """
+    Packs grayscale images into the channels of one RGB PNG.
+
+    Args:
+        sources (dict) {channel index: image path}
+        target (str) The packed PNG
+        defaults (dict) {channel index: 0-1 value} for the channels without a source, 0 otherwise
+
+    Returns:
+        True when target was written, False when a source isn't grayscale, the sizes differ
+        or a source can't be read. Nothing is left behind when packing fails.
+    """
+    defaults = defaults or {}
+    readers = []
+    tmpPath = '%s.tmp%d.png' % (os.path.splitext(target)[0], os.getpid())
+    writer = None
+    try:
+        try:
+            readers = [(index, openImage(path)) for index, path in sorted(sources.items())]
+        except (OSError, ValueError):
+            return False
+        width, height = readers[0][1].width, readers[0][1].height
+        if any((reader.width, reader.height) != (width, height) for index, reader in readers):
+            return False
+        bitDepth = 8 if all(reader.dtype == np.uint8 for index, reader in readers) else 16
+        maxValue = (1 << bitDepth) - 1
+        writer = PngWriter(tmpPath, width, height, 3, bitDepth)
+        for start in range(0, height, blockRows):
+            count = min(blockRows, height - start)
+            block = np.empty((count, width, 3), np.float32)
+            for index in range(3):
+                block[..., index] = defaults.get(index, 0.0)
+            for index, reader in readers:
+                rows = normalized(reader.readRows(count), reader.dtype)
+                # Alpha doesn't count, only the color channels have to agree
+                colors = rows[..., :3] if reader.channels >= 3 else rows[..., :1]
+                if np.ptp(colors, axis=-1).max() > GRAY_TOLERANCE:
+                    return False
+                block[..., index] = colors[..., 0]
+            writer.writeRows(np.rint(np.clip(block, 0.0, 1.0) * maxValue))
+        writer.close()
+        writer = None
+        os.replace(tmpPath, target)
+        return True
+    except (OSError, ValueError, zlib.error):
+        return False
+    finally:
+        for index, reader in readers:
+            reader.close()
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+
+
+def packKey(attrs, folder):
+    # What a packed image is made from: the layout, each channel's map with its size and mtime, and the fills
+    key = {'layout': [[channel, index, DEFAULTS[channel]] for channel, index in PACK_LAYOUT], 'sources': {}}
+    for channel, index in PACK_LAYOUT:
+        if attrs.get(channel):
+            stat = os.stat(os.path.join(folder, attrs[channel]))
+            key['sources'][channel] = [attrs[channel], stat.st_size, stat.st_mtime]
+    return key
+
+
+def packTextureSet(folder, attrs, name):
+    """
+    Packs a texture set's metalness, roughness and opacity maps into <name>_MRO.png in folder.
+    The packed image is reused while <name>_MRO.json says it was packed from the same maps,
+    unchanged in size and mtime, with the same layout.
+
+    Args:
+        attrs (dict) The set's channel file names, as the importer gets them
+
+    Returns:
+        The packed file name, None when fewer than two of the maps exist or they can't be packed
+    """
+    sources = {index: os.path.join(folder, attrs[channel]) for channel, index in PACK_LAYOUT if attrs.get(channel)}
+    if len(sources) < 2:
+        return None
+    fileName = '%s_%s.png' % (name, PACKED_SUFFIX)
+    target = os.path.join(folder, fileName)
+    keyPath = os.path.join(folder, '%s_%s.json' % (name, PACKED_SUFFIX))
+    try:
+        key = packKey(attrs, folder)
+    except OSError:
+        return None
+    if os.path.exists(target) and fileUtils.loadJson(keyPath) == key:
+        return fileName
+    defaults = {index: DEFAULTS[channel] for channel, index in PACK_LAYOUT}
+    if not packChannels(sources, target, defaults):
+        return None
+    try:
+        fileUtils.saveJson(key, keyPath, indent=4)
+    except OSError:
+        # Packed fine, it just gets packed again next time
+        pass
+    return fileName
+
+
+def packedAttrs(folder, attrs, name):
+    # attrs with the grayscale maps swapped for one packed image, unchanged if they don't pack
+    if attrs.get(PACKED):
+        return attrs
+    packed = packTextureSet(folder, attrs, name)
+    if not packed:
+        return attrs
+    attrs = dict(attrs)
+    attrs[PACKED_CHANNELS] = tuple(channel for channel, index in PACK_LAYOUT if attrs[channel])
+    for channel in attrs[PACKED_CHANNELS]:
+        attrs[channel] = ''
+    attrs[PACKED] = packed
+    return attrs
@@ -0,0 +1,64 @@
+"""
+File helpers shared by the pipeline tools.
+"""
+import hashlib
+import io
+import json
+import os
+
+
+def fileHash(path):
+    # sha1 of the file's contents, read a block at a time
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class HashingReader(io.RawIOBase):
+    # A binary file that feeds everything read from it to digest
+
+    def __init__(self, path, digest):
+        self.file = open(path, 'rb')
+        self.digest = digest
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.file.readinto(buffer)
+        self.digest.update(memoryview(buffer)[:count])
+        return count
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def openText(path, digest=None):
+    # Opens path as text, feeding digest (a hashlib object) the raw bytes as they are read
+    if digest is None:
+        return open(path, 'r', encoding='utf-8', errors='replace')
+    return io.TextIOWrapper(io.BufferedReader(HashingReader(path, digest)), encoding='utf-8', errors='replace')
+
+
+def writeText(text, path):
+    # Written to a temporary file first so an interrupted write never leaves half a file behind
+    tmpPath = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmpPath, 'w') as f:
+        f.write(text)
+    os.replace(tmpPath, path)
+
+
+def saveJson(data, path, indent=None):
+    writeText(json.dumps(data, indent=indent), path)
+
+
+def loadJson(path, default=None):
+    # The file's data, default when it is missing or corrupt
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
@@ -0,0 +1,69 @@
+# Upstream-connection index that answers "does this shape have construction history" for every
+# shape in the scene at once, filled from a live scene (SceneSnapshot) or a .ma file
+
+# Deformers are history too, but the kind that is usually meant to stay on a shape
+DEFORMER_TYPES = {
+    "skinCluster", "blendShape", "cluster", "tweak", "lattice", "ffd", "wire", "wrap",
+    "nonLinear", "deltaMush", "tension", "softMod", "sculpt", "jiggle", "proximityWrap",
+    "shrinkWrap", "textureDeformer", "polySmoothProxy", "groupParts"
+}
+# Nodes that connect into shapes without affecting their geometry (listHistory ignores them too)
+IGNORED_TYPES = {
+    "displayLayer", "renderLayer", "objectSet", "shadingEngine", "time", "groupId",
+    "nodeGraphEditorInfo", "hyperLayout", "container", "reference"
+}
+
+
+class HistoryIndex:
+    """
+    Maps every node to the non-DAG nodes directly upstream of it.
+
+    Traversal stops at DAG nodes, like listHistory's pruneDagObjects, so a shape's history is
+    everything reachable upstream through non-DAG nodes.
+    """
+
+    def __init__(self):
+        self.upstream = {}
+        self.types = {}
+        self.indexed = set()
+        self._history = {}
+
+    def reset(self, nodes):
+        # Drops what is known about these nodes so they can be indexed again
+        for node in nodes:
+            self.upstream.pop(node, None)
+            self.indexed.discard(node)
+        self._history = {}
+
+    def addConnection(self, source, destination, sourceType):
+        self.types[source] = sourceType
+        if sourceType not in IGNORED_TYPES:
+            self.upstream.setdefault(destination, set()).add(source)
+
+    def isIndexed(self, node):
+        return node in self.indexed
+
+    def historyOf(self, shape):
+        # Returns every history node upstream of the shape, walking the index rather than the scene
+        if shape not in self._history:
+            found = set()
+            stack = list(self.upstream.get(shape, ()))
+            while stack:
+                node = stack.pop()
+                if node not in found:
+                    found.add(node)
+                    stack.extend(self.upstream.get(node, ()))
+            self._history[shape] = found
+        return self._history[shape]
+
+    def hasHistory(self, shape):
+        return bool(self.historyOf(shape))
+
+    def historyKinds(self, shape):
+        # Returns {'construction': [...], 'deformer': [...]} node types so reports need no follow-up queries
+        kinds = {}
+        for node in self.historyOf(shape):
+            nodeType = self.types.get(node)
+            kind = "deformer" if nodeType in DEFORMER_TYPES else "construction"
+            kinds.setdefault(kind, set()).add(nodeType)
+        return {kind: sorted(nodeTypes) for kind, nodeTypes in kinds.items()}
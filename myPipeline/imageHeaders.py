@@ -0,0 +1,155 @@
+"""
+Reads the resolution, channel count and bit depth of PNG, JPEG, TIFF/.tx and EXR images
+from their headers alone.
+"""
+import collections
+import concurrent.futures
+import struct
+
+ImageInfo = collections.namedtuple('ImageInfo', 'format width height channels bitDepth')
+
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+EXR_MAGIC = b'\x76\x2f\x31\x01'
+# PNG colour type -> channels
+PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+# JPEG start-of-frame markers, the ones holding the image size
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# TIFF tags and field types
+TIFF_WIDTH, TIFF_HEIGHT, TIFF_BITS, TIFF_SAMPLES = 256, 257, 258, 277
+TIFF_SHORT, TIFF_LONG = 3, 4
+# EXR pixel type -> bit depth
+EXR_BITS = {0: 32, 1: 16, 2: 32}
+# Headers bigger than this (huge EXR attribute lists) aren't worth reading
+MAX_HEADER = 1 << 16
+PROBE_WORKERS = 8
+
+
+def probe(path):
+    """
+    Returns:
+        ImageInfo, None if the file can't be read or isn't a recognised image
+    """
+    try:
+        with open(path, 'rb') as f:
+            magic = f.read(8)
+            f.seek(0)
+            if magic.startswith(PNG_MAGIC):
+                return _probePng(f)
+            if magic.startswith(b'\xff\xd8'):
+                return _probeJpeg(f)
+            if magic[:4] in (b'II*\x00', b'MM\x00*'):
+                return _probeTiff(f)
+            if magic.startswith(EXR_MAGIC):
+                return _probeExr(f)
+    except (OSError, struct.error, ValueError):
+        pass
+    return None
+
+
+def probeAll(paths, workers=PROBE_WORKERS):
+    # {path: ImageInfo or None}, probed on a thread pool since the time goes into waiting on the disk
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        return dict(zip(paths, executor.map(probe, paths)))
+
+
+def describe(info):
+    # e.g. "4096x4096 RGB 8-bit PNG"
+    layout = {1: 'Mono', 2: 'Mono+A', 3: 'RGB', 4: 'RGBA'}.get(info.channels, '%dch' % info.channels)
+    return '%dx%d %s %d-bit %s' % (info.width, info.height, layout, info.bitDepth, info.format)
+
+
+def _probePng(f):
+    header = f.read(26)
+    if header[12:16] != b'IHDR':
+        return None
+    width, height, bitDepth, colorType = struct.unpack('>IIBB', header[16:26])
+    return ImageInfo('PNG', width, height, PNG_CHANNELS.get(colorType, 3), bitDepth)
+
+
+def _probeJpeg(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        # Markers without a segment
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue
+        length = struct.unpack('>H', f.read(2))[0]
+        if marker in JPEG_SOF:
+            precision, height, width, channels = struct.unpack('>BHHB', f.read(6))
+            return ImageInfo('JPEG', width, height, channels, precision)
+        f.seek(length - 2, 1)
+
+
+def _probeTiff(f):
+    order = '<' if f.read(2) == b'II' else '>'
+    f.seek(4)
+    f.seek(struct.unpack(order + 'I', f.read(4))[0])
+    count = struct.unpack(order + 'H', f.read(2))[0]
+    entries = f.read(count * 12)
+    values = {}
+    for start in range(0, len(entries), 12):
+        tag, fieldType, fieldCount, raw = struct.unpack(order + 'HHI4s', entries[start:start + 12])
+        if tag not in (TIFF_WIDTH, TIFF_HEIGHT, TIFF_BITS, TIFF_SAMPLES):
+            continue
+        if fieldType == TIFF_SHORT:
+            # Per channel bit depths that don't fit the entry live elsewhere, they're all the same anyway
+            if fieldCount > 2:
+                position = f.tell()
+                f.seek(struct.unpack(order + 'I', raw)[0])
+                raw = f.read(2)
+                f.seek(position)
+            values[tag] = struct.unpack(order + 'H', raw[:2])[0]
+        elif fieldType == TIFF_LONG:
+            values[tag] = struct.unpack(order + 'I', raw)[0]
+    if TIFF_WIDTH not in values or TIFF_HEIGHT not in values:
+        return None
+    return ImageInfo('TIFF', values[TIFF_WIDTH], values[TIFF_HEIGHT], values.get(TIFF_SAMPLES, 1),
+                     values.get(TIFF_BITS, 1))
+
+
+def _probeExr(f):
+    header = f.read(MAX_HEADER)
+    position = 8
+    channels = []
+    window = None
+    while True:
+        nameEnd = header.index(b'\x00', position)
+        name = header[position:nameEnd]
+        if not name:
+            break
+        typeEnd = header.index(b'\x00', nameEnd + 1)
+        size = struct.unpack('<i', header[typeEnd + 1:typeEnd + 5])[0]
+        value = header[typeEnd + 5:typeEnd + 5 + size]
+        if len(value) < size:
+            return None
+        if name == b'channels':
+            channels = _exrChannels(value)
+        elif name == b'dataWindow':
+            window = struct.unpack('<iiii', value[:16])
+        position = typeEnd + 5 + size
+    if window is None or not channels:
+        return None
+    xMin, yMin, xMax, yMax = window
+    return ImageInfo('EXR', xMax - xMin + 1, yMax - yMin + 1, len(channels), max(channels))
+
+
+def _exrChannels(value):
+    # Bit depth of every channel in a chlist attribute
+    bits = []
+    position = 0
+    while value[position:position + 1] not in (b'\x00', b''):
+        nameEnd = value.index(b'\x00', position)
+        pixelType = struct.unpack('<i', value[nameEnd + 1:nameEnd + 5])[0]
+        bits.append(EXR_BITS.get(pixelType, 32))
+        position = nameEnd + 17
+    return bits
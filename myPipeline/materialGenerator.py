@@ -0,0 +1,150 @@
+"""
+Writes Substance texture sets out as Maya ASCII shading networks, without Maya.
+
+Every texture set becomes <folder>_<set>_<target>.ma, <folder> being its folder's path under
+the export folder: the network SubImporter would build for a channelMapping target plus a
+shading group, written on a process pool.
+
+    python -m myPipeline.materialGenerator exportDir [...] -o outDir [--renderer <target>|both] [--workers N]
+"""
+import argparse
+import concurrent.futures
+import os
+import re
+import sys
+from myPipeline import channelMapping
+from myPipeline import channelPacking
+from myPipeline import fileUtils
+from myPipeline import shadingNetwork
+from myPipeline import textureIndex
+
+# --renderer both
+BOTH = ('maya', 'arnold')
+
+
+def queueMaterial(network, target, folder, attrs, name, prefix=''):
+    """
+    Queues the material network of one texture set, without the importer's texture dedupe and
+    .tx conversion.
+
+    Args:
+        target (str) A channelMapping target
+        attrs (dict) The set's images, as scanExportTree (and packedAttrs) return them
+        prefix (str) Put in front of the texture nodes' image names, as it is in front of name
+
+    Returns:
+        The material's NodeRef
+    """
+    spec = channelMapping.target(target)
+    used = channelMapping.usedChannels(spec, bool(attrs.get('isHeightNormal')))
+    textures = {}
+    for channel in channelMapping.CHANNELS + (channelPacking.PACKED,):
+        if attrs.get(channel) and channel in used:
+            imagePath = os.path.join(folder, attrs[channel]).replace('\\', '/')
+            textures[channel] = channelMapping.queueTexture(network, spec, imagePath,
+                                                            prefix + attrs[channel].split('.')[0], name)
+    return channelMapping.queueMaterial(network, target, textures, attrs, name)['material']
+
+
+def queueShadingGroup(network, mat, name):
+    # The shading group objects get assigned to, with the materialInfo Hypershade gives it
+    shadingGroup = network.createNode('shadingEngine', '%s_SG' % name, None)
+    network.setAttr(shadingGroup, 'renderableOnlySet', True)
+    info = network.createNode('materialInfo', '%s_materialInfo' % name, None)
+    network.connect(mat, 'outColor', shadingGroup, 'surfaceShader')
+    network.connect(shadingGroup, 'message', info, 'shadingGroup')
+    network.connect(mat, 'message', info, 'material')
+    network.connect(shadingGroup, 'partition', ':renderPartition', 'sets')
+    return shadingGroup
+
+
+def folderPrefix(root, folder):
+    # "assetA_textures_" for root/assetA/textures, empty for root itself
+    parts = os.path.relpath(folder, root).replace('\\', '/').split('/')
+    return ''.join('%s_' % re.sub(r'\W', '_', part) for part in parts if part != '.')
+
+
+def writeMaterials(folder, setName, attrs, targets, outDir, packChannels=False, prefix=''):
+    # Runs in a worker process. Files and nodes are named prefix + setName. Returns the written files
+    name = prefix + setName
+    if packChannels:
+        attrs = channelPacking.packedAttrs(folder, attrs, setName)
+    written = []
+    for target in targets:
+        network = shadingNetwork.NetworkBuilder('material')
+        mat = queueMaterial(network, target, folder, attrs, name, prefix)
+        queueShadingGroup(network, mat, name)
+        path = os.path.join(outDir, '%s_%s.ma' % (name, target))
+        fileUtils.writeText(network.maScript(channelMapping.target(target)['requires']), path)
+        written.append(path)
+    return written
+
+
+def generate(roots, outDir, targets=BOTH, heightIsNormal=False, packChannels=False, workers=None):
+    """
+    Writes the material files of every texture set under roots, one per channelMapping target.
+
+    Returns:
+        ([written files], {(folder, texture set): error} of the sets that failed)
+    """
+    # Unknown targets fail here, not in every worker
+    for target in targets:
+        channelMapping.target(target)
+    # {output name: (folder, texture set, attrs, prefix)}
+    textureSets = {}
+    seen = set()
+    for root in roots:
+        for (folder, setName), attrs in sorted(textureIndex.scanExportTree(root, heightIsNormal).items()):
+            if (folder, setName) in seen:
+                # Roots inside other roots
+                continue
+            seen.add((folder, setName))
+            prefix = folderPrefix(root, folder)
+            if prefix + setName in textureSets:
+                # Roots with the same layout, told apart by the roots' names, then numbered
+                prefix = base = folderPrefix(os.path.dirname(os.path.abspath(root)), folder)
+                number = 0
+                while prefix + setName in textureSets:
+                    number += 1
+                    prefix = '%s%d_' % (base, number)
+            textureSets[prefix + setName] = (folder, setName, attrs, prefix)
+    print('%d texture sets found' % len(textureSets))
+
+    os.makedirs(outDir, exist_ok=True)
+    written = []
+    errors = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(writeMaterials, folder, setName, attrs, targets, outDir, packChannels, prefix):
+                   (folder, setName) for folder, setName, attrs, prefix in textureSets.values()}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            folder, name = futures[future]
+            try:
+                written.extend(future.result())
+            except Exception as e:
+                errors[(folder, name)] = '%s: %s' % (type(e).__name__, e)
+                print('[%d/%d] FAILED %s in %s: %s' % (done, len(futures), name, folder, errors[(folder, name)]))
+            else:
+                print('[%d/%d] %s in %s' % (done, len(futures), name, folder))
+    print('%d material files written to %s' % (len(written), outDir))
+    return sorted(written), errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write Substance texture sets out as .ma shading networks.")
+    parser.add_argument('folders', nargs='+', help="Substance export folders, searched recursively")
+    parser.add_argument('-o', '--output', required=True, help="Folder the .ma files are written to")
+    parser.add_argument('--renderer', choices=sorted(channelMapping.targets()) + ['both'], default='both',
+                        help="The channelMapping target to write, or both maya and arnold")
+    parser.add_argument('--height-is-normal', action='store_true', help="Treat height maps as normal maps")
+    parser.add_argument('--pack-channels', action='store_true',
+                        help="Pack grayscale metalness, roughness and opacity maps into one image")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per core)")
+    args = parser.parse_args(argv)
+    targets = BOTH if args.renderer == 'both' else (args.renderer,)
+    written, errors = generate(args.folders, args.output, targets, args.height_is_normal, args.pack_channels,
+                               args.workers)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
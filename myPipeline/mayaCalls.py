@@ -0,0 +1,292 @@
+"""
+Counts and profiles maya.cmds round trips (and mel.eval, which batches many commands into one).
+
+Profiling times every call against the tool methods on the stack. Set PIPELINE_PROFILE to a
+directory to profile a whole session; a JSON summary and a .folded flame graph file are
+written there when Maya exits:
+
+    PIPELINE_PROFILE=/tmp/traces maya
+"""
+import atexit
+import contextlib
+import functools
+import getpass
+import json
+import os
+import sys
+import time
+
+PROFILE_ENV = 'PIPELINE_PROFILE'
+# Modules whose functions show up in profile stacks
+TOOL_PACKAGES = ('myPipeline', 'conLibrary', 'sceneCheck', 'substanceImporter')
+
+
+class CallCounter:
+    __slots__ = ('calls',)
+
+    def __init__(self):
+        self.calls = 0
+
+
+class CallProfile:
+    """
+    Calls and time per command ("cmds.ls", "mel.eval"), per calling tool method and per full
+    stack of tool methods.
+
+    Each table maps to [calls, seconds]. Stacks are outermost first and end in the command,
+    e.g. "substanceImporter.SubImporter.createMayaMaterial;...createFileTexture;cmds.connectAttr".
+    """
+    __slots__ = ('calls', 'seconds', 'commands', 'callers', 'stacks')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.commands = {}
+        self.callers = {}
+        self.stacks = {}
+
+    def record(self, command, stack, seconds):
+        self.calls += 1
+        self.seconds += seconds
+        for table, key in ((self.commands, command), (self.callers, stack[-1] if stack else '<console>'),
+                           (self.stacks, ';'.join(stack + (command,)))):
+            entry = table.get(key)
+            if entry is None:
+                table[key] = [1, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+
+    def tree(self):
+        # Nests the stacks into {frame: [calls, seconds, children]} for the flame-style report
+        root = {}
+        for stack, (calls, seconds) in self.stacks.items():
+            level = root
+            for frame in stack.split(';'):
+                node = level.setdefault(frame, [0, 0.0, {}])
+                node[0] += calls
+                node[1] += seconds
+                level = node[2]
+        return root
+
+    def report(self, minShare=0.01):
+        """
+        Returns a text flame graph: every tool method with the calls and cmds time under it,
+        children indented below their caller and sorted by time. Branches under minShare of the
+        total time are left out.
+        """
+        lines = ['%d cmds calls, %.4fs' % (self.calls, self.seconds)]
+
+        def addLevel(level, depth):
+            for frame, (calls, seconds, children) in sorted(level.items(), key=lambda item: -item[1][1]):
+                if self.seconds and seconds / self.seconds < minShare:
+                    continue
+                lines.append('%-72s %8d calls %9.4fs' % ('  ' * depth + frame, calls, seconds))
+                addLevel(children, depth + 1)
+
+        addLevel(self.tree(), 0)
+        return '\n'.join(lines)
+
+    def toDict(self):
+        return {
+            'calls': self.calls,
+            'seconds': round(self.seconds, 6),
+            'commands': self.commands,
+            'callers': self.callers,
+            'stacks': self.stacks
+        }
+
+    def write(self, path):
+        # path.json gets the summary, path.folded the collapsed stacks weighted in microseconds
+        with open(path + '.json', 'w') as f:
+            json.dump(self.toDict(), f, indent=4)
+        with open(path + '.folded', 'w') as f:
+            for stack, (calls, seconds) in sorted(self.stacks.items()):
+                f.write('%s %d\n' % (stack, max(1, round(seconds * 1e6))))
+
+
+_counters = []
+_profiles = []
+_holds = []
+_originals = {}
+_sessionProfile = None
+
+
+def _loadCmds():
+    try:
+        import maya.cmds as cmds
+    except ImportError:
+        return None
+    return cmds
+
+
+def _frameName(frame):
+    # "module.Class.method" for methods, "module.function" otherwise
+    module = frame.f_globals.get('__name__', '?').rpartition('.')[2]
+    owner = frame.f_locals.get('self')
+    if owner is not None:
+        # Named after the class that defines the method, not the subclass it was called on
+        name = frame.f_code.co_name
+        cls = next((cls for cls in type(owner).__mro__ if name in vars(cls)), type(owner))
+        return '%s.%s.%s' % (module, cls.__name__, name)
+    return '%s.%s' % (module, frame.f_code.co_name)
+
+
+def _toolStack(frame):
+    stack = []
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.partition('.')[0] in TOOL_PACKAGES and module != __name__:
+            stack.append(_frameName(frame))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def _wrap(name, command):
+    @functools.wraps(command)
+    def counted(*args, **kwargs):
+        for counter in _counters:
+            counter.calls += 1
+        if not _profiles:
+            return command(*args, **kwargs)
+        stack = _toolStack(sys._getframe(1))
+        start = time.perf_counter()
+        try:
+            return command(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            for profile in _profiles:
+                profile.record(name, stack, seconds)
+    return counted
+
+
+def _loadMel():
+    try:
+        from maya import mel
+    except ImportError:
+        return None
+    return mel
+
+
+def _install(cmds):
+    for name in dir(cmds):
+        command = getattr(cmds, name)
+        if not name.startswith('_') and callable(command):
+            _originals[(cmds, name)] = command
+            setattr(cmds, name, _wrap('cmds.' + name, command))
+    mel = _loadMel()
+    if mel is not None:
+        _originals[(mel, 'eval')] = mel.eval
+        mel.eval = _wrap('mel.eval', mel.eval)
+
+
+def _uninstall():
+    for (module, name), command in _originals.items():
+        setattr(module, name, command)
+    _originals.clear()
+
+
+def _idle():
+    return not _counters and not _profiles and not _holds
+
+
+def _activate(active, item):
+    cmds = _loadCmds()
+    if cmds is not None and _idle():
+        _install(cmds)
+    active.append(item)
+
+
+def _deactivate(active, item):
+    active.remove(item)
+    if _idle():
+        _uninstall()
+
+
+@contextlib.contextmanager
+def counting():
+    """
+    Counts the cmds calls made inside the block, nested blocks each count their own calls.
+
+        with mayaCalls.counting() as counter:
+            ...
+        print(counter.calls)
+    """
+    counter = CallCounter()
+    _activate(_counters, counter)
+    try:
+        yield counter
+    finally:
+        _deactivate(_counters, counter)
+
+
+def hold():
+    """
+    Keeps the commands wrapped until release(), so code that opens many short counting blocks
+    (a check run a chunk at a time) doesn't re-wrap every cmds command for each one.
+
+    Returns:
+        The hold to release
+    """
+    holder = object()
+    _activate(_holds, holder)
+    return holder
+
+
+def release(holder):
+    if holder in _holds:
+        _deactivate(_holds, holder)
+
+
+def startProfile():
+    profile = CallProfile()
+    _activate(_profiles, profile)
+    return profile
+
+
+def stopProfile(profile):
+    if profile in _profiles:
+        _deactivate(_profiles, profile)
+    return profile
+
+
+@contextlib.contextmanager
+def profiling():
+    """
+    Profiles the cmds calls made inside the block.
+
+        with mayaCalls.profiling() as profile:
+            importer.createMayaMaterial(path, attrs)
+        print(profile.report())
+    """
+    profile = startProfile()
+    try:
+        yield profile
+    finally:
+        stopProfile(profile)
+
+
+def enableFromEnvironment():
+    """
+    Profiles the rest of the session when PIPELINE_PROFILE names a directory, writing the
+    trace there at exit. Safe to call more than once.
+    """
+    global _sessionProfile
+    directory = os.environ.get(PROFILE_ENV)
+    if not directory or _sessionProfile is not None or _loadCmds() is None:
+        return None
+    _sessionProfile = startProfile()
+    atexit.register(writeSessionProfile, directory)
+    return _sessionProfile
+
+
+def writeSessionProfile(directory=None):
+    # Writes the session trace so far, can also be called by hand to grab a trace without quitting
+    if _sessionProfile is None:
+        return None
+    directory = directory or os.environ[PROFILE_ENV]
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'mayaCalls_%s_%d_%s' % (getpass.getuser(), os.getpid(),
+                                                          time.strftime('%Y%m%d-%H%M%S')))
+    _sessionProfile.write(path)
+    return path
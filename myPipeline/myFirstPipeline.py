@@ -25,7 +25,8 @@ class PipelineTools:
         propFile = currentScene.split('/')[-1]
         prop = propFile.split('_')[0]
         key = propFile.split('_')[1]
-        if self.sceneCheck.testAll():
+        # Fail fast so a bad scene is rejected by the first cheap check instead of the full suite
+        if self.sceneCheck.testAll(failFast=True, wait=True):
             # creates new scene under master pipeline
             masterDir = os.path.join(self.DIRECTORY, 'Master', prop, '%s_%s' % (prop, key))
             if not os.path.exists(masterDir):
@@ -0,0 +1,124 @@
+"""
+Studio naming rules, [prefix_][side_]body[number]_SUFFIX, compiled once into a single matcher.
+"""
+import re
+
+SUFFIXES = {
+    "mesh": "GEO",
+    "joint": "JNT",
+    "camera": None,
+    "nurbsCurve": "CV",
+    "ambientLight": "LGT",
+    "directionalLight": "LGT"
+}
+DEFAULT_SUFFIX = "GRP"
+SIDES = ("L", "R", "C")
+
+
+class NamingRules:
+    """
+    Validates names against the naming rules and suggests fixed names.
+
+    Args:
+        suffixes (dict) {node type: suffix}, None for types that need no suffix
+        defaultSuffix (str) Suffix for every type not in suffixes
+        prefixes (iterable) Allowed project prefixes, e.g. ("chr", "env")
+        sides (iterable) Allowed side tokens
+        padding (int) Digits a trailing number must be padded to, None to allow any
+        patterns (dict) {node type: regex} the body of that type's names must match
+        requirePrefix (bool) Names must start with one of the prefixes
+        requireSide (bool) Names must carry a side token
+    """
+
+    def __init__(self, suffixes=None, defaultSuffix=DEFAULT_SUFFIX, prefixes=(), sides=SIDES, padding=None,
+                 patterns=None, requirePrefix=False, requireSide=False):
+        self.suffixes = dict(SUFFIXES if suffixes is None else suffixes)
+        self.defaultSuffix = defaultSuffix
+        self.prefixes = tuple(prefixes)
+        self.sides = tuple(sides)
+        self.padding = padding
+        self.patterns = dict(patterns or {})
+        self.requirePrefix = requirePrefix
+        self.requireSide = requireSide
+        self.compile()
+
+    def compile(self):
+        # Call again after changing any of the rules
+        knownSuffixes = {suffix for suffix in self.suffixes.values() if suffix} | {self.defaultSuffix}
+        self._matcher = re.compile(r'^(?:(?P<prefix>%s)_)?(?:(?P<side>%s)_)?(?P<body>.*?)(?P<number>\d+)?'
+                                   r'(?:_(?P<suffix>%s))?$' % (alternation(self.prefixes), alternation(self.sides),
+                                                               alternation(knownSuffixes)))
+        self._patterns = {nodeType: re.compile(pattern) for nodeType, pattern in self.patterns.items()}
+        self._typeCache = {}
+        self._nameCache = {}
+        # Changes whenever any of the rules do, e.g. to tell cached results apart
+        self.signature = repr((sorted(self.suffixes.items()), self.defaultSuffix, self.prefixes, self.sides,
+                               self.padding, sorted(self.patterns.items()), self.requirePrefix, self.requireSide))
+
+    def typeRule(self, nodeType):
+        # (suffix, body pattern) for a node type, resolved once per type
+        rule = self._typeCache.get(nodeType)
+        if rule is None:
+            rule = self._typeCache[nodeType] = (self.suffixes.get(nodeType, self.defaultSuffix),
+                                                self._patterns.get(nodeType))
+        return rule
+
+    def expectedSuffix(self, nodeType):
+        return self.typeRule(nodeType)[0]
+
+    def parse(self, name):
+        # {'namespace', 'prefix', 'side', 'body', 'number', 'suffix'}, missing parts are None
+        namespace, _, leaf = name.rpartition(':')
+        parts = self._matcher.match(leaf).groupdict()
+        parts['namespace'] = namespace or None
+        return parts
+
+    def isValid(self, name, nodeType):
+        key = (name, nodeType)
+        valid = self._nameCache.get(key)
+        if valid is None:
+            valid = self._nameCache[key] = not self.problems(name, nodeType)
+        return valid
+
+    def problems(self, name, nodeType):
+        # Lists what is wrong with the name, empty when it follows the rules
+        suffix, pattern = self.typeRule(nodeType)
+        if not suffix:
+            return []
+        parts = self.parse(name)
+        problems = []
+        if parts['suffix'] != suffix:
+            problems.append("should end in _%s" % suffix)
+        if self.requirePrefix and not parts['prefix']:
+            problems.append("needs a prefix (%s)" % ", ".join(self.prefixes))
+        if self.requireSide and not parts['side']:
+            problems.append("needs a side (%s)" % ", ".join(self.sides))
+        if self.padding and parts['number'] and len(parts['number']) != self.padding:
+            problems.append("number should be padded to %d digits" % self.padding)
+        if pattern and not pattern.fullmatch(parts['body']):
+            problems.append("name should match %s" % pattern.pattern)
+        return problems
+
+    def suggest(self, name, nodeType):
+        """
+        Returns the name with its suffix and padding fixed, keeping the prefix, side and body.
+
+        Missing prefixes and sides, or a body that breaks a type pattern, can't be guessed, so
+        the suggestion may still need a hand edit.
+        """
+        suffix = self.expectedSuffix(nodeType)
+        if not suffix or self.isValid(name, nodeType):
+            return name
+        parts = self.parse(name)
+        number = parts['number'] or ''
+        if self.padding and number:
+            number = number.lstrip('0').zfill(self.padding)
+        tokens = [parts['prefix'], parts['side'], parts['body'] + number, suffix]
+        suggested = '_'.join(token for token in tokens if token)
+        return '%s:%s' % (parts['namespace'], suggested) if parts['namespace'] else suggested
+
+
+def alternation(words):
+    # Longest first so "GEO" can't shadow "GEOX"
+    words = sorted(words, key=len, reverse=True)
+    return '|'.join(re.escape(word) for word in words) if words else '(?!)'
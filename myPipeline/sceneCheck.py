@@ -1,119 +1,227 @@
 from PySide2 import QtWidgets, QtCore, QtGui
 import maya.cmds as cmds
-import pprint
-
-
-# List of things to check scene for:
-# Make sure all objects in outliner have correct suffix
-# all transforms are zero'd
-# no image planes, no history
-
-SUFFIXES = {
-    "mesh": "GEO",
-    "joint": "JNT",
-    "camera": None,
-    "nurbsCurve": "CV",
-    "ambientLight": "LGT",
-    "directionalLight": "LGT"
+import time
+from myPipeline import mayaCalls
+from myPipeline import sceneRules
+from myPipeline import sceneSnapshot
+from myPipeline import sceneWatcher
+
+# How long each timer tick may spend checking before handing control back to Maya's UI
+TIME_SLICE = 0.02
+# Nodes handed to a check at a time
+CHUNK_SIZE = 250
+
+
+class SceneCheck(sceneRules.SceneRules):
+
+    def __init__(self, epsilon=sceneRules.EPSILON):
+        super().__init__(epsilon)
+        self.snapshot = None
+
+    def takeSnapshot(self):
+        # Gathers the scene once so every test can run against the same in-memory copy
+        self.snapshot = sceneSnapshot.SceneSnapshot()
+        return self.snapshot
+
+    def report(self, snapshot, result):
+        # Warns about any failing nodes and hands the result back
+        if not result.passed:
+            cmds.warning("%s %s" % (sceneRules.FAILURE_MESSAGES[result.rule],
+                                    ", ".join(self.formatFailure(snapshot, result.rule, node) for node in result.failed)))
+        return result
+
+    # Each test returns a CheckResult, which is truthy when the test passed
+
+    def suffixTest(self, snapshot=None):
+        snapshot = snapshot or self.takeSnapshot()
+        return self.report(snapshot, self.runCheck(sceneRules.CHECKS["suffix"], snapshot))
+
+    def transformTest(self, snapshot=None):
+        snapshot = snapshot or self.takeSnapshot()
+        return self.report(snapshot, self.runCheck(sceneRules.CHECKS["transform"], snapshot))
+
+    def tidyTest(self, snapshot=None):
+        snapshot = snapshot or self.takeSnapshot()
+        planeCheck = self.report(snapshot, self.runCheck(sceneRules.CHECKS["imagePlane"], snapshot))
+        histCheck = self.report(snapshot, self.runCheck(sceneRules.CHECKS["history"], snapshot))
+        return sceneRules.CheckResult.combine("tidy", [planeCheck, histCheck])
+
+    # Fixes, each taking the snapshot the failures were found in and returning the nodes it changed.
+    # Renames go last and deepest first, so the long names the other fixes use stay valid
+
+    def fixImagePlanes(self, snapshot, planes):
+        # Deletes the plane's transform too unless something else lives under it
+        doomed = []
+        for plane in planes:
+            parent = snapshot.parents.get(plane)
+            doomed.append(parent if parent and len(snapshot.children.get(parent, [])) == 1 else plane)
+        cmds.delete(doomed)
+        return []
+
+    def fixHistory(self, snapshot, shapes):
+        # Shapes with deformers keep them, everything else loses its history in one delete
+        deformed = [geo for geo in shapes if "deformer" in snapshot.historyKinds(geo)]
+        plain = [geo for geo in shapes if geo not in deformed]
+        if plain:
+            cmds.delete(plain, constructionHistory=True)
+        if deformed:
+            cmds.bakePartialHistory(deformed, prePostDeformers=True)
+        return shapes
+
+    def fixTransforms(self, snapshot, transforms):
+        # Joints and lights keep their translation, the same exception the transform test makes
+        keepTranslate = [obj for obj in transforms if obj.endswith('_LGT') or
+                         any(snapshot.types[child] == 'joint' for child in snapshot.children.get(obj, []))]
+        freezeAll = [obj for obj in transforms if obj not in keepTranslate]
+        if freezeAll:
+            cmds.makeIdentity(freezeAll, apply=True, translate=True, rotate=True, scale=True, preserveNormals=True)
+        if keepTranslate:
+            cmds.makeIdentity(keepTranslate, apply=True, translate=False, rotate=True, scale=True,
+                              preserveNormals=True)
+        return transforms
+
+    def fixSuffixes(self, snapshot, nodes):
+        for obj in sorted(nodes, key=lambda path: path.count('|'), reverse=True):
+            cmds.rename(obj, self.suffixedName(snapshot, obj))
+        return nodes
+
+    def fixAll(self, failures, snapshot=None):
+        """
+        Fixes every failing node in one undo chunk, then re-checks only the nodes that were touched.
+
+        Args:
+            failures (dict) {rule: failing nodes}, e.g. from the last check run
+            snapshot (SceneSnapshot) The snapshot the failures were found in, default the last one taken
+
+        Returns:
+            {check name: CheckResult} for the touched nodes, empty when the fixes only deleted nodes
+        """
+        snapshot = snapshot or self.snapshot
+        # Nodes are tracked by UUID since renames and reparenting freezes change their long names
+        touched = set()
+        cmds.undoInfo(openChunk=True, chunkName="sceneCheckFixAll")
+        cmds.refresh(suspend=True)
+        try:
+            for rule, fix in FIXES.items():
+                failed = list(failures.get(rule, ()))
+                if not failed:
+                    continue
+                # Drops anything deleted or renamed since the check ran
+                existing = set(cmds.ls(failed, long=True) or [])
+                nodes = [node for node in failed if node in existing]
+                if nodes:
+                    # Resolved before the fix runs, renames leave the returned paths stale
+                    uuids = dict(zip(nodes, cmds.ls(nodes, uuid=True) or []))
+                    changed = fix(self, snapshot, nodes)
+                    touched.update(uuids[node] for node in changed if node in uuids)
+        finally:
+            cmds.refresh(suspend=False)
+            cmds.undoInfo(closeChunk=True)
+
+        # An empty node list would re-check the whole scene
+        if not touched:
+            return {}
+        snapshot = self.takeSnapshot()
+        touchedPaths = set(cmds.ls(list(touched), long=True) or [])
+        # A shape's transform is checked too, its suffix and freeze state can follow from the shape
+        touchedPaths |= {snapshot.parents[path] for path in touchedPaths if path in snapshot.parents}
+        results = {}
+        for check in self.orderedChecks(snapshot):
+            results[check.name] = self.report(snapshot, self.runCheck(check, snapshot, touchedPaths))
+        return results
+
+
+# Fixes per rule, in the order they are applied
+FIXES = {
+    "imagePlane": SceneCheck.fixImagePlanes,
+    "history": SceneCheck.fixHistory,
+    "transform": SceneCheck.fixTransforms,
+    "suffix": SceneCheck.fixSuffixes
 }
-DEFAULT_SUFFIX = "GRP"
-
-
-class SceneCheck:
-
-    def suffixTest(self):
-
-        # Checks scene DAG objects and their suffixes
-
-        transforms = cmds.ls(dag=True, et=('transform', 'joint'))
-        failed = []
-        for obj in transforms:
-
-            children = cmds.listRelatives(obj, children=True, fullPath=True) or []
-
-            if len(children) == 1:
-                child = children[0]
-                objType = cmds.objectType(child)
-            else:
-                objType = cmds.objectType(obj)
-
-            suffix = SUFFIXES.get(objType, DEFAULT_SUFFIX)
-            # filtering objects that pass the test
-            if not suffix or obj.endswith('_' + suffix) or obj.endswith("Shape"):
-                continue
-            else:
-                failed.append(obj)
-        if not failed:
-            # Scene has passed Suffix Test!
-            return True
-        else:
-            cmds.warning("The following objects have the incorrect suffix:")
-            pprint.pprint(failed, indent=4)
-            return False
-
-    def transformTest(self):
 
-        # Checks if the objects have frozen transforms
-
-        transforms = cmds.ls(dag=True, et='transform')
-        failed = []
-        for obj in transforms:
-            objType = cmds.listRelatives(obj, children=True)
-            if not objType:
-                continue
-            objType = objType[-1]
-            if cmds.objectType(objType) == 'camera':
-                continue
-            if cmds.objectType(objType) == 'joint' or obj.endswith('_LGT'):
-                if not cmds.getAttr(obj + '.rotate') == [(0.0, 0.0, 0.0)] and \
-                        cmds.getAttr(obj + '.scale') == [(1.0, 1.0, 1.0)]:
-                    failed.append(obj)
-            else:
-                if not cmds.getAttr(obj + '.translate') == [(0.0, 0.0, 0.0)] and\
-                        cmds.getAttr(obj + '.rotate') == [(0.0, 0.0, 0.0)] and\
-                        cmds.getAttr(obj + '.scale') == [(1.0, 1.0, 1.0)]:
-                    failed.append(obj)
-
-        if not failed:
-            # Scene has passed Transform Test!
-            return True
-        else:
-            cmds.warning("The following objects need transforms frozen:")
-            pprint.pprint(failed, indent=4)
-            return False
 
-    def tidyTest(self):
-
-        # checking for existing reference planes
-
-        existingPlanes = cmds.ls(et='imagePlane')
-        if existingPlanes:
-            cmds.warning("Please remove all image planes:")
-            pprint.pprint(existingPlanes, indent=4, )
-            planeCheck = False
-        else:
-            # No image planes found!
-            planeCheck = True
-
-        # checking for history on existing geo
-
-        existingGeo = cmds.ls(g=True)
-        failed = []
-        for geo in existingGeo:
-            history = cmds.listHistory(geo, pdo=True)
-            if history:
-                failed.append(geo)
-        if not failed:
-            # print("Scene has no outstanding history!")
-            histCheck = True
-        else:
-            cmds.warning("The following objects have existing history:")
-            pprint.pprint(failed, indent=4)
-            histCheck = False
-        if planeCheck and histCheck:
-            return True
-        else:
-            return False
+class CheckRunner(QtCore.QObject):
+    """
+    Runs the registered checks a chunk of nodes at a time off a zero-interval timer.
+
+    The Maya API may only be used from the main thread, so rather than a worker thread the
+    checks are time-sliced: each tick works for TIME_SLICE seconds and then lets Maya redraw
+    and handle input, including the Cancel button.
+    """
+    progress = QtCore.Signal(str, int, int)
+    nodesFailed = QtCore.Signal(str, list)
+    checkFinished = QtCore.Signal(object)
+    finished = QtCore.Signal(bool)
+
+    def __init__(self, sceneCheck, parent=None):
+        super().__init__(parent)
+        self.sceneCheck = sceneCheck
+        self.snapshot = None
+        self.results = {}
+        self.steps = None
+        # Keeps cmds wrapped for the whole run, each chunk counts its calls without re-wrapping
+        self.callsHold = None
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.step)
+
+    def isRunning(self):
+        return self.timer.isActive()
+
+    def start(self, names=None, failFast=False):
+        self.timer.stop()
+        self.releaseCalls()
+        self.callsHold = mayaCalls.hold()
+        self.snapshot = self.sceneCheck.takeSnapshot()
+        self.results = {}
+        self.steps = self.iterSteps(self.sceneCheck.orderedChecks(self.snapshot, names), failFast)
+        self.timer.start()
+
+    def iterSteps(self, checks, failFast):
+        # Yields after every chunk so step() can decide whether there is time left for another
+        for check in checks:
+            nodes = check.scopeNodes(self.snapshot)
+            # Merged once the check is done, merging every chunk would copy all failures so far each time
+            chunks = []
+            self.progress.emit(check.name, 0, len(nodes))
+            for start in range(0, len(nodes), CHUNK_SIZE):
+                chunk = self.sceneCheck.runCheck(check, self.snapshot, nodes[start:start + CHUNK_SIZE])
+                chunks.append(chunk)
+                if chunk.failed:
+                    self.nodesFailed.emit(check.name, list(chunk.failed))
+                self.progress.emit(check.name, min(start + CHUNK_SIZE, len(nodes)), len(nodes))
+                yield
+            result = self.results[check.name] = sceneRules.CheckResult.combine(check.name, chunks)
+            self.checkFinished.emit(result)
+            if failFast and not result.passed:
+                return
+
+    def step(self):
+        end = time.perf_counter() + TIME_SLICE
+        try:
+            while time.perf_counter() < end:
+                next(self.steps)
+        except StopIteration:
+            self.timer.stop()
+            self.steps = None
+            self.releaseCalls()
+            self.finished.emit(self.passed())
+
+    def cancel(self):
+        if self.isRunning():
+            self.timer.stop()
+            self.steps = None
+            self.releaseCalls()
+            self.results = {}
+            self.finished.emit(False)
+
+    def releaseCalls(self):
+        if self.callsHold is not None:
+            mayaCalls.release(self.callsHold)
+            self.callsHold = None
+
+    def passed(self):
+        return bool(self.results) and all(self.results.values())
 
 
 class SceneCheckUI(QtWidgets.QDialog):
@@ -122,66 +230,202 @@ class SceneCheckUI(QtWidgets.QDialog):
         self.setWindowTitle("Scene Check Tool")
         self.setMinimumSize(165, 155)
         self.sceneCheck = SceneCheck()
+        self.incremental = sceneWatcher.IncrementalSceneCheck(self.sceneCheck)
+        self.runner = CheckRunner(self.sceneCheck, self)
+        self.runner.progress.connect(self.updateProgress)
+        self.runner.nodesFailed.connect(self.addFailures)
+        self.runner.checkFinished.connect(self.checkFinished)
+        self.runner.finished.connect(self.runFinished)
         self.buildUI()
 
     def buildUI(self):
         layout = QtWidgets.QVBoxLayout(self)
 
         self.suffixBtn = QtWidgets.QPushButton("Suffix Test")
-        self.suffixBtn.clicked.connect(self.suffixTest)
+        self.suffixBtn.clicked.connect(lambda: self.suffixTest())
         layout.addWidget(self.suffixBtn)
 
         self.transformBtn = QtWidgets.QPushButton("Transform Test")
-        self.transformBtn.clicked.connect(self.transformTest)
+        self.transformBtn.clicked.connect(lambda: self.transformTest())
         layout.addWidget(self.transformBtn)
 
         self.tidyBtn = QtWidgets.QPushButton("Tidy Test")
-        self.tidyBtn.clicked.connect(self.tidyTest)
+        self.tidyBtn.clicked.connect(lambda: self.tidyTest())
         layout.addWidget(self.tidyBtn)
 
         self.checkAllBtn = QtWidgets.QPushButton("Check All")
-        self.checkAllBtn.clicked.connect(self.testAll)
+        self.checkAllBtn.clicked.connect(lambda: self.testAll())
         layout.addWidget(self.checkAllBtn)
 
+        # Re-checks only what changed since the last Check All
+        self.incrementalCheck = QtWidgets.QCheckBox("Incremental")
+        self.incrementalCheck.toggled.connect(self.toggleIncremental)
+        layout.addWidget(self.incrementalCheck)
+
+        # One progress bar per registered check, checks registered later get theirs on first use
+        self.progressLayout = QtWidgets.QVBoxLayout()
+        layout.addLayout(self.progressLayout)
+        self.progressBars = {}
+        for name in sceneRules.CHECKS:
+            self.progressBar(name)
+
+        self.cancelBtn = QtWidgets.QPushButton("Cancel")
+        self.cancelBtn.setEnabled(False)
+        self.cancelBtn.clicked.connect(self.runner.cancel)
+        layout.addWidget(self.cancelBtn)
+
+        # Failing nodes stream in here as the checks find them, double click to select one
+        self.resultsList = QtWidgets.QListWidget()
+        self.resultsList.itemDoubleClicked.connect(self.selectResult)
+        layout.addWidget(self.resultsList)
+
+        # Fixes everything the last run found, undoable in one step
+        self.fixAllBtn = QtWidgets.QPushButton("Fix All")
+        self.fixAllBtn.clicked.connect(self.fixAll)
+        layout.addWidget(self.fixAllBtn)
+
+        exportBtn = QtWidgets.QPushButton("Export Results")
+        exportBtn.clicked.connect(self.exportResults)
+        layout.addWidget(exportBtn)
+
+        self.tidyResults = {}
+        self.results = []
+        self.ruleButtons = {
+            "suffix": self.suffixBtn,
+            "transform": self.transformBtn,
+            "imagePlane": self.tidyBtn,
+            "history": self.tidyBtn
+        }
+
 # Each button initiates check and changes color of itself based of pass/fail
 
-    def suffixTest(self, status=None):
-        passed = self.sceneCheck.suffixTest()
-        if passed:
-            self.suffixBtn.setStyleSheet("background-color: green")
-        else:
-            self.suffixBtn.setStyleSheet("background-color: red")
-        return passed
+    def suffixTest(self):
+        self.runChecks(["suffix"])
 
     def transformTest(self):
-        passed = self.sceneCheck.transformTest()
-        if passed:
-            self.transformBtn.setStyleSheet("background-color: green")
-        else:
-            self.transformBtn.setStyleSheet("background-color: red")
-        return passed
+        self.runChecks(["transform"])
 
     def tidyTest(self):
-        passed = self.sceneCheck.tidyTest()
-        if passed:
-            self.tidyBtn.setStyleSheet("background-color: green")
+        self.runChecks(["imagePlane", "history"])
+
+    def colorButton(self, button, passed):
+        if passed is None:
+            # Not run, e.g. skipped by a fail-fast run
+            button.setStyleSheet("")
+        elif passed:
+            button.setStyleSheet("background-color: green")
         else:
-            self.tidyBtn.setStyleSheet("background-color: red")
-        return passed
-
-    # Essentially hits all the buttons at the same time and compares them
-    def testAll(self):
-
-        tests = [self.suffixTest(),
-                 self.transformTest(),
-                 self.tidyTest()]
-        if all(tests):
-            self.checkAllBtn.setStyleSheet("background-color: green")
+            button.setStyleSheet("background-color: red")
+
+    # Essentially hits all the buttons at the same time, off one shared snapshot.
+    # failFast stops at the first failing check, cheapest checks first. With wait the call only
+    # returns once the checks are done (Maya's UI keeps running meanwhile) and returns whether they passed.
+    # A run already in progress is restarted then, it may be of other checks or an older scene state
+    def testAll(self, failFast=False, wait=False):
+
+        if self.incrementalCheck.isChecked():
+            start = time.perf_counter()
+            failures = self.incremental.check()
+            duration = time.perf_counter() - start
+            self.clearResults(failures)
+            for rule, failed in failures.items():
+                self.addFailures(rule, failed, self.incremental.snapshot)
+                # The incremental run is timed as a whole, so its time goes on the first result
+                self.checkFinished(sceneRules.CheckResult(rule, failed, duration))
+                duration = 0.0
+            self.runFinished(not any(failures.values()))
+            return not any(failures.values())
+
+        self.runChecks(None, failFast, restart=wait)
+        if wait:
+            while self.runner.isRunning():
+                QtWidgets.QApplication.processEvents(QtCore.QEventLoop.AllEvents, 50)
+            return self.runner.passed()
+
+    def runChecks(self, names, failFast=False, restart=False):
+        # The runner's start drops the run in progress
+        if self.runner.isRunning() and not restart:
+            return
+        self.clearResults(names or sceneRules.CHECKS)
+        self.cancelBtn.setEnabled(True)
+        self.runner.start(names, failFast)
+
+    def clearResults(self, names):
+        self.resultsList.clear()
+        self.tidyResults = {}
+        self.results = []
+        for name in names:
+            self.progressBar(name).reset()
+            self.colorButton(self.ruleButtons.get(name, self.checkAllBtn), None)
+        self.colorButton(self.checkAllBtn, None)
+
+    def progressBar(self, name):
+        if name not in self.progressBars:
+            bar = QtWidgets.QProgressBar()
+            bar.setFormat("%s %%p%%" % name)
+            self.progressLayout.addWidget(bar)
+            self.progressBars[name] = bar
+        return self.progressBars[name]
+
+    def updateProgress(self, name, done, total):
+        bar = self.progressBar(name)
+        bar.setMaximum(max(total, 1))
+        bar.setValue(done if total else 1)
+
+    def addFailures(self, name, nodes, snapshot=None):
+        snapshot = snapshot or self.runner.snapshot
+        for node in nodes:
+            item = QtWidgets.QListWidgetItem("[%s] %s" % (name, self.sceneCheck.formatFailure(snapshot, name, node)))
+            item.setData(QtCore.Qt.UserRole, node)
+            self.resultsList.addItem(item)
+
+    def checkFinished(self, result):
+        self.results.append(result)
+        passed = result.passed
+        if result.rule in ("imagePlane", "history"):
+            # The tidy button covers both rules
+            self.tidyResults[result.rule] = passed
+            passed = all(self.tidyResults.values())
+        self.colorButton(self.ruleButtons.get(result.rule, self.checkAllBtn), passed)
+
+    def runFinished(self, passed):
+        self.cancelBtn.setEnabled(False)
+        self.colorButton(self.checkAllBtn, passed)
+        if passed:
             print("Passed Scene Check!")
-            return True
         else:
-            self.checkAllBtn.setStyleSheet("background-color: red")
-            cmds.warning("Failed scene check. Check console for more details ->")
-
-
-
+            cmds.warning("Failed scene check. See the Scene Check Tool for details.")
+
+    def fixAll(self):
+        failures = {result.rule: result.failed for result in self.results if not result.passed}
+        if self.runner.isRunning() or not failures:
+            return
+        results = self.sceneCheck.fixAll(failures)
+        self.clearResults(results)
+        for result in results.values():
+            self.addFailures(result.rule, result.failed, self.sceneCheck.snapshot)
+            self.checkFinished(result)
+        self.runFinished(all(results.values()))
+
+    def exportResults(self):
+        if not self.results:
+            cmds.warning("Run a check before exporting its results.")
+            return
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export Results", filter="JSON (*.json);;CSV (*.csv)")
+        if path:
+            sceneRules.writeResults(self.results, path, scene=cmds.file(q=True, sn=True))
+
+    def selectResult(self, item):
+        node = item.data(QtCore.Qt.UserRole)
+        if cmds.objExists(node):
+            cmds.select(node)
+
+    def toggleIncremental(self, enabled):
+        # Callbacks cost a little on every scene edit, so only keep them while incremental mode is on
+        if not enabled:
+            self.incremental.stop()
+
+    def closeEvent(self, event):
+        self.runner.cancel()
+        self.incremental.stop()
+        super().closeEvent(event)
@@ -0,0 +1,283 @@
+import csv
+import json
+import time
+import numpy as np
+from myPipeline import mayaCalls
+from myPipeline import namingRules
+
+# The scene check rules, run on a live sceneSnapshot.SceneSnapshot or an asciiScene.AsciiSnapshot
+
+# List of things to check scene for:
+# Make sure all objects in outliner have correct suffix
+# all transforms are zero'd
+# no image planes, no history
+
+# The naming rules live in namingRules, these are the studio defaults it starts from
+SUFFIXES = namingRules.SUFFIXES
+DEFAULT_SUFFIX = namingRules.DEFAULT_SUFFIX
+# Warnings printed for each rule's failing nodes
+FAILURE_MESSAGES = {
+    "suffix": "The following objects have the incorrect suffix:",
+    "transform": "The following objects need transforms frozen:",
+    "imagePlane": "Please remove all image planes:",
+    "history": "The following objects have existing history:"
+}
+# Anything closer than this to the identity value counts as frozen
+EPSILON = 1e-5
+
+
+def unfrozenIndices(translate, rotate, scale, ignoreTranslate, epsilon=EPSILON):
+    # Tests every transform at once, returning the indices of rows that aren't frozen.
+    # ignoreTranslate is a bool array flagging the rows (joints and lights) that may keep their translation
+    translated = np.any(np.abs(translate) > epsilon, axis=1) & ~ignoreTranslate
+    rotated = np.any(np.abs(rotate) > epsilon, axis=1)
+    scaled = np.any(np.abs(scale - 1.0) > epsilon, axis=1)
+    return np.flatnonzero(translated | rotated | scaled)
+
+
+class SceneRules:
+
+    def __init__(self, epsilon=EPSILON, naming=None):
+        self.epsilon = epsilon
+        self.naming = naming or namingRules.NamingRules()
+
+    # Each *Failures method returns the failing nodes, optionally limited to the given nodes so
+    # incremental checks only revisit what changed
+
+    def suffixFailures(self, snapshot, nodes=None):
+
+        # Checks scene DAG objects and their suffixes
+
+        failed = []
+        for obj in snapshot.nodesOfType(('transform', 'joint'), nodes):
+
+            # filtering objects that pass the test
+            if obj.endswith("Shape") or self.naming.isValid(obj.rpartition('|')[2], self.namingType(snapshot, obj)):
+                continue
+            else:
+                failed.append(obj)
+        return failed
+
+    def namingType(self, snapshot, obj):
+        # A transform with a single shape is named after the shape's type, anything else after its own
+        children = snapshot.children.get(obj, [])
+
+        if len(children) == 1:
+            return snapshot.types[children[0]]
+        return snapshot.types[obj]
+
+    def suffixedName(self, snapshot, obj):
+        # Short name the naming rules suggest renaming obj to
+        return self.naming.suggest(obj.rpartition('|')[2], self.namingType(snapshot, obj))
+
+    def transformFailures(self, snapshot, nodes=None):
+
+        # Checks if the objects have frozen transforms
+
+        candidates = []
+        ignoreTranslate = []
+        for obj in snapshot.nodesOfType(('transform',), nodes):
+            children = snapshot.children.get(obj)
+            if not children:
+                continue
+            objType = snapshot.types[children[-1]]
+            if objType == 'camera':
+                continue
+            candidates.append(obj)
+            ignoreTranslate.append(objType == 'joint' or obj.endswith('_LGT'))
+
+        translate, rotate, scale = snapshot.transformArrays(candidates)
+        failedIndices = unfrozenIndices(translate, rotate, scale, np.array(ignoreTranslate, dtype=bool),
+                                        self.epsilon)
+        return [candidates[i] for i in failedIndices]
+
+    def imagePlaneFailures(self, snapshot, nodes=None):
+
+        # checking for existing reference planes
+
+        # Chunked runs test every plane against the chunk, so look the chunk up as a set
+        nodes = None if nodes is None else set(nodes)
+        return [plane for plane in snapshot.imagePlanes if nodes is None or plane in nodes]
+
+    def historyFailures(self, snapshot, nodes=None):
+
+        # checking for history on existing geo
+
+        nodes = None if nodes is None else set(nodes)
+        shapes = [geo for geo in snapshot.geometry if nodes is None or geo in nodes]
+        index = snapshot.historyIndex(shapes)
+        return [geo for geo in shapes if index.hasHistory(geo)]
+
+    def formatFailure(self, snapshot, rule, node):
+        # One line per failing node, history failures also name the kind of history found
+        if rule == "history":
+            kinds = snapshot.historyKinds(node)
+            return "%s (%s)" % (node, "; ".join("%s: %s" % (kind, ", ".join(types)) for kind, types in kinds.items()))
+        return node
+
+    def signature(self):
+        # The settings and registered checks results depend on, besides the scene itself
+        checks = sorted('%s:%s:%s:%s' % (check.name, check.function.__qualname__, check.scope, check.cost)
+                        for check in CHECKS.values())
+        return '|'.join(['epsilon=%r' % self.epsilon, self.naming.signature] + checks)
+
+    def orderedChecks(self, snapshot, names=None):
+        # Cheapest checks first, so a failing scene is usually caught before the expensive ones run
+        checks = [check for check in CHECKS.values() if names is None or check.name in names]
+        return sorted(checks, key=lambda check: check.estimatedCost(snapshot))
+
+    def runCheck(self, check, snapshot, nodes=None):
+        # Runs one check, timing it and counting the Maya calls it makes
+        start = time.perf_counter()
+        with mayaCalls.counting() as counter:
+            failed = check.function(self, snapshot, nodes)
+        return CheckResult(check.name, failed, time.perf_counter() - start, counter.calls,
+                           len(check.scopeNodes(snapshot)) if nodes is None else len(nodes))
+
+    def runChecks(self, snapshot, names=None, failFast=False):
+        """
+        Runs the registered checks over the snapshot in cost order.
+
+        Every check shares the snapshot, so anything one check fetches (transform values, the
+        history index) is already there for the next. With failFast the run stops at the first
+        failing check, which is what commit gating wants.
+
+        Returns:
+            {check name: CheckResult} for the checks that ran, in the order they ran
+        """
+        results = {}
+        for check in self.orderedChecks(snapshot, names):
+            results[check.name] = self.runCheck(check, snapshot)
+            if failFast and not results[check.name].passed:
+                break
+        return results
+
+    def checkAll(self, snapshot):
+        # Runs every rule over the whole snapshot, returning {rule: CheckResult}
+        return self.runChecks(snapshot)
+
+
+class CheckResult:
+    """
+    Outcome of one check: the rule, its failing nodes, how long it took and how many Maya
+    commands it called. Truthy when the check passed.
+    """
+    __slots__ = ('rule', 'failed', 'duration', 'callCount', 'nodeCount')
+    FIELDS = ('rule', 'passed', 'failed', 'duration', 'callCount', 'nodeCount')
+
+    def __init__(self, rule, failed, duration=0.0, callCount=0, nodeCount=0):
+        self.rule = rule
+        self.failed = tuple(failed)
+        self.duration = duration
+        self.callCount = callCount
+        self.nodeCount = nodeCount
+
+    @property
+    def passed(self):
+        return not self.failed
+
+    def __bool__(self):
+        return self.passed
+
+    def __repr__(self):
+        return "<CheckResult %s %s %d failed %.3fs %d calls>" % (
+            self.rule, "passed" if self.passed else "FAILED", len(self.failed), self.duration, self.callCount)
+
+    @classmethod
+    def combine(cls, rule, results):
+        # Merges several results into one, e.g. the image plane and history checks of the tidy test
+        results = list(results)
+        combined = cls(rule, [node for result in results for node in result.failed])
+        for result in results:
+            combined.duration += result.duration
+            combined.callCount += result.callCount
+            combined.nodeCount += result.nodeCount
+        return combined
+
+    def toDict(self):
+        return {
+            'rule': self.rule,
+            'passed': self.passed,
+            'failed': list(self.failed),
+            'duration': round(self.duration, 6),
+            'callCount': self.callCount,
+            'nodeCount': self.nodeCount
+        }
+
+
+def writeResults(results, path, **extra):
+    """
+    Writes check results to path as JSON or CSV, picked by the file extension.
+
+    Args:
+        results (list) CheckResults to write
+        path (str) The .json or .csv file to write
+        extra: Columns added to every row, e.g. scene=<path to the scene checked>
+    """
+    rows = [dict(extra, **result.toDict()) for result in results]
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(extra) + list(CheckResult.FIELDS))
+            writer.writeheader()
+            for row in rows:
+                row['failed'] = ';'.join(row['failed'])
+                writer.writerow(row)
+    else:
+        with open(path, 'w') as f:
+            json.dump(rows, f, indent=4)
+
+
+# Which snapshot nodes a check walks, used to estimate what it will cost on a given scene
+SCOPES = {
+    "transforms": lambda snapshot: snapshot.nodesOfType(('transform', 'joint')),
+    "geometry": lambda snapshot: snapshot.geometry,
+    "imagePlanes": lambda snapshot: snapshot.imagePlanes
+}
+
+
+class Check:
+    """
+    A registered scene check.
+
+    function(rules, snapshot, nodes=None) returns the failing nodes, scope names the snapshot
+    nodes it walks and cost is its rough cost per node relative to the other checks.
+    """
+    __slots__ = ('name', 'function', 'scope', 'cost')
+
+    def __init__(self, name, function, scope, cost):
+        self.name = name
+        self.function = function
+        self.scope = scope
+        self.cost = cost
+
+    def scopeNodes(self, snapshot):
+        return SCOPES[self.scope](snapshot)
+
+    def estimatedCost(self, snapshot):
+        return self.cost * len(self.scopeNodes(snapshot))
+
+
+CHECKS = {}
+
+
+def registerCheck(name, function, scope, cost, message):
+    """
+    Adds a check to the registry, replacing any check with the same name.
+
+    Args:
+        name (str) Name the check is reported under
+        function (callable) function(rules, snapshot, nodes=None) returning the failing nodes
+        scope (str) One of SCOPES
+        cost (float) Rough cost per scope node relative to the built in checks
+        message (str) Warning printed above the failing nodes
+    """
+    CHECKS[name] = Check(name, function, scope, cost)
+    FAILURE_MESSAGES[name] = message
+
+
+# Image planes are already in the snapshot and suffixes only need names and types, while
+# transforms need their values fetched and history needs the graph walked
+registerCheck("imagePlane", SceneRules.imagePlaneFailures, "imagePlanes", 0.1, FAILURE_MESSAGES["imagePlane"])
+registerCheck("suffix", SceneRules.suffixFailures, "transforms", 1, FAILURE_MESSAGES["suffix"])
+registerCheck("transform", SceneRules.transformFailures, "transforms", 2, FAILURE_MESSAGES["transform"])
+registerCheck("history", SceneRules.historyFailures, "geometry", 5, FAILURE_MESSAGES["history"])
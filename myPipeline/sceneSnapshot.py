@@ -0,0 +1,133 @@
+import numpy as np
+import maya.cmds as cmds
+from maya.api import OpenMaya as om
+from myPipeline import historyIndex
+
+
+class SceneSnapshot:
+    """
+    In-memory copy of the parts of the scene the scene checks need.
+
+    Everything is gathered up front in a few batched queries so the checks can walk
+    plain dicts instead of calling cmds once (or more) per node.
+    """
+
+    def __init__(self):
+        self.types = {}
+        self.children = {}
+        self.parents = {}
+        self.geometry = []
+        self.imagePlanes = []
+        self._transformIndex = {}
+        self._translate = np.zeros((0, 3))
+        self._rotate = np.zeros((0, 3))
+        self._scale = np.ones((0, 3))
+        self._historyIndex = historyIndex.HistoryIndex()
+        self.collect()
+
+    def collect(self):
+        # Long names encode the hierarchy, so a single ls gives us names, types and parent/child links
+        self.types.clear()
+        self.children.clear()
+        self.parents.clear()
+        dagNodes = cmds.ls(dag=True, long=True, showType=True) or []
+        for path, nodeType in zip(dagNodes[::2], dagNodes[1::2]):
+            self.types[path] = nodeType
+            parent = path.rpartition('|')[0]
+            if parent:
+                self.parents[path] = parent
+                self.children.setdefault(parent, []).append(path)
+
+        self.geometry = cmds.ls(g=True, long=True) or []
+        self.imagePlanes = cmds.ls(et='imagePlane', long=True) or []
+
+    def refreshStructure(self):
+        # Re-reads names and hierarchy, keeping fetched values for the nodes that still exist
+        self.collect()
+        self.invalidate([path for path in self._transformIndex if path not in self.types])
+        self.invalidate([path for path in self._historyIndex.indexed if path not in self.types])
+
+    def invalidate(self, paths):
+        # Forgets cached values so they are fetched again the next time a check asks for them
+        for path in paths:
+            self._transformIndex.pop(path, None)
+        self._historyIndex.reset(paths)
+
+    def nodesOfType(self, nodeTypes, nodes=None):
+        if nodes is None:
+            return [path for path, nodeType in self.types.items() if nodeType in nodeTypes]
+        return [path for path in nodes if self.types.get(path) in nodeTypes]
+
+    def transformArrays(self, paths):
+        # Returns translate, rotate and scale as Nx3 arrays in the order of the given transforms,
+        # fetching only the ones not fetched yet (or invalidated since)
+        missing = [path for path in paths if path not in self._transformIndex]
+        if missing:
+            self.fetchTransformValues(missing)
+        rows = [self._transformIndex[path] for path in paths]
+        return self._translate[rows], self._rotate[rows], self._scale[rows]
+
+    def fetchTransformValues(self, paths):
+        # One selection list pass through the API instead of three getAttr calls per transform
+        translateRows = np.zeros((len(paths), 3))
+        rotateRows = np.zeros((len(paths), 3))
+        scaleRows = np.ones((len(paths), 3))
+        selection = om.MSelectionList()
+        for path in paths:
+            selection.add(path)
+        for i in range(len(paths)):
+            transformFn = om.MFnTransform(selection.getDagPath(i))
+            translate = transformFn.translation(om.MSpace.kTransform)
+            rotate = transformFn.rotation()
+            translateRows[i] = (translate.x, translate.y, translate.z)
+            rotateRows[i] = (rotate.x, rotate.y, rotate.z)
+            scaleRows[i] = transformFn.scale()
+        # getAttr reports rotation in degrees, keep the arrays in the same units
+        np.degrees(rotateRows, out=rotateRows)
+
+        # Refetched nodes get new rows, stale ones are simply no longer indexed
+        offset = len(self._translate)
+        self._translate = np.concatenate((self._translate, translateRows))
+        self._rotate = np.concatenate((self._rotate, rotateRows))
+        self._scale = np.concatenate((self._scale, scaleRows))
+        for i, path in enumerate(paths):
+            self._transformIndex[path] = offset + i
+
+    def historyIndex(self, shapes=None):
+        # Indexes the history of the given shapes (default all geometry) not indexed yet, so later
+        # lookups are plain dict walks
+        shapes = self.geometry if shapes is None else shapes
+        missing = [geo for geo in shapes if not self._historyIndex.isIndexed(geo)]
+        if missing:
+            self.indexHistory(missing)
+        return self._historyIndex
+
+    def indexHistory(self, shapes):
+        # Walks upstream from all shapes at once with one listConnections call per level of the graph,
+        # rather than a full listHistory walk per shape
+        index = self._historyIndex
+        index.reset(shapes)
+        longNames = dict(zip(cmds.ls(shapes) or [], shapes))
+        frontier = list(shapes)
+        while frontier:
+            index.indexed.update(frontier)
+            pairs = cmds.listConnections(frontier, source=True, destination=False, connections=True,
+                                         skipConversionNodes=True, fullNodeName=True) or []
+            # Like listHistory's pruneDagObjects, the walk stops at DAG nodes
+            sources = {source for source in pairs[1::2] if source not in self.types}
+            if not sources:
+                break
+            typeList = cmds.ls(list(sources), showType=True) or []
+            sourceTypes = dict(zip(typeList[::2], typeList[1::2]))
+            for plug, source in zip(pairs[::2], pairs[1::2]):
+                if source in sources:
+                    destination = plug.partition('.')[0]
+                    index.addConnection(source, longNames.get(destination, destination), sourceTypes.get(source))
+            frontier = [source for source in sources if not index.isIndexed(source) and
+                        sourceTypes.get(source) not in historyIndex.IGNORED_TYPES]
+
+    def hasHistory(self, geo):
+        return self.historyIndex([geo]).hasHistory(geo)
+
+    def historyKinds(self, geo):
+        return self.historyIndex([geo]).historyKinds(geo)
@@ -0,0 +1,178 @@
+from maya.api import OpenMaya as om
+from myPipeline import sceneRules
+from myPipeline import sceneSnapshot
+
+# Attributes whose edits can change the result of the transform test
+TRANSFORM_ATTRS = {'t', 'tx', 'ty', 'tz', 'r', 'rx', 'ry', 'rz', 's', 'sx', 'sy', 'sz'}
+
+
+class SceneWatcher:
+    """
+    Listens to Maya scene-change callbacks and keeps track of which nodes need checking again.
+
+    Adding, removing, renaming or reparenting a DAG node changes long names throughout the
+    hierarchy, so those only raise structureDirty and the snapshot works out the new paths.
+    Attribute and connection edits are tracked per node.
+    """
+
+    def __init__(self):
+        self.callbackIds = []
+        self.nodeCallbackIds = {}
+        self.dirty = {}
+        self.structureDirty = False
+        self.sceneReset = False
+
+    def start(self, snapshot):
+        self.stop()
+        self.callbackIds = [
+            om.MDGMessage.addNodeAddedCallback(self.nodeAdded, 'dagNode'),
+            om.MDGMessage.addNodeRemovedCallback(self.nodeRemoved, 'dagNode'),
+            om.MNodeMessage.addNameChangedCallback(om.MObject(), self.nameChanged),
+            om.MDagMessage.addAllDagChangesCallback(self.dagChanged),
+            om.MDGMessage.addConnectionCallback(self.connectionChanged),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterOpen, self.sceneChanged),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterNew, self.sceneChanged),
+        ]
+        transforms = snapshot.nodesOfType(('transform', 'joint'))
+        selection = om.MSelectionList()
+        for path in transforms:
+            selection.add(path)
+        for i in range(len(transforms)):
+            self.watchAttributes(selection.getDependNode(i))
+        self.clear()
+
+    def stop(self):
+        for callbackId in self.callbackIds + list(self.nodeCallbackIds.values()):
+            try:
+                om.MMessage.removeCallback(callbackId)
+            except RuntimeError:
+                # Node callbacks are already gone if Maya deleted the node
+                pass
+        self.callbackIds = []
+        self.nodeCallbackIds = {}
+
+    def clear(self):
+        self.dirty = {}
+        self.structureDirty = False
+        self.sceneReset = False
+
+    def isRunning(self):
+        return bool(self.callbackIds)
+
+    def watchAttributes(self, node):
+        handle = om.MObjectHandle(node)
+        if handle.hashCode() not in self.nodeCallbackIds:
+            self.nodeCallbackIds[handle.hashCode()] = om.MNodeMessage.addAttributeChangedCallback(
+                node, self.attributeChanged)
+
+    def markDirty(self, node):
+        handle = om.MObjectHandle(node)
+        self.dirty[handle.hashCode()] = handle
+
+    def dirtyPaths(self):
+        # Resolves the dirty nodes that still exist to their current long names
+        paths = set()
+        for handle in self.dirty.values():
+            if handle.isValid() and handle.object().hasFn(om.MFn.kDagNode):
+                for dagPath in om.MDagPath.getAllPathsTo(handle.object()):
+                    paths.add(dagPath.fullPathName())
+        return paths
+
+    # Callbacks
+
+    def nodeAdded(self, node, *args):
+        self.structureDirty = True
+        if node.hasFn(om.MFn.kTransform):
+            self.watchAttributes(node)
+
+    def nodeRemoved(self, node, *args):
+        self.structureDirty = True
+        callbackId = self.nodeCallbackIds.pop(om.MObjectHandle(node).hashCode(), None)
+        if callbackId is not None:
+            om.MMessage.removeCallback(callbackId)
+
+    def nameChanged(self, node, previousName, *args):
+        if node.hasFn(om.MFn.kDagNode):
+            self.structureDirty = True
+
+    def dagChanged(self, message, child, parent, *args):
+        self.structureDirty = True
+
+    def attributeChanged(self, message, plug, otherPlug, *args):
+        if message & om.MNodeMessage.kAttributeSet and plug.partialName() in TRANSFORM_ATTRS:
+            self.markDirty(plug.node())
+
+    def connectionChanged(self, srcPlug, dstPlug, made, *args):
+        node = dstPlug.node()
+        if node.hasFn(om.MFn.kDagNode):
+            self.markDirty(node)
+        else:
+            # Rewiring a history node changes the history of every shape downstream of it
+            self.markDownstream(node)
+
+    def markDownstream(self, node):
+        # Marks the first DAG nodes downstream of node, without walking on past them
+        it = om.MItDependencyGraph(node, om.MFn.kDagNode, om.MItDependencyGraph.kDownstream,
+                                   om.MItDependencyGraph.kBreadthFirst, om.MItDependencyGraph.kNodeLevel)
+        while not it.isDone():
+            self.markDirty(it.currentNode())
+            it.prune()
+            it.next()
+
+    def sceneChanged(self, *args):
+        self.sceneReset = True
+
+
+class IncrementalSceneCheck:
+    """
+    Keeps the results of the last full scene check and, on later runs, re-checks only the nodes
+    the SceneWatcher saw change, merging the new failures into the cached ones.
+    """
+
+    def __init__(self, sceneCheck):
+        self.sceneCheck = sceneCheck
+        self.watcher = SceneWatcher()
+        self.snapshot = None
+        self.failures = {}
+
+    def check(self):
+        # Returns {rule: sorted failing nodes} for every registered check
+        if self.snapshot is None or self.watcher.sceneReset or not self.watcher.isRunning():
+            self.fullCheck()
+        else:
+            self.updateCheck()
+        self.watcher.clear()
+        return {rule: sorted(failed) for rule, failed in self.failures.items()}
+
+    def fullCheck(self):
+        self.snapshot = sceneSnapshot.SceneSnapshot()
+        self.sceneCheck.snapshot = self.snapshot
+        results = self.sceneCheck.runChecks(self.snapshot)
+        self.failures = {rule: set(result.failed) for rule, result in results.items()}
+        self.watcher.start(self.snapshot)
+
+    def updateCheck(self):
+        dirty = self.watcher.dirtyPaths()
+        removed = set()
+        if self.watcher.structureDirty:
+            oldPaths = set(self.snapshot.types)
+            self.snapshot.refreshStructure()
+            newPaths = set(self.snapshot.types)
+            removed = oldPaths - newPaths
+            dirty |= newPaths - oldPaths
+        # Suffix and transform results depend on a node's children, so their parents need another look too
+        dirty |= {path.rpartition('|')[0] for path in dirty | removed}
+        dirty &= set(self.snapshot.types)
+        if not dirty and not removed:
+            return
+
+        self.snapshot.invalidate(dirty)
+        for check in sceneRules.CHECKS.values():
+            failed = self.failures.setdefault(check.name, set())
+            failed -= dirty | removed
+            failed.update(check.function(self.sceneCheck, self.snapshot, dirty))
+
+    def stop(self):
+        self.watcher.stop()
+        self.snapshot = None
+        self.failures = {}
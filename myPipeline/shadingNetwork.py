@@ -0,0 +1,300 @@
+"""
+Queues the nodes, attribute values and connections of a shading network and builds them in one go.
+
+In Maya the queue runs as one MEL script (one mel.eval, undoable), without maya.mel through
+cmds, and maScript writes it out as a .ma file.
+"""
+
+# place2dTexture -> file connections Maya makes for a new file texture
+PLACEMENT_CONNECTIONS = (
+    ('coverage', 'coverage'), ('rotateFrame', 'rotateFrame'), ('mirrorU', 'mirrorU'), ('mirrorV', 'mirrorV'),
+    ('stagger', 'stagger'), ('wrapU', 'wrapU'), ('wrapV', 'wrapV'), ('repeatUV', 'repeatUV'),
+    ('offset', 'offset'), ('rotateUV', 'rotateUV'), ('noiseUV', 'noiseUV'), ('vertexUvOne', 'vertexUvOne'),
+    ('vertexUvTwo', 'vertexUvTwo'), ('vertexUvThree', 'vertexUvThree'), ('vertexCameraOne', 'vertexCameraOne'),
+    ('outUV', 'uv'), ('outUvFilterSize', 'uvFilterSize')
+)
+SHARE_MODES = ('material', 'asset', None)
+MA_VERSION = '2022'
+# Where shadingNode lists each kind of node for Hypershade, which a .ma file has to spell out
+DEFAULT_LISTS = {
+    'asShader': ':defaultShaderList1.shaders',
+    'asTexture': ':defaultTextureList1.textures',
+    'asUtility': ':defaultRenderUtilityList1.utilities'
+}
+
+
+class NodeRef:
+    """
+    A queued node. name is the requested name until the network is built, then the real one.
+    """
+    __slots__ = ('index', 'nodeType', 'name', 'kind', 'colorManaged')
+
+    def __init__(self, index, nodeType, name, kind, colorManaged):
+        self.index = index
+        self.nodeType = nodeType
+        self.name = name
+        self.kind = kind
+        self.colorManaged = colorManaged
+
+    def __str__(self):
+        return self.name or self.nodeType
+
+    def __repr__(self):
+        return '<NodeRef %s %s>' % (self.nodeType, self)
+
+
+class NetworkBuilder:
+    """
+    Args:
+        sharePlacement (str) 'material' for one place2dTexture per material, 'asset' for one
+            per builder, None for one per file texture like Maya's own
+    """
+
+    def __init__(self, sharePlacement='material'):
+        if sharePlacement not in SHARE_MODES:
+            raise ValueError("sharePlacement must be one of %s" % (SHARE_MODES,))
+        self.sharePlacement = sharePlacement
+        self.nodes = []
+        # ('setAttr', node, attr, value, valueType), ('connect' or 'disconnect', source, sourceAttr,
+        # destination, destinationAttr), ('addAttr', node, attr, dataType) and ('delete', node), run in queue order
+        self.operations = []
+        self.placements = {}
+
+    def createNode(self, nodeType, name=None, kind='asUtility', colorManaged=False):
+        """
+        Queues a shadingNode.
+
+        Args:
+            kind (str) The shadingNode flag: asShader, asTexture or asUtility. None for a
+                plain createNode (shading groups and the like)
+        """
+        node = NodeRef(len(self.nodes), nodeType, name, kind, colorManaged)
+        self.nodes.append(node)
+        return node
+
+    def setAttr(self, node, attr, value, valueType=None):
+        # node is a NodeRef or the name of an existing node
+        self.operations.append(('setAttr', node, attr, value, valueType))
+
+    def addAttr(self, node, attr, dataType='string'):
+        # A dynamic attribute, e.g. to tag a node
+        self.operations.append(('addAttr', node, attr, dataType))
+
+    def connect(self, source, sourceAttr, destination, destinationAttr):
+        self.operations.append(('connect', source, sourceAttr, destination, destinationAttr))
+
+    def disconnect(self, source, sourceAttr, destination, destinationAttr):
+        self.operations.append(('disconnect', source, sourceAttr, destination, destinationAttr))
+
+    def delete(self, node):
+        # Only existing nodes, queued ones are simply not queued
+        self.operations.append(('delete', node))
+
+    def placement(self, group, name):
+        # The place2dTexture the file textures of group (a material) share, created on first use
+        if self.sharePlacement is None:
+            return self.createNode('place2dTexture', '%s_p2d' % name)
+        key = group if self.sharePlacement == 'material' else None
+        if key not in self.placements:
+            self.placements[key] = self.createNode('place2dTexture', '%s_p2d' % group)
+        return self.placements[key]
+
+    def textureNode(self, nodeType, pathAttr, path, name, suffix, group=None):
+        # A color managed <name>_<suffix> texture node reading path, wired to group's placement when given one
+        node = self.createNode(nodeType, '%s_%s' % (name, suffix), 'asTexture', colorManaged=True)
+        if group is not None:
+            texNode = self.placement(group, name)
+            for placementAttr, fileAttr in PLACEMENT_CONNECTIONS:
+                self.connect(texNode, placementAttr, node, fileAttr)
+        self.setAttr(node, pathAttr, path, 'string')
+        return node
+
+    def fileTexture(self, path, name, group):
+        # A file node wired to its group's placement, like Maya's own file textures
+        return self.textureNode('file', 'fileTextureName', path, name, 'tx', group)
+
+    # Building
+
+    def execute(self):
+        """
+        Builds the queued network, one mel.eval inside Maya and plain cmds calls otherwise.
+
+        Returns:
+            [NodeRefs] with their real names filled in
+        """
+        try:
+            from maya import mel
+        except ImportError:
+            mel = None
+        if mel is not None and self.nodes:
+            names = mel.eval(self.melScript()) or []
+            for node, name in zip(self.nodes, names):
+                node.name = name
+        else:
+            self.executeCmds()
+        nodes = self.nodes
+        self.nodes = []
+        self.operations = []
+        self.placements = {}
+        return nodes
+
+    def executeCmds(self):
+        from maya import cmds
+
+        for node in self.nodes:
+            if node.kind is None:
+                node.name = cmds.createNode(node.nodeType, **({'name': node.name} if node.name else {}))
+                continue
+            flags = {node.kind: True}
+            if node.colorManaged:
+                flags['isColorManaged'] = True
+            if node.name:
+                flags['name'] = node.name
+            node.name = cmds.shadingNode(node.nodeType, **flags)
+        for operation in self.operations:
+            if operation[0] == 'connect':
+                _, source, sourceAttr, destination, destinationAttr = operation
+                cmds.connectAttr('%s.%s' % (source, sourceAttr), '%s.%s' % (destination, destinationAttr), force=True)
+            elif operation[0] == 'disconnect':
+                _, source, sourceAttr, destination, destinationAttr = operation
+                cmds.disconnectAttr('%s.%s' % (source, sourceAttr), '%s.%s' % (destination, destinationAttr))
+            elif operation[0] == 'delete':
+                cmds.delete(str(operation[1]))
+            elif operation[0] == 'addAttr':
+                _, node, attr, dataType = operation
+                cmds.addAttr(str(node), longName=attr, dataType=dataType)
+            else:
+                _, node, attr, value, valueType = operation
+                if valueType:
+                    cmds.setAttr('%s.%s' % (node, attr), value, type=valueType)
+                else:
+                    cmds.setAttr('%s.%s' % (node, attr), value)
+
+    def melScript(self):
+        # The queue as one MEL procedure returning the created node names in queue order
+        lines = ['global proc string[] pipelineBuildNetwork() {', '    string $n[];']
+        for node in self.nodes:
+            flags = '-%s' % node.kind if node.kind else ''
+            if node.colorManaged:
+                flags += ' -isColorManaged'
+            if node.name:
+                flags += ' -name %s' % melString(node.name)
+            command = 'shadingNode' if node.kind else 'createNode'
+            lines.append('    $n[%d] = `%s %s %s`;' % (node.index, command, flags.strip(), node.nodeType))
+        for operation in self.operations:
+            if operation[0] == 'connect':
+                _, source, sourceAttr, destination, destinationAttr = operation
+                lines.append('    connectAttr -force %s %s;' % (melPlug(source, sourceAttr),
+                                                                 melPlug(destination, destinationAttr)))
+            elif operation[0] == 'disconnect':
+                _, source, sourceAttr, destination, destinationAttr = operation
+                lines.append('    disconnectAttr %s %s;' % (melPlug(source, sourceAttr),
+                                                            melPlug(destination, destinationAttr)))
+            elif operation[0] == 'delete':
+                lines.append('    delete %s;' % melString(operation[1]))
+            elif operation[0] == 'addAttr':
+                _, node, attr, dataType = operation
+                lines.append('    addAttr -longName %s -dataType %s %s;' % (melString(attr), melString(dataType),
+                                                                        melNode(node)))
+            else:
+                _, node, attr, value, valueType = operation
+                if valueType:
+                    lines.append('    setAttr -type %s %s %s;' % (melString(valueType), melPlug(node, attr),
+                                                                   melString(value)))
+                else:
+                    lines.append('    setAttr %s %s;' % (melPlug(node, attr), melValue(value)))
+        lines += ['    return $n;', '}', 'pipelineBuildNetwork();']
+        return '\n'.join(lines)
+
+    def uniqueNames(self):
+        # The queued nodes' names made unique, numbered type names for the unnamed ones, as Maya would
+        names = []
+        taken = set()
+        for node in self.nodes:
+            name, count = node.name, 0
+            while not name or name in taken:
+                count += 1
+                name = '%s%d' % (node.name or node.nodeType, count)
+            taken.add(name)
+            names.append(name)
+        return names
+
+    def maScript(self, requires=()):
+        """
+        The queue as a Maya ASCII file that builds the network when imported or referenced,
+        written without Maya. Only new nodes can be written, not edits of existing ones.
+        Connections into the scene's shared nodes (':renderPartition.sets') take the next free index.
+
+        Args:
+            requires (iterable) (plugin, version) pairs the nodes need, besides Maya itself
+
+        Returns:
+            The file contents
+        """
+        names = self.uniqueNames()
+        # Lines written under each node's createNode
+        nodeLines = {}
+        connections = []
+        for operation in self.operations:
+            if operation[0] == 'setAttr' and isinstance(operation[1], NodeRef):
+                _, node, attr, value, valueType = operation
+                if valueType:
+                    line = '\tsetAttr ".%s" -type %s %s;' % (attr, melString(valueType), melString(value))
+                else:
+                    line = '\tsetAttr ".%s" %s;' % (attr, melValue(value))
+                nodeLines.setdefault(node.index, []).append(line)
+            elif operation[0] == 'addAttr' and isinstance(operation[1], NodeRef):
+                _, node, attr, dataType = operation
+                nodeLines.setdefault(node.index, []).append('\taddAttr -ci true -sn %s -ln %s -dt %s;' % (
+                    melString(attr), melString(attr), melString(dataType)))
+            elif operation[0] == 'connect':
+                _, source, sourceAttr, destination, destinationAttr = operation
+                nextAvailable = '' if isinstance(destination, NodeRef) or not destination.startswith(':') else ' -na'
+                connections.append('connectAttr %s %s%s;' % (maPlug(names, source, sourceAttr),
+                                                             maPlug(names, destination, destinationAttr),
+                                                             nextAvailable))
+            else:
+                raise ValueError("can't write %s of an existing node to a .ma file" % operation[0])
+
+        lines = ['//Maya ASCII %s scene' % MA_VERSION, 'requires maya "%s";' % MA_VERSION]
+        lines += ['requires %s %s;' % (melString(plugin), melString(version)) for plugin, version in requires]
+        for node in self.nodes:
+            lines.append('createNode %s -n %s;' % (node.nodeType, melString(names[node.index])))
+            lines += nodeLines.get(node.index, [])
+        lines += connections
+        for node in self.nodes:
+            if node.kind in DEFAULT_LISTS:
+                lines.append('connectAttr %s %s -na;' % (maPlug(names, node, 'message'),
+                                                        melString(DEFAULT_LISTS[node.kind])))
+        return '\n'.join(lines) + '\n'
+
+
+def melString(value):
+    return '"%s"' % str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def melValue(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def melNode(node):
+    # Queued nodes are looked up in $n, existing nodes are named outright
+    if isinstance(node, NodeRef):
+        return '$n[%d]' % node.index
+    return melString(node)
+
+
+def melPlug(node, attr):
+    # Queued nodes are looked up in $n, existing nodes are named outright
+    if isinstance(node, NodeRef):
+        return '($n[%d] + ".%s")' % (node.index, attr)
+    return melString('%s.%s' % (node, attr))
+
+
+def maPlug(names, node, attr):
+    # Queued nodes by the names maScript gave them
+    if isinstance(node, NodeRef):
+        return melString('%s.%s' % (names[node.index], attr))
+    return melString('%s.%s' % (node, attr))
@@ -1,141 +1,645 @@
 from maya import cmds
+import concurrent.futures
+import functools
+import hashlib
 import os
 from PySide2 import QtWidgets, QtCore, QtGui
+from myPipeline import channelMapping
+from myPipeline import channelPacking
+from myPipeline import imageHeaders
+from myPipeline import shadingNetwork
+from myPipeline import textureIndex
+from myPipeline import textureRegistry
+from myPipeline import txCache
+
+FINGERPRINT_CACHE = 'textureFingerprints.json'
+TEXTURE_INDEX = 'textureIndex.json'
+# Where converted .tx files go, under the project's sourceimages
+TX_CACHE = 'txCache'
+# Images handed from the folder scan to the combo boxes at a time
+SCAN_BATCH = 200
+# Preview thumbnails, cached as small pngs in the user app dir
+THUMBNAIL_CACHE = 'textureThumbnails'
+THUMBNAIL_SIZE = 64
+THUMBNAIL_THREADS = 4
+CHANNEL_SUFFIXES = textureIndex.CHANNEL_SUFFIXES
+scanExportTree = textureIndex.scanExportTree
+CHANNELS = channelMapping.CHANNELS
+PACKED = channelPacking.PACKED
+PACKED_CHANNELS = channelPacking.PACKED_CHANNELS
+# String attribute materials are tagged with "<folder>|<texture set>" on, set names repeat across export folders
+SOURCE_ATTR = 'pipelineSource'
 
 
 class SubImporter:
+    """
+    Builds materials from Substance texture exports.
 
-    def createMayaMaterial(self, path, attrs):
-        createdFileNodes = {
-            'baseColor': '',
-            'metalness': '',
-            'roughness': '',
-            'emissive': '',
-            'bump': '',
-            'opacity': '',
-        }
-        folderName = path.split('/')[-1]
-        mat = cmds.shadingNode('blinn', asShader=True, name='%s_SHD' % folderName)
-        # Creates all needed file nodes for given images
-        for a in attrs:
-            if not attrs[a]:
+    The create* methods queue their nodes on a shadingNetwork.NetworkBuilder, wired by the
+    cached connection plan of a channelMapping target ('maya', 'arnold' or one read from JSON).
+    Given no builder they build the material straight away, given one they leave building to
+    the caller so many materials can go in one batch.
+
+    With dedupeTextures, images identical to one that already has a texture node (in the scene
+    or earlier in the same import) reuse that node instead of getting a new one. With convertTx,
+    texture nodes read tiled, mipmapped .tx copies of the images (see txCache), converted in
+    parallel before the nodes are made. With packChannels, grayscale metalness, roughness and
+    opacity maps are packed into one image read by a single texture node.
+    """
+
+    def __init__(self, dedupeTextures=True, convertTx=False, packChannels=False):
+        self.fingerprints = textureRegistry.FingerprintCache(
+            os.path.join(cmds.internalVar(userAppDir=True), FINGERPRINT_CACHE))
+        self.registry = textureRegistry.TextureRegistry(self.fingerprints) if dedupeTextures else None
+        self.convertTx = convertTx
+        self.packChannels = packChannels
+        # {image path: path the texture node reads}, filled by convertTextures
+        self.renderPaths = {}
+        # {(source tag, shader type): material} while an incremental importExportTree runs, found once for all its sets
+        self.taggedMaterials = None
+
+    def prepareRegistry(self):
+        # Registers the texture nodes already in the scene, one getAttr per texture node
+        if self.registry is None:
+            return
+        existing = []
+        for nodeType, attr in channelMapping.textureAttrs().items():
+            for node in cmds.ls(type=nodeType) or []:
+                path = cmds.getAttr('%s.%s' % (node, attr))
+                # A cached .tx counts as the image it was made from
+                existing.append((nodeType, path, node, txCache.sourceDigest(path)))
+        self.registry.reset(existing)
+
+    def convertTextures(self, paths):
+        # Converts every image to .tx up front, so the conversions run in parallel
+        self.renderPaths = {}
+        if not self.convertTx:
+            return
+        cache = txCache.TxCache(os.path.join(cmds.workspace(expandName='sourceimages'), TX_CACHE), self.fingerprints)
+        if cache.maketx is None:
+            cmds.warning("maketx not found, set %s to convert textures to .tx" % txCache.MAKETX_ENV)
+            return
+        self.renderPaths = cache.convert(paths)
+        for source, error in cache.failures.items():
+            cmds.warning("Couldn't convert %s to .tx: %s" % (source, error))
+
+    def renderPath(self, imagePath):
+        return self.renderPaths.get(imagePath, imagePath)
+
+    def packAttrs(self, path, attrs, name):
+        # attrs with the grayscale maps swapped for one packed image, unchanged if they don't pack
+        if not self.packChannels:
+            return attrs
+        return channelPacking.packedAttrs(path, attrs, name)
+
+    def finishRegistry(self):
+        self.fingerprints.save()
+        if self.registry is not None:
+            if self.registry.reused:
+                print("reused %d existing texture nodes for identical images" % self.registry.reused)
+
+    def textureNode(self, path, nodeType, create):
+        # The registered node for an identical image, or a new one from create()
+        if self.registry is None:
+            return create()
+        node = self.registry.find(path, nodeType)
+        if node is None:
+            node = create()
+            self.registry.add(path, nodeType, node)
+        return node
+
+    def importExportTree(self, root, arnold=True, heightIsNormal=False, sharePlacement='asset', incremental=False,
+                         target=None):
+        """
+        Builds a material for every texture set under root in one undo chunk.
+
+        Args:
+            sharePlacement (str) 'asset' for one place2dTexture for the whole import,
+                'material' for one per material
+            incremental (bool) Update the materials of an earlier import instead of adding new ones
+            target (str) The channelMapping target to build, 'arnold' or 'maya' by arnold when None
+
+        Returns:
+            [created materials]
+        """
+        textureSets = textureIndex.scanExportTree(root, heightIsNormal)
+        if self.packChannels:
+            # numpy and zlib let go of the GIL, so the sets pack in parallel
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                packed = executor.map(lambda item: self.packAttrs(item[0][0], item[1], item[0][1]), textureSets.items())
+                textureSets = dict(zip(textureSets, packed))
+        target = target or ('arnold' if arnold else 'maya')
+        create = functools.partial(self.updateMaterial if incremental else self.createMaterial, target=target)
+        network = shadingNetwork.NetworkBuilder(sharePlacement)
+        self.prepareRegistry()
+        self.convertTextures([os.path.join(folder, attrs[channel]) for (folder, setName), attrs in textureSets.items()
+                              for channel in CHANNELS + (PACKED,) if attrs.get(channel)])
+        self.taggedMaterials = self.findTaggedMaterials() if incremental else None
+        try:
+            materials = [create(folder, attrs, name=setName, network=network)
+                         for (folder, setName), attrs in sorted(textureSets.items())]
+        finally:
+            self.taggedMaterials = None
+        self.finishRegistry()
+        # One undo step for the whole import, and no viewport redraw per node
+        cmds.undoInfo(openChunk=True, chunkName='substanceBatchImport')
+        cmds.refresh(suspend=True)
+        try:
+            network.execute()
+        finally:
+            cmds.refresh(suspend=False)
+            cmds.undoInfo(closeChunk=True)
+        print("imported %d materials from %s" % (len(materials), root))
+        return [str(mat) for mat in materials]
+
+    def updateMaterial(self, path, attrs, arnold=True, name=None, network=None, target=None):
+        """
+        Brings the network an earlier import built from the same folder and texture set up to
+        date with attrs. Only channels whose image changed are touched: their texture node is
+        repathed when nothing else reads it (or swapped for one that already shows the image),
+        and the nodes of channels that are gone are deleted. Channels the user rewired to
+        anything else are left alone. Builds a new material when there is none to update.
+
+        Returns:
+            The material
+        """
+        folderName = name or path.split('/')[-1]
+        target = target or ('arnold' if arnold else 'maya')
+        build = network is None
+        network = network or shadingNetwork.NetworkBuilder()
+        attrs = self.packAttrs(path, attrs, folderName)
+        if build:
+            self.prepareRegistry()
+            self.convertTextures([os.path.join(path, attrs[channel]) for channel in CHANNELS + (PACKED,)
+                                  if attrs.get(channel)])
+        mat = self.findMaterial(path, folderName, target, network)
+        if mat is None:
+            mat = self.createMaterial(path, attrs, target, name=name, network=network)
+            message = "inserted!"
+        else:
+            update = MaterialUpdate(self, network, target, mat, path, attrs, folderName)
+            update.run()
+            message = "updated %d channels of %s" % (len(update.changed), mat)
+        if build:
+            network.execute()
+            self.finishRegistry()
+            print(message)
+        return mat
+
+    def sourceTag(self, path, name):
+        return '%s|%s' % (os.path.normpath(path).replace('\\', '/'), name)
+
+    def findTaggedMaterials(self):
+        # {(source tag, shader type): material} of every tagged material in the scene, one getAttr each
+        found = cmds.ls('*.%s' % SOURCE_ATTR, objectsOnly=True, recursive=True, showType=True) or []
+        return {(cmds.getAttr('%s.%s' % (mat, SOURCE_ATTR)), nodeType): mat
+                for mat, nodeType in zip(found[::2], found[1::2])}
+
+    def findMaterial(self, path, name, target, network):
+        """
+        The material an earlier import built from texture set name in folder path, None if there is none.
+
+        Materials are found by their source tag. An untagged <name>_SHD (or <name>_SHD1, ...) from
+        before materials were tagged only counts when it reads an image from path, and gets tagged
+        for next time.
+        """
+        tagged = self.taggedMaterials if self.taggedMaterials is not None else self.findTaggedMaterials()
+        spec = channelMapping.target(target)
+        mat = tagged.get((self.sourceTag(path, name), spec['shader']))
+        if mat is not None:
+            return mat
+        taken = set(tagged.values())
+        for mat in sorted(cmds.ls('%s_SHD*' % name, type=spec['shader']) or []):
+            suffix = mat[len(name) + 4:]
+            if (mat not in taken and (not suffix or suffix.isdigit())
+                    and self.readsFolder(mat, path, spec)):
+                self.tagMaterial(network, mat, path, name)
+                return mat
+        return None
+
+    def readsFolder(self, mat, path, spec):
+        # True when a texture node wired straight into mat shows an image from folder path
+        images = {render: image for image, render in self.renderPaths.items()}
+        texture = spec['texture']
+        for node in set(cmds.listConnections(mat, source=True, destination=False, type=texture['type']) or []):
+            imagePath = cmds.getAttr('%s.%s' % (node, texture['pathAttr'])) or ''
+            imagePath = images.get(imagePath, imagePath)
+            if os.path.normpath(os.path.dirname(imagePath)) == os.path.normpath(path):
+                return True
+        return False
+
+    def tagMaterial(self, network, mat, path, name):
+        network.addAttr(mat, SOURCE_ATTR)
+        network.setAttr(mat, SOURCE_ATTR, self.sourceTag(path, name), 'string')
+
+    def createMaterial(self, path, attrs, target='maya', name=None, network=None):
+        """
+        Args:
+            path (str) The images' folder
+            attrs (dict) {channel: image file name} and isHeightNormal, as createConnections builds them
+            target (str) The channelMapping target to build
+
+        Returns:
+            The material
+        """
+        build = network is None
+        network = network or shadingNetwork.NetworkBuilder()
+        folderName = name or path.split('/')[-1]
+        attrs = self.packAttrs(path, attrs, folderName)
+        if build:
+            self.prepareRegistry()
+            self.convertTextures([os.path.join(path, attrs[channel]) for channel in CHANNELS + (PACKED,)
+                                  if attrs.get(channel)])
+        spec = channelMapping.target(target)
+        # Texture nodes for the given images, then the target's plan wires them up
+        used = channelMapping.usedChannels(spec, bool(attrs.get('isHeightNormal')))
+        textures = {channel: self.createTexture(spec, path, attrs[channel], network, folderName)
+                    for channel in CHANNELS + (PACKED,) if attrs.get(channel) and channel in used}
+        mat = channelMapping.queueMaterial(network, target, textures, attrs, folderName)['material']
+        self.tagMaterial(network, mat, path, folderName)
+
+        if build:
+            network.execute()
+            self.finishRegistry()
+            print("inserted!")
+        return mat
+
+    def createMayaMaterial(self, path, attrs, name=None, network=None):
+        return self.createMaterial(path, attrs, 'maya', name, network)
+
+    def createArnoldMaterial(self, path, attrs, name=None, network=None):
+        return self.createMaterial(path, attrs, 'arnold', name, network)
+
+    def texturePath(self, path, entry, spec):
+        # The path a texture node of target spec reads entry from
+        imagePath = self.renderPath(os.path.join(path, entry))
+        return imagePath.replace(textureIndex.UDIM_TOKEN, spec['texture']['udimToken'])
+
+    def createTexture(self, spec, path, entry, network, material):
+        # Queues a texture node of target spec's type for entry, wired to the material's shared placement
+        imagePath = os.path.join(path, entry)
+        return self.textureNode(imagePath, spec['texture']['type'], lambda: channelMapping.queueTexture(
+            network, spec, self.renderPath(imagePath), entry.split('.')[0], material))
+
+    def createFileTexture(self, path, entry, network, material):
+        return self.createTexture(channelMapping.target('maya'), path, entry, network, material)
+
+    def createAiImage(self, path, entry, network):
+        return self.createTexture(channelMapping.target('arnold'), path, entry, network, None)
+
+
+class MaterialUpdate:
+    """
+    Diffs one existing material network against the images it should show and queues the
+    changes on a NetworkBuilder. Built and run by SubImporter.updateMaterial.
+    """
+
+    def __init__(self, importer, network, target, mat, path, attrs, folderName):
+        self.importer = importer
+        self.network = network
+        self.spec = channelMapping.target(target)
+        self.mat = mat
+        self.path = path
+        self.attrs = attrs
+        self.folderName = folderName
+        self.textureType = self.spec['texture']['type']
+        # {node: outgoing connections left}, counted on first use
+        self.outputs = {}
+        # Texture and helper nodes that lost connections, deleted at the end when nothing reads them
+        self.orphans = []
+        self.changed = []
+
+    def run(self):
+        connections = cmds.listConnections(self.mat, source=True, destination=False, connections=True,
+                                           plugs=True) or []
+        # {material attribute: source plug}
+        incoming = {plug.partition('.')[2]: source for plug, source in zip(connections[::2], connections[1::2])}
+        if self.spec['texture']['placement'] and self.network.sharePlacement:
+            self.adoptPlacement(incoming.values())
+        for channel in CHANNELS:
+            if channel == 'bump':
+                self.updateBump(incoming)
                 continue
-            else:
-                if type(attrs[a]) == str:
-                    createdFileNodes[a] = self.createFileTexture(path, attrs[a])
-                else:
-                    pass
-            """**Use this section to add specific settings or reroute connections**"""
-        # baseColor
-        if createdFileNodes['baseColor']:
-            cmds.connectAttr('%s.outColor' % createdFileNodes['baseColor'], '%s.color' % mat)
-
-        # metalness
-        if createdFileNodes['metalness']:
-            cmds.connectAttr('%s.outColor.outColorR' % createdFileNodes['metalness'], '%s.reflectivity' % mat)
-        # roughness
-        if createdFileNodes['roughness']:
-            cmds.connectAttr('%s.outColor.outColorR' % createdFileNodes['roughness'], '%s.specularRollOff' % mat)
-        # emissive
-        if createdFileNodes['emissive']:
-            cmds.connectAttr('%s.outColor' % createdFileNodes['emissive'], '%s.incandescence' % mat)
-        # bump
-        if createdFileNodes['bump']:
-            bumpNode = cmds.shadingNode('bump2d', asUtility=True, name='%s_BMP' % attrs['bump'].split('.')[0])
-            cmds.setAttr('%s.alphaIsLuminance' % createdFileNodes['bump'], True)
-            if attrs['isHeightNormal']:
-                cmds.setAttr('%s.bumpInterp' % bumpNode, 1)
-            cmds.connectAttr('%s.outAlpha' % createdFileNodes['bump'], '%s.bumpValue' % bumpNode)
-            cmds.connectAttr('%s.outNormal' % bumpNode, '%s.normalCamera' % mat)
-        # opacity
-        if createdFileNodes['opacity']:
-            cmds.connectAttr('%s.outColor' % createdFileNodes['opacity'], '%s.transparency' % mat)
-
-        print("inserted!")
-
-    def createFileTexture(self, path, entry):
-        #  Function for creating the File [texture] node as maya does
-        filename = entry.split('.')[0]
-        fileNode = cmds.shadingNode('file', asTexture=True, isColorManaged=True, name='%s_tx' % filename)
-        texNode = cmds.shadingNode('place2dTexture', asUtility=True, name='%s_p2d' % filename)
-        cmds.connectAttr('%s.coverage' % texNode, '%s.coverage' % fileNode, force=True)
-        cmds.connectAttr('%s.rotateFrame' % texNode, '%s.rotateFrame' % fileNode, force=True)
-        cmds.connectAttr('%s.mirrorU' % texNode, '%s.mirrorU' % fileNode, force=True)
-        cmds.connectAttr('%s.mirrorV' % texNode, '%s.mirrorV' % fileNode, force=True)
-        cmds.connectAttr('%s.stagger' % texNode, '%s.stagger' % fileNode, force=True)
-        cmds.connectAttr('%s.wrapU' % texNode, '%s.wrapU' % fileNode, force=True)
-        cmds.connectAttr('%s.wrapV' % texNode, '%s.wrapV' % fileNode, force=True)
-        cmds.connectAttr('%s.repeatUV' % texNode, '%s.repeatUV' % fileNode, force=True)
-        cmds.connectAttr('%s.offset' % texNode, '%s.offset' % fileNode, force=True)
-        cmds.connectAttr('%s.rotateUV' % texNode, '%s.rotateUV' % fileNode, force=True)
-        cmds.connectAttr('%s.noiseUV' % texNode, '%s.noiseUV' % fileNode, force=True)
-        cmds.connectAttr('%s.vertexUvOne' % texNode, '%s.vertexUvOne' % fileNode, force=True)
-        cmds.connectAttr('%s.vertexUvTwo' % texNode, '%s.vertexUvTwo' % fileNode, force=True)
-        cmds.connectAttr('%s.vertexUvThree' % texNode, '%s.vertexUvThree' % fileNode, force=True)
-        cmds.connectAttr('%s.vertexCameraOne' % texNode, '%s.vertexCameraOne' % fileNode, force=True)
-        cmds.connectAttr('%s.outUV' % texNode, '%s.uv' % fileNode, force=True)
-        cmds.connectAttr('%s.outUvFilterSize' % texNode, '%s.uvFilterSize' % fileNode, force=True)
-        cmds.setAttr('%s.fileTextureName' % fileNode,  os.path.join(path, entry), type="string")
-        return fileNode
-
-    def createAiImage(self, path, entry):
-        filename = entry.split('.')[0]
-        fileNode = cmds.shadingNode('aiImage', asTexture=True, isColorManaged=True, name='%s_aiImage' % filename)
-        cmds.setAttr('%s.filename' % fileNode, os.path.join(path, entry), type="string")
-        return fileNode
-
-    def createArnoldMaterial(self, path, attrs):
-        createdFileNodes = {
-            'baseColor': '',
-            'metalness': '',
-            'roughness': '',
-            'emissive': '',
-            'bump': '',
-            'opacity': '',
-        }
-        folderName = path.split('/')[-1]
-        mat = cmds.shadingNode('aiStandardSurface', asShader=True, name='%s_SHD' % folderName)
-        # Creates all needed file nodes for given images
-        for a in attrs:
-            if not attrs[a]:
+            entry, wires = self.channelWires(channel)
+            current = [(self.mat, attr, incoming[attr]) for attr in channelMapping.channelAttrs(self.spec, channel)
+                       if attr in incoming]
+            if self.rewire(channel, entry, [(plug, self.mat, attr) for plug, attr in wires], current):
+                self.changed.append(channel)
+        self.deleteOrphans()
+
+    def adoptPlacement(self, sources):
+        # New file textures share the placement the material's existing ones use
+        for source in sources:
+            node = source.partition('.')[0]
+            if cmds.nodeType(node) != self.textureType:
                 continue
-            else:
-                if type(attrs[a]) == str:
-                    createdFileNodes[a] = self.createAiImage(path, attrs[a])
-                else:
-                    pass
-
-
-        """**Use this section to add specific settings or reroute connections**"""
-        # baseColor
-        if createdFileNodes['baseColor']:
-            cmds.connectAttr('%s.outColor' % createdFileNodes['baseColor'], '%s.baseColor' % mat)
-
-        # metalness
-        if createdFileNodes['metalness']:
-            cmds.connectAttr('%s.outColor.outColorR' % createdFileNodes['metalness'], '%s.metalness' % mat)
-        # roughness
-        if createdFileNodes['roughness']:
-            cmds.connectAttr('%s.outColor.outColorR' % createdFileNodes['roughness'], '%s.diffuseRoughness' % mat)
-        # emissive
-        if createdFileNodes['emissive']:
-            cmds.connectAttr('%s.outColor' % createdFileNodes['emissive'], '%s.emissionColor' % mat)
-            cmds.connectAttr('%s.outColor.outColorR' % createdFileNodes['emissive'], '%s.emission' % mat)
-        # bump
-        if attrs['isHeightNormal']:
-            normalNode = cmds.shadingNode('aiNormalMap', asUtility=True, name='%s_NRM' % attrs['bump'].split('.')[0])
-            cmds.connectAttr('%s.outColor' % createdFileNodes['bump'], '%s.input' % normalNode)
-            cmds.connectAttr('%s.outValue' % normalNode, '%s.normalCamera' % mat)
+            placements = cmds.listConnections(node, source=True, destination=False, type='place2dTexture')
+            if placements:
+                key = self.folderName if self.network.sharePlacement == 'material' else None
+                self.network.placements.setdefault(key, placements[0])
+                return
+
+    def channelWires(self, channel):
+        # (image entry, [(texture plug, material attribute)]) the channel should have, (None, []) if unused
+        if channel in self.attrs.get(PACKED_CHANNELS, ()):
+            wires = [(channelMapping.packedPlug(self.spec, channel), attr)
+                     for attr in self.spec['packed'].get(channel, ())]
+            return (self.attrs[PACKED], wires) if wires else (None, [])
+        if self.attrs.get(channel) and self.spec['channels'].get(channel):
+            return self.attrs[channel], list(self.spec['channels'][channel])
+        return None, []
+
+    def outputCount(self, node):
+        # Connections out of node that read its image, message connections (texture lists) don't
+        if node not in self.outputs:
+            connections = cmds.listConnections(node, source=False, destination=True, connections=True,
+                                               plugs=True) or []
+            self.outputs[node] = sum(1 for plug in connections[::2] if plug.partition('.')[2] != 'message')
+        return self.outputs[node]
+
+    def rewire(self, channel, entry, wires, current):
+        """
+        Args:
+            wires ([(texture plug, node, attr)]) The connections the channel should have
+            current ([(node, attr, source plug)]) The connections it has
+
+        Returns:
+            True when anything changed
+        """
+        if not current and not entry:
+            return False
+        sources = {source.partition('.')[0] for node, attr, source in current}
+        currentNode = sources.pop() if len(sources) == 1 else None
+        if current and (currentNode is None or cmds.nodeType(currentNode) != self.textureType):
+            # Rewired by hand to something that isn't one of our texture nodes
+            return False
+        texture = self.spec['texture']
+        texturePath = self.importer.texturePath(self.path, entry, self.spec) if entry else None
+        imagePath = os.path.join(self.path, entry) if entry else None
+        registry = self.importer.registry
+        textureNode = None
+        if currentNode and texturePath:
+            pathAttr = texture['pathAttr']
+            samePath = cmds.getAttr('%s.%s' % (currentNode, pathAttr)) == texturePath
+            if not samePath and registry is not None:
+                # A deduped channel reads the node made for an identical image of another set
+                textureNode = registry.find(imagePath, self.textureType)
+                samePath = textureNode is not None and textureNode == currentNode
+            sameWires = ({(node, attr, source.rpartition('.')[2]) for node, attr, source in current} ==
+                         {(node, attr, plug.rpartition('.')[2]) for plug, node, attr in wires})
+            if samePath and sameWires:
+                return False
+
+        for node, attr, source in current:
+            sourceNode, _, sourceAttr = source.partition('.')
+            self.network.disconnect(sourceNode, sourceAttr, node, attr)
+        if currentNode:
+            self.outputs[currentNode] = self.outputCount(currentNode) - len(current)
+            self.orphans.append(currentNode)
+        if not entry:
+            return True
+
+        if textureNode is None and registry is not None:
+            textureNode = registry.find(imagePath, self.textureType)
+        if textureNode is None and currentNode and not self.outputCount(currentNode):
+            # Nothing else reads the old image, so the node just gets the new one
+            textureNode = currentNode
+            self.network.setAttr(textureNode, texture['pathAttr'], texturePath, 'string')
+            tilingAttrs = texture['udimAttrs'] if textureIndex.UDIM_TOKEN in entry else texture['singleAttrs']
+            for attr, value in tilingAttrs.items():
+                self.network.setAttr(textureNode, attr, value, channelMapping.valueType(value))
+            if registry is not None:
+                registry.discard(textureNode)
+                registry.add(imagePath, self.textureType, textureNode)
+        elif textureNode is None:
+            textureNode = self.importer.createTexture(self.spec, self.path, entry, self.network, self.folderName)
+        if channel in self.attrs.get(PACKED_CHANNELS, ()):
+            textureAttrs = self.spec['packedAttrs']
+        elif channel == 'bump':
+            isNormal = bool(self.attrs.get('isHeightNormal'))
+            textureAttrs = channelMapping.bumpHelper(self.spec, isNormal)['textureAttrs']
         else:
-            if createdFileNodes['bump']:
-                bumpNode = cmds.shadingNode('aiBump2d', asUtility=True)
-                cmds.connectAttr('%s.outAlpha' % createdFileNodes['bump'], '%s.bumpMap' % bumpNode)
-                cmds.connectAttr('%s.outValue' % bumpNode, '%s.normalCamera' % mat)
-        # opacity
-        if createdFileNodes['opacity']:
-            cmds.connectAttr('%s.outColor.outColorR' % createdFileNodes['opacity'], '%s.transmission' % mat)
+            textureAttrs = {}
+        for attr, value in textureAttrs.items():
+            self.network.setAttr(textureNode, attr, value, channelMapping.valueType(value))
+        for plug, node, attr in wires:
+            self.network.connect(textureNode, plug, node, attr)
+        if textureNode in self.outputs:
+            self.outputs[textureNode] += len(wires)
+        return True
+
+    def updateBump(self, incoming):
+        # The bump channel goes texture -> helper -> material
+        helpers = self.spec['bump'].values()
+        materialAttr = next((helper['attr'] for helper in helpers if helper['attr'] in incoming), None)
+        source = incoming.get(materialAttr)
+        helper = source.partition('.')[0] if source else None
+        if helper and cmds.nodeType(helper) not in {spec['type'] for spec in helpers}:
+            return
+        entry = self.attrs.get('bump')
+        spec = channelMapping.bumpHelper(self.spec, bool(self.attrs.get('isHeightNormal'))) if entry else None
+        if spec and helper and cmds.nodeType(helper) == spec['type']:
+            current = [(helper, spec['input'], plug) for plug in
+                       cmds.listConnections('%s.%s' % (helper, spec['input']), source=True, destination=False,
+                                            plugs=True) or []]
+            changed = self.rewire('bump', entry, [(spec['plug'], helper, spec['input'])], current)
+            for attr, value in spec['attrs'].items():
+                if cmds.getAttr('%s.%s' % (helper, attr)) != value:
+                    self.network.setAttr(helper, attr, value, channelMapping.valueType(value))
+                    changed = True
+            if changed:
+                self.changed.append('bump')
+            return
+
+        if not helper and not spec:
+            return
+        self.changed.append('bump')
+        if helper:
+            # Swapped between bump and normal map, or gone: the old helper goes with its connections
+            self.network.disconnect(helper, source.partition('.')[2], self.mat, materialAttr)
+            inputs = cmds.listConnections(helper, source=True, destination=False, connections=True, plugs=True) or []
+            for plug, inputSource in zip(inputs[::2], inputs[1::2]):
+                sourceNode, _, sourceAttr = inputSource.partition('.')
+                self.network.disconnect(sourceNode, sourceAttr, helper, plug.partition('.')[2])
+                if cmds.nodeType(sourceNode) == self.textureType:
+                    self.outputs[sourceNode] = self.outputCount(sourceNode) - 1
+                    self.orphans.append(sourceNode)
+            self.network.delete(helper)
+        if spec:
+            helperName = '%s_%s' % (entry.split('.')[0], spec['suffix']) if spec['suffix'] else None
+            newHelper = self.network.createNode(spec['type'], helperName)
+            for attr, value in spec['attrs'].items():
+                self.network.setAttr(newHelper, attr, value, channelMapping.valueType(value))
+            self.rewire('bump', entry, [(spec['plug'], newHelper, spec['input'])], [])
+            self.network.connect(newHelper, spec['output'], self.mat, spec['attr'])
+
+    def deleteOrphans(self):
+        deleted = set()
+        adopted = set(self.network.placements.values())
+        for node in self.orphans:
+            if node in deleted or self.outputs.get(node):
+                continue
+            deleted.add(node)
+            if self.importer.registry is not None:
+                self.importer.registry.discard(node)
+            # A placement only this texture read goes too
+            for placement in set(cmds.listConnections(node, source=True, destination=False,
+                                                      type='place2dTexture') or []):
+                connections = cmds.listConnections(placement, source=False, destination=True, connections=True,
+                                                   plugs=True) or []
+                readers = {plug.partition('.')[0] for own, plug in zip(connections[::2], connections[1::2])
+                           if own.partition('.')[2] != 'message'}
+                if placement not in deleted and readers <= deleted and placement not in adopted:
+                    deleted.add(placement)
+                    self.network.delete(placement)
+            self.network.delete(node)
+
+
+class ImageListModel(QtCore.QAbstractListModel):
+    """
+    The images of the loaded folder, shared by all the channel combo boxes.
+
+    Row 0 is always the empty "no image" choice. Rows are added in batches as the folder scan
+    finds them; UserRole holds the row's textureIndex.IndexedImage.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.images = [None]
+        self.byName = {}
+        # {name: imageHeaders.ImageInfo} as the headers get probed
+        self.infos = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.images)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        image = self.images[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return image.name if image else ''
+        if role == QtCore.Qt.ToolTipRole and image:
+            tips = []
+            if image.channel:
+                tips.append("%s (%d%%)" % (image.channel, image.confidence * 100))
+            if image.tiles:
+                tips.append("%d UDIM tiles, %d-%d" % (len(image.tiles), image.tiles[0], image.tiles[-1]))
+            if self.infos.get(image.name):
+                tips.append(imageHeaders.describe(self.infos[image.name]))
+            return '\n'.join(tips) or None
+        if role == QtCore.Qt.UserRole:
+            return image
+        return None
+
+    def clear(self):
+        self.beginResetModel()
+        self.images = [None]
+        self.byName = {}
+        self.infos = {}
+        self.endResetModel()
+
+    def setInfos(self, infos):
+        self.infos.update(infos)
+        self.dataChanged.emit(self.index(0), self.index(len(self.images) - 1), [QtCore.Qt.ToolTipRole])
+
+    def addImages(self, images):
+        if not images:
+            return
+        first = len(self.images)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(images) - 1)
+        self.images.extend(images)
+        self.byName.update((image.name, image) for image in images)
+        self.endInsertRows()
+
+
+class ImageFilterModel(QtCore.QSortFilterProxyModel):
+    """
+    Sorts the images by name and filters them by the filter text. The empty row and the images
+    in keep() (the combo boxes' current choices) are never filtered out, so filtering never
+    changes a selection.
+    """
+
+    def __init__(self, keep, parent=None):
+        super().__init__(parent)
+        self.keep = keep
+        self.setFilterCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        self.setDynamicSortFilter(True)
+        self.sort(0)
+
+    def filterAcceptsRow(self, sourceRow, sourceParent):
+        if sourceRow == 0:
+            return True
+        name = self.sourceModel().images[sourceRow].name
+        return name in self.keep() or super().filterAcceptsRow(sourceRow, sourceParent)
+
+
+class ImageScanner(QtCore.QThread):
+    """
+    Reads a folder through the texture index off the main thread, emitting the images in
+    batches, then each batch's image headers. Only file system work happens here, never any
+    Maya calls.
+    """
+    found = QtCore.Signal(int, list)
+    probed = QtCore.Signal(int, dict)
+
+    def __init__(self, index, folder, generation, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.folder = folder
+        self.generation = generation
+
+    def run(self):
+        for batch in self.index.iterScan(self.folder, SCAN_BATCH):
+            if self.isInterruptionRequested():
+                return
+            self.found.emit(self.generation, batch)
+            # UDIM sequences are described by their first tile
+            paths = {image.name: os.path.join(self.folder, textureIndex.firstFile(image)) for image in batch}
+            infos = imageHeaders.probeAll(list(paths.values()))
+            self.probed.emit(self.generation, {name: infos[path] for name, path in paths.items()})
+
+
+class ThumbnailSignals(QtCore.QObject):
+    loaded = QtCore.Signal(str, QtGui.QImage)
 
-        print("inserted!")
+
+class ThumbnailJob(QtCore.QRunnable):
+    """
+    Makes (or loads from the cache) the preview of one image on a pool thread.
+
+    The cache is keyed by path, mtime and size, so an image is only ever shrunk once. Qt's
+    readers decode JPEGs straight at the small size; other formats are decoded once here,
+    off the UI thread, and never again. Formats Qt can't read (EXR) get a null image.
+    """
+
+    def __init__(self, path, cacheDir, signals):
+        super().__init__()
+        self.path = path
+        self.cacheDir = cacheDir
+        self.signals = signals
+
+    def run(self):
+        image = QtGui.QImage()
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self.signals.loaded.emit(self.path, image)
+            return
+        key = hashlib.sha1(('%s|%s|%s' % (self.path, stat.st_mtime, stat.st_size)).encode()).hexdigest()
+        cachePath = os.path.join(self.cacheDir, key + '.png')
+        if os.path.exists(cachePath):
+            image = QtGui.QImage(cachePath)
+        else:
+            reader = QtGui.QImageReader(self.path)
+            size = reader.size()
+            if size.isValid():
+                size.scale(THUMBNAIL_SIZE, THUMBNAIL_SIZE, QtCore.Qt.KeepAspectRatio)
+                reader.setScaledSize(size)
+            image = reader.read()
+            if not image.isNull():
+                image.save(cachePath)
+        self.signals.loaded.emit(self.path, image)
 
 
 class SubImportUI(QtWidgets.QDialog):
@@ -152,7 +656,24 @@ class SubImportUI(QtWidgets.QDialog):
         }
         self.path = None
         self.importer = SubImporter()
+        # Folder listings survive between sessions, so reopening a library folder is instant
+        self.index = textureIndex.DirectoryIndex(os.path.join(cmds.internalVar(userAppDir=True), TEXTURE_INDEX))
+        self.scanner = None
+        # Bumped per folder load, so batches from an abandoned scan are ignored
+        self.generation = 0
+        # Best image so far per channel, and the channels the user has picked by hand
+        self.bestImages = {}
+        self.userPicked = set()
+        # {path: QPixmap} previews, and the paths a thumbnail job is running for
+        self.thumbnails = {}
+        self.pendingThumbnails = set()
+        self.thumbnailDir = os.path.join(cmds.internalVar(userAppDir=True), THUMBNAIL_CACHE)
+        os.makedirs(self.thumbnailDir, exist_ok=True)
         super().__init__()
+        self.threadPool = QtCore.QThreadPool(self)
+        self.threadPool.setMaxThreadCount(THUMBNAIL_THREADS)
+        self.thumbnailSignals = ThumbnailSignals(self)
+        self.thumbnailSignals.loaded.connect(self.showThumbnail)
         # TODO:Window Title isn't being set properly
         self.buildUI()
 
@@ -164,6 +685,10 @@ class SubImportUI(QtWidgets.QDialog):
         importBtn.clicked.connect(self.populateImages)
         layout.addWidget(importBtn)
 
+        self.filterEdit = QtWidgets.QLineEdit()
+        self.filterEdit.setPlaceholderText('Filter images...')
+        layout.addWidget(self.filterEdit)
+
         # Creating the scroll area for image selection
         scrollWidget = QtWidgets.QWidget()
         scrollWidget.setSizePolicy(QtWidgets.QSizePolicy.Maximum, QtWidgets.QSizePolicy.Maximum)
@@ -176,7 +701,6 @@ class SubImportUI(QtWidgets.QDialog):
 
         # Creating the combo boxes and adding to scroll area
         self.baseColorCB = QtWidgets.QComboBox()
-        self.baseColorCB.setSizeAdjustPolicy(QtWidgets.QComboBox.AdjustToContents)
         scrollLayout.addWidget(self.baseColorCB, 0, 1)
         self.metalnessCB = QtWidgets.QComboBox()
         scrollLayout.addWidget(self.metalnessCB, 1, 1)
@@ -188,6 +712,40 @@ class SubImportUI(QtWidgets.QDialog):
         scrollLayout.addWidget(self.bumpCB, 4, 1)
         self.opacityCB = QtWidgets.QComboBox()
         scrollLayout.addWidget(self.opacityCB, 5, 1)
+        self.comboBoxes = {
+            'baseColor': self.baseColorCB,
+            'metalness': self.metalnessCB,
+            'roughness': self.roughnessCB,
+            'emissive': self.emissiveCB,
+            'bump': self.bumpCB,
+            'opacity': self.opacityCB
+        }
+
+        # All six combo boxes show the one model, so every file name is stored once
+        self.imageModel = ImageListModel(self)
+        self.filterModel = ImageFilterModel(
+            lambda: {comboBox.currentText() for comboBox in self.comboBoxes.values()}, self)
+        self.filterModel.setSourceModel(self.imageModel)
+        self.filterEdit.textChanged.connect(self.filterModel.setFilterFixedString)
+        for channel, comboBox in self.comboBoxes.items():
+            comboBox.setModel(self.filterModel)
+            # Sized by a fixed length and uniform rows instead of measuring thousands of names
+            comboBox.setSizeAdjustPolicy(QtWidgets.QComboBox.AdjustToMinimumContentsLength)
+            comboBox.setMinimumContentsLength(32)
+            comboBox.view().setUniformItemSizes(True)
+            comboBox.activated.connect(lambda row, channel=channel: self.userPicked.add(channel))
+
+        # A preview and the resolution, layout and bit depth of every channel's image
+        self.previews = {}
+        for row, (channel, comboBox) in enumerate(self.comboBoxes.items()):
+            thumbnailLabel = QtWidgets.QLabel()
+            thumbnailLabel.setFixedSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+            thumbnailLabel.setAlignment(QtCore.Qt.AlignCenter)
+            scrollLayout.addWidget(thumbnailLabel, row, 2)
+            infoLabel = QtWidgets.QLabel()
+            scrollLayout.addWidget(infoLabel, row, 3)
+            self.previews[channel] = (thumbnailLabel, infoLabel)
+            comboBox.currentTextChanged.connect(lambda text, channel=channel: self.updatePreview(channel))
 
         # Creating the text labels for the Combo Boxes
         baseColorTxt = QtWidgets.QLabel('Color:')
@@ -207,13 +765,37 @@ class SubImportUI(QtWidgets.QDialog):
         self.arnoldCheck.setChecked(True)
         layout.addWidget(self.arnoldCheck)
 
+        # Targets added through PIPELINE_MATERIAL_TARGETS, picking one overrides the Arnold checkbox
+        extraTargets = sorted(set(channelMapping.targets()) - set(channelMapping.TARGETS))
+        self.targetCB = QtWidgets.QComboBox()
+        self.targetCB.addItems([''] + extraTargets)
+        self.targetCB.setVisible(bool(extraTargets))
+        layout.addWidget(self.targetCB)
+
         self.heightCheck = QtWidgets.QCheckBox('Is Height A Normal Map?')
         layout.addWidget(self.heightCheck)
 
+        self.txCheck = QtWidgets.QCheckBox('Convert To Tiled .tx?')
+        self.txCheck.toggled.connect(lambda checked: setattr(self.importer, 'convertTx', checked))
+        layout.addWidget(self.txCheck)
+
+        self.packCheck = QtWidgets.QCheckBox('Pack Grayscale Maps Into One Image?')
+        self.packCheck.toggled.connect(lambda checked: setattr(self.importer, 'packChannels', checked))
+        layout.addWidget(self.packCheck)
+
+        # Re-imports update the earlier import's <folder>_SHD networks instead of adding new ones
+        self.updateCheck = QtWidgets.QCheckBox('Update Existing Materials?')
+        layout.addWidget(self.updateCheck)
+
         applyBtn = QtWidgets.QPushButton("Create Material")
         applyBtn.clicked.connect(self.createConnections)
         layout.addWidget(applyBtn)
 
+        # Every texture set under a Substance export folder, one material each
+        batchBtn = QtWidgets.QPushButton("Batch Import Export Folder")
+        batchBtn.clicked.connect(self.batchImport)
+        layout.addWidget(batchBtn)
+
     def populateImages(self):
         # Gets current Maya project directory and asks user for folder in which to import images.
         mayaProjPath = cmds.workspace(expandName='sourceimages')
@@ -223,43 +805,97 @@ class SubImportUI(QtWidgets.QDialog):
         # Ensures no error when user closes file dialog box
         if self.path:
             # Clears previous items as user selects new directory
-            self.baseColorCB.clear()
-            self.roughnessCB.clear()
-            self.metalnessCB.clear()
-            self.emissiveCB.clear()
-            self.bumpCB.clear()
-            self.opacityCB.clear()
-
-            self.opacityCB.addItem(None)
-            self.bumpCB.addItem(None)
-            self.emissiveCB.addItem(None)
-            self.roughnessCB.addItem(None)
-            self.metalnessCB.addItem(None)
-            self.baseColorCB.addItem(None)
-            # Scan user-defined directory and add all image files to CB for user selection
-            with os.scandir(self.path) as it:
-                for entry in it:
-                    if entry.name.endswith(('.jpg', '.png', '.tiff')) and not entry.name.startswith('.'):
-                        self.baseColorCB.addItem(entry.name)
-                        self.metalnessCB.addItem(entry.name)
-                        self.roughnessCB.addItem(entry.name)
-                        self.emissiveCB.addItem(entry.name)
-                        self.bumpCB.addItem(entry.name)
-                        self.opacityCB.addItem(entry.name)
-
-                        # for convenience of user, checks file names and populates CBs
-                        if "basecolor" in entry.name:
-                            self.baseColorCB.setCurrentText(entry.name)
-                        if "metalness" in entry.name:
-                            self.metalnessCB.setCurrentText(entry.name)
-                        if "roughness" in entry.name:
-                            self.roughnessCB.setCurrentText(entry.name)
-                        if "emissive" in entry.name:
-                            self.emissiveCB.setCurrentText(entry.name)
-                        if "bump" in entry.name:
-                            self.bumpCB.setCurrentText(entry.name)
-                        if "opacity" in entry.name:
-                            self.opacityCB.setCurrentText(entry.name)
+            self.stopScan()
+            self.imageModel.clear()
+            self.bestImages = {}
+            self.userPicked = set()
+            # List the directory's images (from the index when it hasn't changed) in the background
+            self.generation += 1
+            self.scanner = ImageScanner(self.index, self.path, self.generation, self)
+            self.scanner.found.connect(self.addImages)
+            self.scanner.probed.connect(self.addInfos)
+            self.scanner.finished.connect(self.index.save)
+            self.scanner.start()
+
+    def addImages(self, generation, images):
+        if generation != self.generation:
+            return
+        self.imageModel.addImages(images)
+        # for convenience of user, picks the most likely image for every channel they haven't picked
+        for image in images:
+            if not image.channel or image.channel in self.userPicked:
+                continue
+            if image.confidence > self.bestImages.get(image.channel, (None, 0.0))[1]:
+                self.bestImages[image.channel] = (image.name, image.confidence)
+                self.comboBoxes[image.channel].setCurrentText(image.name)
+
+    def addInfos(self, generation, infos):
+        if generation != self.generation:
+            return
+        self.imageModel.setInfos(infos)
+        for channel in self.comboBoxes:
+            self.updatePreview(channel)
+
+    def updatePreview(self, channel):
+        thumbnailLabel, infoLabel = self.previews[channel]
+        name = self.comboBoxes[channel].currentText()
+        if not name or not self.path:
+            thumbnailLabel.clear()
+            infoLabel.clear()
+            return
+        info = self.imageModel.infos.get(name)
+        image = self.imageModel.byName.get(name)
+        text = imageHeaders.describe(info) if info else ''
+        if image and image.tiles:
+            text += ' x%d tiles' % len(image.tiles)
+        infoLabel.setText(text)
+        path = os.path.join(self.path, textureIndex.firstFile(image) if image else name)
+        pixmap = self.thumbnails.get(path)
+        if pixmap is not None:
+            thumbnailLabel.setPixmap(pixmap)
+            return
+        thumbnailLabel.clear()
+        if path not in self.pendingThumbnails:
+            self.pendingThumbnails.add(path)
+            self.threadPool.start(ThumbnailJob(path, self.thumbnailDir, self.thumbnailSignals))
+
+    def showThumbnail(self, path, image):
+        self.pendingThumbnails.discard(path)
+        # Null images are kept too, so unreadable files aren't retried
+        self.thumbnails[path] = QtGui.QPixmap.fromImage(image)
+        for channel, comboBox in self.comboBoxes.items():
+            image = self.imageModel.byName.get(comboBox.currentText())
+            if self.path and image and os.path.join(self.path, textureIndex.firstFile(image)) == path:
+                self.previews[channel][0].setPixmap(self.thumbnails[path])
+
+    def stopScan(self):
+        if self.scanner is not None and self.scanner.isRunning():
+            self.scanner.requestInterruption()
+            self.scanner.wait()
+        self.scanner = None
+
+    def closeEvent(self, event):
+        self.stopScan()
+        self.threadPool.clear()
+        self.threadPool.waitForDone()
+        super().closeEvent(event)
+
+    def selectedTarget(self):
+        return self.targetCB.currentText() or ('arnold' if self.arnoldCheck.isChecked() else 'maya')
+
+    def batchImport(self):
+        mayaProjPath = cmds.workspace(expandName='sourceimages')
+        root = QtWidgets.QFileDialog.getExistingDirectory(caption="Select Export Folder to Import",
+                                                          options=QtWidgets.QFileDialog.Option.DontUseNativeDialog,
+                                                          dir=mayaProjPath)
+        if root:
+            materials = self.importer.importExportTree(root, heightIsNormal=self.heightCheck.isChecked(),
+                                                       incremental=self.updateCheck.isChecked(),
+                                                       target=self.selectedTarget())
+            if not materials:
+                cmds.warning("No <textureSet>_<channel> images found under %s" % root)
+                return
+            self.close()
 
     def createConnections(self):
         # Get all CB texts and pass them to a dict
@@ -275,9 +911,9 @@ class SubImportUI(QtWidgets.QDialog):
                 'bump': self.bumpCB.currentText(),
                 'opacity': self.opacityCB.currentText()
                 }
-            if self.arnoldCheck.isChecked():
-                self.importer.createArnoldMaterial(self.path, attrs)
+            if self.updateCheck.isChecked():
+                self.importer.updateMaterial(self.path, attrs, target=self.selectedTarget())
             else:
-                self.importer.createMayaMaterial(self.path, attrs)
+                self.importer.createMaterial(self.path, attrs, self.selectedTarget())
 
             self.close()
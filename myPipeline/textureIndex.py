@@ -0,0 +1,299 @@
+"""
+Indexes texture folders and sorts their images into material channels.
+
+Folder listings are cached by the folder's mtime and saved between sessions, so an unchanged
+folder costs one stat. UDIM tiles collapse into one name.<UDIM>.png entry.
+"""
+import collections
+import os
+import re
+import time
+from myPipeline import fileUtils
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.exr', '.tx')
+# What Substance exports, the images scanExportTree groups into texture sets
+EXPORT_EXTENSIONS = ('.jpg', '.png', '.tiff', '.tif', '.exr')
+# Channel suffixes Substance (and our artists) export with, lower case, mapped to the importer's channels
+CHANNEL_SUFFIXES = {
+    'basecolor': 'baseColor', 'base_color': 'baseColor', 'albedo': 'baseColor', 'diffuse': 'baseColor',
+    'color': 'baseColor',
+    'metalness': 'metalness', 'metallic': 'metalness',
+    'roughness': 'roughness',
+    'emissive': 'emissive', 'emission': 'emissive',
+    'height': 'bump', 'bump': 'bump', 'normal': 'bump',
+    'opacity': 'opacity', 'alpha': 'opacity'
+}
+# Suffixes spanning several tokens, longest first, matched before splitting at the last underscore
+MULTI_TOKEN_SUFFIXES = sorted((suffix for suffix in CHANNEL_SUFFIXES if '_' in suffix), key=len, reverse=True)
+# Confidence of a keyword ending the name, standing alone elsewhere in it, or buried in a word
+SUFFIX_SCORE = 1.0
+TOKEN_SCORE = 0.8
+EMBEDDED_SCORE = 0.4
+SEPARATORS = '_-. '
+# Folders modified this recently are rescanned, their mtime may not have ticked over yet
+MTIME_SLACK = 2.0
+# Bumped whenever what gets stored per folder changes, older entries are rescanned
+INDEX_VERSION = 2
+UDIM_TOKEN = '<UDIM>'
+# <name>.1001.<ext> or <name>_1001.<ext>, compiled once for every file of every scan
+UDIM_PATTERN = re.compile(r'^(?P<head>.+?)(?P<separator>[._])(?P<tile>1\d{3})(?P<extension>\.[^.]+)$')
+
+# tiles holds the tile numbers of a collapsed UDIM sequence, () for single images
+IndexedImage = collections.namedtuple('IndexedImage', 'name channel confidence tiles', defaults=((),))
+
+
+def splitUdim(name):
+    # (name with its tile number swapped for <UDIM>, tile number), (name, None) for other files
+    match = UDIM_PATTERN.match(name)
+    if not match:
+        return name, None
+    return '%s%s%s%s' % (match.group('head'), match.group('separator'), UDIM_TOKEN,
+                         match.group('extension')), int(match.group('tile'))
+
+
+def collapseUdims(names):
+    """
+    Collapses UDIM tile sequences into one <UDIM> name each. A lone tile only counts as a
+    sequence when it is dot separated, "rock_1001.png" is more likely a version number.
+
+    Returns:
+        {name: sorted tuple of tile numbers, () for other files}
+    """
+    collapsed = {}
+    sequences = {}
+    for name in names:
+        pattern, tile = splitUdim(name)
+        if tile is None:
+            collapsed[name] = ()
+        else:
+            sequences.setdefault(pattern, []).append((tile, name))
+    for pattern, tiles in sequences.items():
+        if len(tiles) > 1 or '.' + UDIM_TOKEN in pattern:
+            collapsed[pattern] = tuple(sorted(tile for tile, name in tiles))
+        else:
+            collapsed[tiles[0][1]] = ()
+    return collapsed
+
+
+def withoutUdim(name):
+    # "crate_BaseColor.<UDIM>.png" -> "crate_BaseColor.png"
+    for separator in '._':
+        name = name.replace(separator + UDIM_TOKEN, '')
+    return name
+
+
+def tileName(name, tile):
+    return name.replace(UDIM_TOKEN, '%d' % tile)
+
+
+def firstFile(image):
+    # The file to preview or probe an IndexedImage by, the first tile of a UDIM sequence
+    return tileName(image.name, image.tiles[0]) if image.tiles else image.name
+
+
+class ChannelClassifier:
+    """
+    Args:
+        keywords (dict) {lower case keyword: channel}
+    """
+
+    def __init__(self, keywords=None):
+        self.keywords = dict(CHANNEL_SUFFIXES if keywords is None else keywords)
+        self.compile()
+
+    def compile(self):
+        # Call again after changing the keywords. Longest first, so "basecolor" wins over "color"
+        ordered = sorted(self.keywords, key=len, reverse=True)
+        self._matcher = re.compile('|'.join(re.escape(keyword) for keyword in ordered))
+        self.signature = '|'.join(sorted('%s=%s' % item for item in self.keywords.items()))
+        self._cache = {}
+
+    def classify(self, name):
+        """
+        Args:
+            name (str) The file name, with or without its extension
+
+        Returns:
+            (channel, confidence) for the best matching channel, (None, 0.0) if nothing matches.
+            A name matching two channels equally well gets half the confidence.
+        """
+        result = self._cache.get(name)
+        if result is None:
+            result = self._cache[name] = self._classify(name)
+        return result
+
+    def _classify(self, name):
+        stem = os.path.splitext(withoutUdim(name))[0].lower()
+        scores = {}
+        for match in self._matcher.finditer(stem):
+            start, end = match.span()
+            before = start == 0 or stem[start - 1] in SEPARATORS
+            after = end == len(stem) or stem[end] in SEPARATORS
+            if before and end == len(stem):
+                score = SUFFIX_SCORE
+            elif before and after:
+                score = TOKEN_SCORE
+            else:
+                score = EMBEDDED_SCORE
+            channel = self.keywords[match.group()]
+            scores[channel] = max(scores.get(channel, 0.0), score)
+        if not scores:
+            return None, 0.0
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        channel, confidence = ranked[0]
+        if len(ranked) > 1 and ranked[1][1] == confidence:
+            confidence /= 2
+        return channel, confidence
+
+
+class DirectoryIndex:
+    """
+    Image listings of texture folders, rescanned only when a folder's mtime changes.
+
+    Args:
+        cacheFile (str) JSON file to load the index from and save it to, None to keep it in memory
+        extensions (iterable) Image extensions to list, lower case with the dot
+        classifier (ChannelClassifier) Sorts the images into channels
+    """
+
+    def __init__(self, cacheFile=None, extensions=IMAGE_EXTENSIONS, classifier=None):
+        self.cacheFile = cacheFile
+        self.extensions = tuple(sorted(extension.lower() for extension in extensions))
+        self.classifier = classifier or ChannelClassifier()
+        # A missing or corrupt index only costs a rescan
+        self.entries = fileUtils.loadJson(cacheFile, {}) if cacheFile else {}
+        self.changed = False
+
+    def scan(self, folder):
+        """
+        Lists the images in folder (not its subfolders), from the index when the folder hasn't changed.
+
+        Returns:
+            [IndexedImage] sorted by name
+        """
+        images = []
+        for batch in self.iterScan(folder):
+            images.extend(batch)
+        return sorted(images)
+
+    def iterScan(self, folder, batchSize=256):
+        """
+        Like scan, but yields the images batchSize at a time as the folder is read, in no
+        particular order. UDIM tiles are held back and come collapsed in the last batch. The
+        index is only updated once the folder has been read to the end.
+        """
+        key = os.path.normpath(folder)
+        mtime = os.stat(folder).st_mtime
+        entry = self.entries.get(key)
+        if (entry and entry.get('version') == INDEX_VERSION and entry['mtime'] == mtime
+                and entry['extensions'] == list(self.extensions) and entry['classifier'] == self.classifier.signature
+                and entry['scanned'] - mtime > MTIME_SLACK):
+            yield [IndexedImage(name, channel, confidence, tuple(tiles))
+                   for name, channel, confidence, tiles in entry['images']]
+            return
+
+        images = []
+        batch = []
+        tiles = []
+        with os.scandir(folder) as it:
+            for dirEntry in it:
+                name = dirEntry.name
+                if name.startswith('.') or not name.lower().endswith(self.extensions):
+                    continue
+                if UDIM_PATTERN.match(name):
+                    tiles.append(name)
+                    continue
+                batch.append(IndexedImage(name, *self.classifier.classify(name)))
+                if len(batch) >= batchSize:
+                    images.extend(batch)
+                    yield batch
+                    batch = []
+        for name, numbers in collapseUdims(tiles).items():
+            batch.append(IndexedImage(name, *self.classifier.classify(name), tiles=numbers))
+        images.extend(batch)
+        yield batch
+        images.sort()
+        self.entries[key] = {
+            'version': INDEX_VERSION,
+            'mtime': mtime,
+            'scanned': time.time(),
+            'extensions': list(self.extensions),
+            'classifier': self.classifier.signature,
+            'images': [list(image) for image in images]
+        }
+        self.changed = True
+        return images
+
+    def save(self):
+        if not self.cacheFile or not self.changed:
+            return
+        fileUtils.saveJson(self.entries, self.cacheFile)
+        self.changed = False
+
+
+def splitChannel(stem):
+    """
+    Splits <textureSet>_<channel> at the channel suffix, so X_Base_Color is set X, not X_Base.
+
+    Returns:
+        (texture set, suffix), the set empty when stem has no suffix
+    """
+    lowered = stem.lower()
+    for suffix in MULTI_TOKEN_SUFFIXES:
+        if lowered.endswith('_' + suffix):
+            return stem[:-len(suffix) - 1], stem[-len(suffix):]
+    setName, _, suffix = stem.rpartition('_')
+    return setName, suffix
+
+
+def scanExportTree(root, heightIsNormal=False):
+    """
+    Walks a Substance export root and groups its images by texture set.
+
+    Files are named <textureSet>_<channel>.<ext>, UDIM tiles <textureSet>_<channel>.<tile>.<ext>
+    and collapsed into one <UDIM> entry. When a set has both a normal and a height map, the
+    normal map goes in the bump slot.
+
+    Args:
+        root (str) The export folder, searched recursively
+        heightIsNormal (bool) Treat height maps as normal maps
+
+    Returns:
+        {(folder, texture set): attrs} with attrs as SubImportUI.createConnections builds them
+    """
+    textureSets = {}
+    for folder, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(collapseUdims(files)):
+            stem, ext = os.path.splitext(withoutUdim(name))
+            if ext.lower() not in EXPORT_EXTENSIONS or name.startswith('.'):
+                continue
+            setName, suffix = splitChannel(stem)
+            channel = CHANNEL_SUFFIXES.get(suffix.lower())
+            if not setName or not channel:
+                continue
+            attrs = textureSets.setdefault((folder.replace('\\', '/'), setName), {
+                'isHeightNormal': False,
+                'baseColor': '',
+                'metalness': '',
+                'roughness': '',
+                'emissive': '',
+                'bump': '',
+                'opacity': ''
+            })
+            isNormal = suffix.lower() == 'normal'
+            if channel == 'bump' and attrs['bump'] and attrs['isHeightNormal'] and not isNormal:
+                continue
+            attrs[channel] = name
+            if channel == 'bump':
+                attrs['isHeightNormal'] = isNormal or heightIsNormal
+    return textureSets
+
+
+def bestMatches(images):
+    # {channel: name} of the most confident image for every channel something matched
+    best = {}
+    for image in images:
+        if image.channel and image.confidence > best.get(image.channel, (None, 0.0))[1]:
+            best[image.channel] = (image.name, image.confidence)
+    return {channel: name for channel, (name, confidence) in best.items()}
@@ -0,0 +1,89 @@
+"""
+Content-hash registry of texture images, so identical maps share one texture node.
+
+Hashes are cached by path, mtime and size, and can be saved between sessions.
+"""
+import os
+from myPipeline import fileUtils
+
+
+class FingerprintCache:
+    """
+    Content hashes of image files, re-read only when a file's mtime or size changes.
+
+    Args:
+        cacheFile (str) JSON file to load the cache from and save it to, None to keep it in memory
+    """
+
+    def __init__(self, cacheFile=None):
+        self.cacheFile = cacheFile
+        # A missing or corrupt cache only costs a re-hash
+        self.entries = fileUtils.loadJson(cacheFile, {}) if cacheFile else {}
+        self.changed = False
+
+    def fingerprint(self, path):
+        # Returns the file's content hash, None if it can't be read
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = os.path.normpath(path)
+        entry = self.entries.get(key)
+        if entry and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+            return entry[2]
+        digest = fileUtils.fileHash(path)
+        self.entries[key] = [stat.st_mtime, stat.st_size, digest]
+        self.changed = True
+        return digest
+
+    def save(self):
+        if not self.cacheFile or not self.changed:
+            return
+        fileUtils.saveJson(self.entries, self.cacheFile)
+        self.changed = False
+
+
+class TextureRegistry:
+    """
+    Maps (texture node type, image content) to the node that already shows that image.
+
+    Nodes are whatever the caller uses for them: scene node names, or shadingNetwork NodeRefs
+    for nodes queued but not built yet.
+    """
+
+    def __init__(self, fingerprints=None):
+        self.fingerprints = fingerprints or FingerprintCache()
+        self.nodes = {}
+        self.reused = 0
+
+    def reset(self, existing=()):
+        """
+        Forgets the registered nodes, then registers existing ones.
+
+        Args:
+            existing (iterable) (node type, image path, node, digest) of texture nodes already in
+                the scene, digest None to hash the image
+        """
+        self.nodes = {}
+        self.reused = 0
+        for nodeType, path, node, digest in existing:
+            if path:
+                self.add(path, nodeType, node, digest)
+
+    def find(self, path, nodeType):
+        # The node already made for an identical image, None if there isn't one
+        digest = self.fingerprints.fingerprint(path)
+        node = self.nodes.get((nodeType, digest)) if digest else None
+        if node is not None:
+            self.reused += 1
+        return node
+
+    def discard(self, node):
+        # Forgets node, e.g. when it is deleted or shows another image now
+        self.nodes = {key: value for key, value in self.nodes.items() if value != node}
+
+    def add(self, path, nodeType, node, digest=None):
+        # digest, when known, saves reading the file (e.g. a .tx named after its source's hash)
+        digest = digest or self.fingerprints.fingerprint(path)
+        if digest:
+            self.nodes.setdefault((nodeType, digest), node)
@@ -0,0 +1,109 @@
+"""
+Converts textures to tiled, mipmapped .tx files with maketx, cached by source content.
+
+Converted files are named <stem>.<sha1>.tx after the source's contents, so each image is
+converted once and a changed image gets a new file.
+"""
+import concurrent.futures
+import os
+import re
+import shutil
+import subprocess
+import threading
+from myPipeline import textureRegistry
+
+MAKETX_ENV = 'PIPELINE_MAKETX'
+DEFAULT_ARGS = ('--oiio',)
+CACHED_NAME = re.compile(r'\.(?P<digest>[0-9a-f]{40})\.tx$')
+
+
+def findMaketx():
+    # PIPELINE_MAKETX, else maketx on the PATH (MtoA ships one in its bin folder)
+    return os.environ.get(MAKETX_ENV) or shutil.which('maketx')
+
+
+def sourceDigest(path):
+    # The source content hash of a cached .tx, None for any other file
+    match = CACHED_NAME.search(path or '')
+    return match.group('digest') if match else None
+
+
+class TxCache:
+    """
+    Args:
+        cacheDir (str) Folder the .tx files are written to
+        fingerprints (textureRegistry.FingerprintCache) Source hashes, shared with the texture registry
+        maketx (str) The maketx executable, found with findMaketx() by default
+        workers (int) maketx processes run at once
+        args (iterable) Extra maketx arguments
+    """
+
+    def __init__(self, cacheDir, fingerprints=None, maketx=None, workers=None, args=DEFAULT_ARGS):
+        self.cacheDir = cacheDir
+        self.fingerprints = fingerprints or textureRegistry.FingerprintCache()
+        self.maketx = maketx or findMaketx()
+        self.workers = workers or os.cpu_count() or 4
+        self.args = tuple(args)
+        # {source: maketx output} of the conversions that failed in the last convert()
+        self.failures = {}
+
+    def cachedPath(self, source):
+        # Where source's .tx goes, None if source can't be read
+        digest = self.fingerprints.fingerprint(source)
+        if not digest:
+            return None
+        stem = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.cacheDir, '%s.%s.tx' % (stem, digest)).replace('\\', '/')
+
+    def convert(self, sources):
+        """
+        Makes the .tx of every source not converted yet.
+
+        Returns:
+            {source: path to render from}, the .tx where there is one, the source itself for
+            .tx sources, unreadable files, failed conversions or when maketx can't be found
+        """
+        paths = {}
+        jobs = {}
+        self.failures = {}
+        for source in sources:
+            paths[source] = source
+            if self.maketx is None or source.lower().endswith('.tx'):
+                continue
+            target = self.cachedPath(source)
+            if target is None:
+                continue
+            if os.path.exists(target):
+                paths[source] = target
+            else:
+                # Identical sources only need converting once
+                jobs.setdefault(target, []).append(source)
+        if not jobs:
+            return paths
+
+        os.makedirs(self.cacheDir, exist_ok=True)
+        # Threads only wait on the maketx processes, which do the work
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            results = executor.map(lambda item: self.run(item[1][0], item[0]), jobs.items())
+            for (target, targetSources), error in zip(jobs.items(), results):
+                for source in targetSources:
+                    if error is None:
+                        paths[source] = target
+                    else:
+                        self.failures[source] = error
+        return paths
+
+    def run(self, source, target):
+        # Converts to a temporary name first so a half written .tx is never picked up. Returns the error, if any
+        tmpPath = '%s.%d.tmp.tx' % (target[:-3], threading.get_ident())
+        try:
+            process = subprocess.run((self.maketx,) + self.args + ('-o', tmpPath, source),
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        except OSError as e:
+            return str(e)
+        if process.returncode or not os.path.exists(tmpPath):
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            return process.stdout.strip() or 'maketx exited with %d' % process.returncode
+        os.replace(tmpPath, target)
+        return None
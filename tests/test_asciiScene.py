@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+from myPipeline import asciiScene
+
+# A mesh whose vertex data runs over several lines, followed by a transform that fails the checks
+PACKAGE_MA = '''//Maya ASCII 2022 scene
+requires maya "2022";
+createNode transform -n "box_GEO";
+createNode mesh -n "box_GEOShape" -p "box_GEO";
+\tsetAttr -s 2 ".vt[0:1]" 1 2 3
+\t\t 4 5 6;
+createNode transform -n "lid";
+\tsetAttr ".rx" 12;
+createNode mesh -n "lidShape" -p "lid";
+'''
+
+
+class IterStatementsTest(unittest.TestCase):
+
+    def test_skippedMultiLineSetAttrEndsItsStatement(self):
+        lines = ['setAttr -s 2 ".vt[0:1]" 1 2 3\n', ' 4 5 6;\n', 'createNode transform -n "lid";\n']
+        statements = list(asciiScene.iterStatements(lines, setAttrNames={'rx'}))
+        self.assertEqual(statements, [['createNode', 'transform', '-n', '"lid"']])
+
+
+class CheckFileTest(unittest.TestCase):
+
+    def test_nodeAfterMeshDataIsChecked(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'package.ma')
+            with open(path, 'w') as f:
+                f.write(PACKAGE_MA)
+            snapshot, results = asciiScene.checkFile(path)
+        self.assertIn('|lid', snapshot.types)
+        self.assertIn('|lid', results['suffix'].failed)
+        self.assertIn('|lid', results['transform'].failed)
+
+
+if __name__ == '__main__':
+    unittest.main()